@@ -65,8 +65,9 @@ async def get_predictions(area: int, consumer_type: int) -> Any:
     y_filtered_df = y[(y["consumer_type"] == consumer_type) & (y["area"] == area)]
     pred_filtered_df = pred[(pred["consumer_type"] == consumer_type) & (pred["area"] == area)]
 
-    preds_datetime_utc = pred_filtered_df["datetime_utc"].to_list()
-    datetime_utc = y_filtered_df["datetime_utc"].to_list()
+    # The artifacts are stored as parquet files, which keep `datetime_utc` as periods instead of strings.
+    preds_datetime_utc = pred_filtered_df["datetime_utc"].astype(str).to_list()
+    datetime_utc = y_filtered_df["datetime_utc"].astype(str).to_list()
 
     energy_consumption = y_filtered_df["energy_consumption"].to_list()
     preds_energy_consumption = pred_filtered_df["energy_consumption"].to_list()
@@ -0,0 +1,76 @@
+"""Compare the rolling-origin backtest on the shared design matrix with the full refit of the forecaster per origin.
+
+Both fit the same regressor on the same rows for every origin, so their predictions are expected to be equal, for
+every strategy and every step between the origins, including the steps that are not a multiple of the origin stride
+of the direct strategy. The script fails if they differ.
+
+Usage:
+    python benchmarks/backtest_benchmark.py --num-days 30 --num-series 3 --fh 24 --num-origins 3 --steps 24 7
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_DIR = Path(__file__).parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from benchmarks.direct_benchmark import make_panel_data
+from src.training_pipeline.src.backtest import run_backtest
+from src.training_pipeline.src.models import STRATEGIES, build_model
+
+# Tolerance of the difference between the predictions of the shared design matrix and of the full refit.
+TOLERANCE = 1e-6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-days", type=int, default=30)
+    parser.add_argument("--num-series", type=int, default=3)
+    parser.add_argument("--fh", type=int, default=24)
+    parser.add_argument("--num-origins", type=int, default=3)
+    parser.add_argument("--steps", type=int, nargs="+", default=[24, 7])
+    parser.add_argument("--n-estimators", type=int, default=50)
+    cli_args = parser.parse_args()
+
+    y, X = make_panel_data(cli_args.num_days, cli_args.num_series)
+    print(f"Input: {y.index.droplevel(-1).nunique()} series, {len(y)} rows")
+
+    print(f"{'strategy':<12}{'step':>6}{'shared s':>10}{'refit s':>10}{'max abs diff':>14}{'MAPE':>10}")
+    mismatches = []
+    for strategy in STRATEGIES:
+        for step in cli_args.steps:
+            config = {
+                "strategy": strategy,
+                "forecaster__estimator__n_estimators": cli_args.n_estimators,
+                "forecaster__estimator__verbosity": -1,
+            }
+            results = {}
+            for name, cache_features in [("shared", True), ("refit", False)]:
+                t1 = time.perf_counter()
+                result = run_backtest(
+                    build_model(dict(config)),
+                    y,
+                    X,
+                    fh=cli_args.fh,
+                    num_origins=cli_args.num_origins,
+                    step=step,
+                    n_jobs=1,
+                    estimator_jobs=1,
+                    cache_features=cache_features,
+                )
+                results[name] = (time.perf_counter() - t1, result)
+
+            (shared_seconds, shared), (refit_seconds, refit) = results["shared"], results["refit"]
+            max_abs_diff = np.abs(shared.predictions["y_pred"] - refit.predictions["y_pred"]).max()
+            print(
+                f"{strategy:<12}{step:>6}{shared_seconds:>10.2f}{refit_seconds:>10.2f}{max_abs_diff:>14.2e}"
+                f"{shared.summary.loc['MAPE', 'mean']:>10.4f}"
+            )
+            if not max_abs_diff <= TOLERANCE:
+                mismatches.append((strategy, step))
+
+    if len(mismatches) > 0:
+        sys.exit(f"The shared design matrix does not match the full refit for the (strategy, step) pairs {mismatches}.")
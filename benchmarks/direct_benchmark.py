@@ -0,0 +1,172 @@
+"""Compare the predict latency and the accuracy of the recursive and direct forecasting strategies.
+
+The window features of the direct strategy are first checked against the `WindowSummarizer` features of the recursive
+strategy, and against the rolling statistics computed window by window on series of very different magnitudes. The
+script fails if they differ.
+
+Usage:
+    python benchmarks/direct_benchmark.py --num-days 120 --num-series 20 --horizons 24 168
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = Path(__file__).parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from sktime.forecasting.model_selection import temporal_train_test_split
+from sktime.performance_metrics.forecasting import mean_absolute_percentage_error
+from src.training_pipeline.src.direct import HORIZON_COLUMN
+from src.training_pipeline.src.models import STRATEGIES, build_model
+from src.training_pipeline.src.search_engine import ESTIMATOR_PARAM, DesignMatrixCapture
+from src.utils import panel, schema
+
+# Tolerance of the relative error of the window features, relative to the standard deviation of their series.
+WINDOW_FEATURES_TOLERANCE = 1e-8
+
+
+def make_panel_data(num_days: int, num_series: int, seed: int = 42) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Build a synthetic panel of hourly consumption with daily and weekly seasonality, split in y and X."""
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range("2023-01-01", periods=24 * num_days, freq="H")
+    hour_of_week = np.arange(len(hours)) % (24 * 7)
+
+    frames = []
+    for series in range(num_series):
+        level = rng.uniform(500, 5000)
+        daily = 0.2 * level * np.sin(2 * np.pi * hour_of_week / 24 + rng.uniform(0, np.pi))
+        weekly = 0.1 * level * np.sin(2 * np.pi * hour_of_week / (24 * 7))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "datetime_utc": hours,
+                    "area": schema.AREA_VALUES[series % len(schema.AREA_VALUES)],
+                    "consumer_type": schema.CONSUMER_TYPE_VALUES[series // len(schema.AREA_VALUES)],
+                    "energy_consumption": level + daily + weekly + rng.normal(0, 0.02 * level, len(hours)),
+                }
+            )
+        )
+    data = panel.build_panel(pd.concat(frames, ignore_index=True))
+
+    return data[["energy_consumption"]], data.drop(columns=["energy_consumption"])
+
+
+def check_window_features(y: pd.DataFrame, X: pd.DataFrame, fh: int, seed: int = 42) -> dict[str, float]:
+    """Compare the window features of the direct strategy with reference features.
+
+    The features of a direct row of step 1 describe the same target as the recursive row of its target time, so they
+    are first compared with the `WindowSummarizer` features of the recursive strategy. The series are then rescaled to
+    magnitudes from 1e-1 to 1e6, to check that the features of a series do not depend on the magnitude of the series
+    before it. As the `WindowSummarizer` statistics lose precision on such series, the rolling means and standard
+    deviations are then compared with the ones computed window by window.
+
+    Returns:
+        dict[str, float]: The maximum error of the features against every reference, relative to the standard
+            deviation of their series.
+    """
+    target = y.columns[0]
+    instance_levels = list(range(y.index.nlevels - 1))
+    errors = {}
+
+    designs = {strategy: _design_matrix(strategy, y, X, fh) for strategy in STRATEGIES}
+    direct = designs["direct"][designs["direct"][HORIZON_COLUMN] == 1]
+    columns = [column for column in direct.columns if column.startswith(f"{target}_")]
+    recursive = designs["recursive"].reindex(direct.index)[columns].to_numpy()
+    errors["WindowSummarizer"] = _max_relative_error(direct[columns].to_numpy(), recursive, direct.index, y)
+
+    rng = np.random.default_rng(seed)
+    instances = y.index.droplevel(-1)
+    magnitudes = pd.Series(10 ** rng.uniform(-1, 6, instances.nunique()), index=instances.unique())
+    y = y * magnitudes.reindex(instances).to_numpy()[:, np.newaxis]
+    direct = _design_matrix("direct", y, X, fh)
+    direct = direct[direct[HORIZON_COLUMN] == 1]
+    columns = [column for column in direct.columns if column.startswith((f"{target}_mean_1_", f"{target}_std_1_"))]
+    expected = np.full((len(direct), len(columns)), np.nan)
+    for instance, rows in direct.groupby(level=instance_levels).indices.items():
+        series = y.iloc[:, 0].xs(instance, level=instance_levels)
+        # The windows of the lag 1 end at the value before the target.
+        target_positions = series.index.get_indexer(direct.index[rows].get_level_values(-1))
+        for column, name in enumerate(columns):
+            stat, window_length = name.split("_")[-3], int(name.split("_")[-1])
+            windows = np.lib.stride_tricks.sliding_window_view(series.to_numpy(), window_length)
+            windows = windows[target_positions - window_length]
+            expected[rows, column] = windows.mean(axis=1) if stat == "mean" else windows.std(axis=1, ddof=1)
+    errors["window by window"] = _max_relative_error(direct[columns].to_numpy(), expected, direct.index, y)
+
+    return errors
+
+
+def _design_matrix(strategy: str, y: pd.DataFrame, X: pd.DataFrame, fh: int) -> pd.DataFrame:
+    """Capture the design matrix of the reduction of a strategy."""
+    model = build_model({"strategy": strategy}).set_params(**{ESTIMATOR_PARAM: DesignMatrixCapture()})
+    model.fit(y, X=X, fh=np.arange(fh) + 1)
+
+    return model.forecaster_.estimator_.X_
+
+
+def _max_relative_error(values: np.ndarray, expected: np.ndarray, index: pd.MultiIndex, y: pd.DataFrame) -> float:
+    """Compute the maximum error of the features of the rows of a design matrix, relative to the standard deviation
+    of their series."""
+    scales = y.iloc[:, 0].groupby(level=list(range(y.index.nlevels - 1))).std()
+    scales = scales.reindex(index.droplevel(-1)).to_numpy()[:, np.newaxis]
+
+    return float(np.nanmax(np.abs(values - expected) / scales))
+
+
+def measure(strategy: str, y: pd.DataFrame, X: pd.DataFrame, fh: int, n_estimators: int) -> dict[str, float]:
+    """Fit a strategy on all the data but the last `fh` hours, then time its forecast of these hours."""
+    y_train, y_test, X_train, X_test = temporal_train_test_split(y, X, test_size=fh)
+    model = build_model(
+        {
+            "strategy": strategy,
+            "forecaster__estimator__n_estimators": n_estimators,
+            "forecaster__estimator__verbosity": -1,
+        }
+    )
+
+    t1 = time.perf_counter()
+    model.fit(y_train, X=X_train, fh=np.arange(fh) + 1)
+    fit_seconds = time.perf_counter() - t1
+
+    t1 = time.perf_counter()
+    y_pred = model.predict(X=X_test)
+    predict_seconds = time.perf_counter() - t1
+
+    return {
+        "fit_seconds": fit_seconds,
+        "predict_seconds": predict_seconds,
+        "mape": mean_absolute_percentage_error(y_test, y_pred.loc[y_test.index], symmetric=False),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-days", type=int, default=120)
+    parser.add_argument("--num-series", type=int, default=20)
+    parser.add_argument("--horizons", type=int, nargs="+", default=[24, 168])
+    parser.add_argument("--n-estimators", type=int, default=200)
+    cli_args = parser.parse_args()
+
+    y, X = make_panel_data(cli_args.num_days, cli_args.num_series)
+    print(f"Input: {y.index.droplevel(-1).nunique()} series, {len(y)} rows")
+
+    window_features_errors = check_window_features(y, X, fh=cli_args.horizons[0])
+    for reference, error in window_features_errors.items():
+        print(f"Max relative error of the direct window features against the {reference} features: {error:.2e}")
+        if not error <= WINDOW_FEATURES_TOLERANCE:
+            sys.exit(f"The window features of the direct strategy do not match the {reference} features.")
+
+    print(f"{'fh':<6}{'strategy':<12}{'fit s':>10}{'predict s':>12}{'MAPE':>10}")
+    for fh in cli_args.horizons:
+        results = {strategy: measure(strategy, y, X, fh, cli_args.n_estimators) for strategy in STRATEGIES}
+        for strategy, result in results.items():
+            print(
+                f"{fh:<6}{strategy:<12}{result['fit_seconds']:>10.2f}"
+                f"{result['predict_seconds']:>12.3f}{result['mape']:>10.4f}"
+            )
+        speedup = results["recursive"]["predict_seconds"] / results["direct"]["predict_seconds"]
+        print(f"Predict speedup at fh={fh}: {speedup:.1f}x")
@@ -0,0 +1,91 @@
+"""Compare the rolling statistics of the prefix sums with the pandas `groupby().rolling()` statistics.
+
+The series have very different magnitudes and are stored one after the other, so the statistics of a low-variance
+series that follows a high-variance one check that the precision of a series does not depend on the series before it.
+The script fails if the relative error of a statistic exceeds the tolerance.
+
+Usage:
+    python benchmarks/rolling_benchmark.py --num-days 365 --num-series 76
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = Path(__file__).parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from src.data.time_series_feat.rolling import DEFAULT_WINDOWS, compute_rolling_stats, rolling_column_names
+
+WINDOWS = {**DEFAULT_WINDOWS, "min": [[1, 24]], "max": [[1, 24]]}
+# Tolerance of the relative error of the statistics, relative to the scale of their series.
+TOLERANCE = 1e-8
+
+
+def make_series(num_days: int, num_series: int, seed: int = 42) -> tuple[np.ndarray, np.ndarray]:
+    """Build hourly series of magnitudes from 1e-1 to 1e6 and a noise of 5%, in a random order, with a few gaps.
+
+    The first two series are a high-variance series followed by a series of a much lower variance.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The values and the series ids, sorted by series and then by time.
+    """
+    rng = np.random.default_rng(seed)
+    num_values = 24 * num_days
+    levels = np.concatenate([[1e5, 0.5], 10 ** rng.uniform(-1, 6, num_series - 2)])
+    scales = np.concatenate([[3e4, 1e-3], 0.05 * levels[2:]])
+
+    values = np.concatenate([rng.normal(level, scale, num_values) for level, scale in zip(levels, scales)])
+    values[rng.integers(0, len(values), len(values) // 1000)] = np.nan
+    group_ids = np.repeat(np.arange(num_series), num_values)
+
+    return values, group_ids
+
+
+def expected_stats(values: np.ndarray, group_ids: np.ndarray) -> pd.DataFrame:
+    """Compute the rolling statistics with pandas, series by series."""
+    grouped = pd.Series(values).groupby(group_ids)
+    columns = {}
+    for stat, stat_windows in WINDOWS.items():
+        for lag, window_length in stat_windows:
+            rolling = grouped.shift(lag).groupby(group_ids).rolling(window_length)
+            columns[len(columns)] = getattr(rolling, stat)().reset_index(level=0, drop=True).sort_index()
+
+    return pd.DataFrame(columns).set_axis(rolling_column_names("y", WINDOWS), axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-days", type=int, default=365)
+    parser.add_argument("--num-series", type=int, default=76)
+    cli_args = parser.parse_args()
+
+    values, group_ids = make_series(cli_args.num_days, cli_args.num_series)
+    print(f"Input: {cli_args.num_series} series, {len(values)} rows")
+
+    t1 = time.perf_counter()
+    stats = compute_rolling_stats(values, group_ids, windows=WINDOWS)
+    prefix_seconds = time.perf_counter() - t1
+    t1 = time.perf_counter()
+    expected = expected_stats(values, group_ids)
+    pandas_seconds = time.perf_counter() - t1
+
+    # The errors are relative to the noise of the series, the scale of its standard deviation.
+    series_scales = pd.Series(values).groupby(group_ids).std().to_numpy()[group_ids]
+    print(f"{'statistic':<24}{'max rel error':>16}{'NaN mismatches':>16}")
+    failures = []
+    for column, name in enumerate(expected.columns):
+        expected_values = expected[name].to_numpy()
+        num_na_mismatches = int((np.isnan(stats[:, column]) != np.isnan(expected_values)).sum())
+        errors = np.abs(stats[:, column] - expected_values) / series_scales
+        max_error = np.nanmax(errors)
+        print(f"{name:<24}{max_error:>16.2e}{num_na_mismatches:>16}")
+        if max_error > TOLERANCE or num_na_mismatches > 0:
+            failures.append(name)
+
+    print(f"Prefix sums: {prefix_seconds:.3f} seconds, pandas: {pandas_seconds:.3f} seconds")
+    if len(failures) > 0:
+        sys.exit(f"The rolling statistics {failures} do not match pandas.")
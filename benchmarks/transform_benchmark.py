@@ -0,0 +1,74 @@
+"""Compare the single-pass transformation with the chain of single-step transformations.
+
+Usage:
+    python benchmarks/transform_benchmark.py --num-rows 2000000 --repeat 3
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = Path(__file__).parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from src.feature_pipeline.src import transform
+
+
+def make_extracted_data(num_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Build a synthetic frame shaped like the output of the extract step, with ~1% duplicated rows."""
+    rng = np.random.default_rng(seed)
+    areas = np.array(list(transform.AREA_MAPPINGS.keys()))
+    hours = pd.date_range("2020-06-30 22:00", periods=num_rows // 50 + 1, freq="H")
+
+    hour_utc = hours[rng.integers(0, len(hours), num_rows)]
+    data = pd.DataFrame(
+        {
+            "HourUTC": hour_utc.strftime("%Y-%m-%d %H:%M"),
+            "HourDK": (hour_utc + pd.Timedelta(hours=2)).strftime("%Y-%m-%d %H:%M"),
+            "PriceArea": areas[rng.integers(0, len(areas), num_rows)],
+            "ConsumerType_DE35": rng.choice([111, 112, 119, 121, 122, 123, 130, 211, 212, 215], num_rows),
+            "TotalCon": rng.gamma(2.0, 500.0, num_rows),
+        }
+    )
+    duplicates = data.sample(frac=0.01, random_state=seed)
+
+    return pd.concat([data, duplicates], ignore_index=True)
+
+
+def measure(data: pd.DataFrame, single_pass: bool, repeat: int) -> tuple[pd.DataFrame, float, float]:
+    """Return the result, the best wall time in seconds and the peak traced memory in MB of a transformation."""
+    best_seconds = float("inf")
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        result = transform.transform(data, single_pass=single_pass)
+        best_seconds = min(best_seconds, time.perf_counter() - t1)
+
+    tracemalloc.start()
+    transform.transform(data, single_pass=single_pass)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, best_seconds, peak_bytes / 1024**2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    cli_args = parser.parse_args()
+
+    data = make_extracted_data(cli_args.num_rows)
+    print(f"Input: {len(data)} rows, {data.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+
+    chained, chained_seconds, chained_peak_mb = measure(data, single_pass=False, repeat=cli_args.repeat)
+    fused, fused_seconds, fused_peak_mb = measure(data, single_pass=True, repeat=cli_args.repeat)
+    pd.testing.assert_frame_equal(chained, fused)
+
+    print(f"{'mode':<12}{'seconds':>10}{'peak MB':>10}")
+    print(f"{'chained':<12}{chained_seconds:>10.3f}{chained_peak_mb:>10.1f}")
+    print(f"{'single-pass':<12}{fused_seconds:>10.3f}{fused_peak_mb:>10.1f}")
+    print(f"Speedup: {chained_seconds / fused_seconds:.2f}x")
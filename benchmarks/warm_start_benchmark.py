@@ -0,0 +1,75 @@
+"""Compare the warm-start retraining with the full refit of the best model on the entire dataset.
+
+The model is fitted on the training data, then updated with the following test window, either by continuing the
+boosting of its booster on the test window or by refitting it on the training data and the test window. Both are
+evaluated on the next window, as the future forecasts of the training task.
+
+Usage:
+    python benchmarks/warm_start_benchmark.py --num-days 120 --num-series 20 --fh 24
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+CURRENT_DIR = Path(__file__).parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from benchmarks.direct_benchmark import make_panel_data
+from sktime.forecasting.model_selection import temporal_train_test_split
+from src.training_pipeline.src.metrics import compute_metrics
+from src.training_pipeline.src.models import STRATEGIES, build_model
+from src.training_pipeline.src.train import train_model
+from src.training_pipeline.src.warm_start import update_forecaster
+
+
+def measure(strategy: str, y: pd.DataFrame, X: pd.DataFrame, fh: int, n_estimators: int) -> dict[str, dict]:
+    """Time the full refit and the warm start of a strategy, and evaluate both on the last `fh` hours."""
+    y_all, y_eval, X_all, X_eval = temporal_train_test_split(y, X, test_size=fh)
+    y_train, y_test, X_train, X_test = temporal_train_test_split(y_all, X_all, test_size=fh)
+    config = {
+        "strategy": strategy,
+        "forecaster__estimator__n_estimators": n_estimators,
+        "forecaster__estimator__verbosity": -1,
+    }
+
+    results = {}
+    t1 = time.perf_counter()
+    model = train_model(build_model(dict(config)), y_all, X_all, fh=fh)
+    results["full"] = {"seconds": time.perf_counter() - t1, "model": model}
+
+    model = train_model(build_model(dict(config)), y_train, X_train, fh=fh)
+    t1 = time.perf_counter()
+    model = update_forecaster(model, y_train, X_train, y_test, X_test, fh=fh)
+    results["warm_start"] = {"seconds": time.perf_counter() - t1, "model": model}
+
+    for result in results.values():
+        metrics, _ = compute_metrics(y_eval, result.pop("model").predict(X=X_eval))
+        result.update(metrics)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-days", type=int, default=120)
+    parser.add_argument("--num-series", type=int, default=20)
+    parser.add_argument("--fh", type=int, default=24)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    cli_args = parser.parse_args()
+
+    y, X = make_panel_data(cli_args.num_days, cli_args.num_series)
+    print(f"Input: {y.index.droplevel(-1).nunique()} series, {len(y)} rows")
+
+    print(f"{'strategy':<12}{'retrain':<12}{'seconds':>10}{'MAPE':>10}{'RMSPE':>10}")
+    for strategy in STRATEGIES:
+        results = measure(strategy, y, X, cli_args.fh, cli_args.n_estimators)
+        for retrain_mode, result in results.items():
+            print(
+                f"{strategy:<12}{retrain_mode:<12}{result['seconds']:>10.2f}"
+                f"{result['MAPE']:>10.4f}{result['RMSPE']:>10.4f}"
+            )
+        speedup = results["full"]["seconds"] / results["warm_start"]["seconds"]
+        print(f"Retraining speedup of the {strategy} strategy: {speedup:.1f}x")
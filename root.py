@@ -8,10 +8,22 @@ DATA_DIR = ROOT_DIR / "data"
 BACKUP_DIR = DATA_DIR / "backup"
 CACHED_DIR = DATA_DIR / "cached"
 CACHED_DIR.mkdir(parents=True, exist_ok=True)
+ARTIFACT_CACHE_DIR = CACHED_DIR / "artifacts"
+ARTIFACT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+PANEL_CACHE_DIR = CACHED_DIR / "panels"
+PANEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+HPO_CACHE_DIR = CACHED_DIR / "hpo"
+HPO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+LGBM_DATASET_CACHE_DIR = CACHED_DIR / "lgbm"
+LGBM_DATASET_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+RENDER_CACHE_DIR = CACHED_DIR / "renders"
+RENDER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 RAW_DIR = DATA_DIR / "raw"
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 PROCESSED_DIR = DATA_DIR / "processed"
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+PARTITIONED_DIR = DATA_DIR / "partitioned"
+PARTITIONED_DIR.mkdir(parents=True, exist_ok=True)
 
 SRC_DIR = ROOT_DIR / "src"
 MODEL_DIR = ROOT_DIR / "models"
@@ -19,3 +31,5 @@ MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
 OUTPUT_DIR = ROOT_DIR / "output"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+PROFILE_DIR = OUTPUT_DIR / "profiles"
+PROFILE_DIR.mkdir(parents=True, exist_ok=True)
@@ -3,13 +3,13 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-import time
 from clearml import Dataset
 
 from configs.configs import DATASET_NAME, PROJECT_NAME
 from root import PROCESSED_DIR
 import pandas as pd
 from src.batch_prediction_pipeline.src.data import load_data
+from src.utils import profiling, storage
 from src.utils.task_utils import get_task_artifacts, save_json
 from src.utils.logger import get_logger
 
@@ -27,38 +27,39 @@ def predict(task, data_task_id: str, training_task_id: str, fh: int = 24):
         end_datetime (Optional[datetime], optional): end datetime used for extracting features for predictions. If None is provided, it will try to load it from the cached feature_pipeline_metadata.json file.
     """
     logger.info("Loading data from feature store...")
-    t1 = time.time()
-    (X, y), metadata = load_data(task_id=data_task_id)
-    logger.info("Successfully loaded data from feature store in %.2f seconds.", time.time() - t1)
+    with profiling.stage("load_data") as stage:
+        (X, y), metadata = load_data(task_id=data_task_id)
+        stage.num_rows = len(X)
+    logger.info("Successfully loaded data from feature store in %.2f seconds.", stage.wall_seconds)
 
     logger.info("Loading model from model registry...")
-    t1 = time.time()
-    model = load_model_from_model_registry(task_id=training_task_id)
-    logger.info("Successfully loaded model from model registry in %.2f seconds.", time.time() - t1)
+    with profiling.stage("load_model") as stage:
+        model = load_model_from_model_registry(task_id=training_task_id)
+    logger.info("Successfully loaded model from model registry in %.2f seconds.", stage.wall_seconds)
 
     logger.info("Making predictions...")
-    t1 = time.time()
-    predictions = forecast(model, X, fh=fh)
-    metadata["predictions_datetime_utc_start"] = (
-        predictions.index.get_level_values(level="datetime_utc").min().strftime(metadata["datetime_format"])
-    )
-    metadata["predictions_datetime_utc_end"] = (
-        predictions.index.get_level_values(level="datetime_utc").max().strftime(metadata["datetime_format"])
-    )
-    logger.info(
-        "Forecasted energy consumption from %s to %s.",
-        metadata["predictions_datetime_utc_start"],
-        metadata["predictions_datetime_utc_end"],
-    )
-    logger.info("Successfully made predictions in %.2f seconds.", time.time() - t1)
+    with profiling.stage("forecast", num_rows=len(X)) as stage:
+        predictions = forecast(model, X, fh=fh)
+        metadata["predictions_datetime_utc_start"] = (
+            predictions.index.get_level_values(level="datetime_utc").min().strftime(metadata["datetime_format"])
+        )
+        metadata["predictions_datetime_utc_end"] = (
+            predictions.index.get_level_values(level="datetime_utc").max().strftime(metadata["datetime_format"])
+        )
+        logger.info(
+            "Forecasted energy consumption from %s to %s.",
+            metadata["predictions_datetime_utc_start"],
+            metadata["predictions_datetime_utc_end"],
+        )
+    logger.info("Successfully made predictions in %.2f seconds.", stage.wall_seconds)
 
     logger.info("Saving predictions...")
-    t1 = time.time()
-    ds = save(task, X, y, predictions, metadata)
-    metadata["predictions_dataset_id"] = ds.id
-    task.upload_artifact("metadata", metadata)
-    task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
-    logger.info("Successfully saved predictions in %.2f seconds.", time.time() - t1)
+    with profiling.stage("save") as stage:
+        ds = save(task, X, y, predictions, metadata)
+        metadata["predictions_dataset_id"] = ds.id
+        task.upload_artifact("metadata", metadata)
+        task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
+    logger.info("Successfully saved predictions in %.2f seconds.", stage.wall_seconds)
 
 
 def load_model_from_model_registry(task_id: str):
@@ -115,11 +116,11 @@ def forecast(model, X: pd.DataFrame, fh: int = 24):
 
 def save(task, X: pd.DataFrame, y: pd.DataFrame, predictions: pd.DataFrame, metadata: dict):
     """Save the input data, target data, and predictions."""
-    task.upload_artifact("X", X)
-    task.upload_artifact("y", y)
-    task.upload_artifact("predictions", predictions)
+    task.upload_artifact("X", X, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+    task.upload_artifact("y", y, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+    task.upload_artifact("predictions", predictions, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
 
-    predictions.to_csv(PROCESSED_DIR / "predictions.csv", index_label=["area", "consumer_type", "datetime_utc"])
+    predictions_path = storage.save_frame(predictions, PROCESSED_DIR / storage.file_name("predictions"))
     save_json(metadata, PROCESSED_DIR / "batch_metadata.json")
 
     ds = Dataset.create(
@@ -135,7 +136,7 @@ def save(task, X: pd.DataFrame, y: pd.DataFrame, predictions: pd.DataFrame, meta
         ],
     )
 
-    ds.add_files(path=PROCESSED_DIR / "predictions.csv", verbose=True)
+    ds.add_files(path=predictions_path, verbose=True)
     ds.add_files(path=PROCESSED_DIR / "batch_metadata.json", verbose=True)
 
     ds.upload(verbose=True)
@@ -1,12 +1,15 @@
 from typing import Any
 import pandas as pd
+from src.utils import panel, schema
 from src.utils.logger import get_logger
 from src.utils.task_utils import get_task_artifacts
 
 logger = get_logger("logs", __name__)
 
 
-def load_data(task_id: str, target: str = "energy_consumption") -> tuple[tuple[pd.DataFrame, ...], dict[str, Any]]:
+def load_data(
+    task_id: str, target: str = "energy_consumption", float32: bool = False
+) -> tuple[tuple[pd.DataFrame, ...], dict[str, Any]]:
     """Load data for a given time range from the feature store.
 
     Args:
@@ -15,6 +18,7 @@ def load_data(task_id: str, target: str = "energy_consumption") -> tuple[tuple[p
         start_datetime: Start datetime.
         end_datetime: End datetime.
         target: Name of the target feature.
+        float32: Cast the target and the float features to float32.
 
     Returns:
         Tuple of exogenous variables and the time series to be forecasted.
@@ -26,7 +30,7 @@ def load_data(task_id: str, target: str = "energy_consumption") -> tuple[tuple[p
         "Loading features from %s to %s...", metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]
     )
 
-    X, y = prepare_data(data, target=target)
+    X, y = prepare_data(data, target=target, float32=float32, cache_key=task_id)
 
     for char in ["X", "y"]:
         arr = locals()[char]
@@ -42,7 +46,9 @@ def load_data(task_id: str, target: str = "energy_consumption") -> tuple[tuple[p
     return (X, y), metadata
 
 
-def prepare_data(data: pd.DataFrame, target: str = "energy_consumption") -> tuple[pd.DataFrame, pd.DataFrame]:
+def prepare_data(
+    data: pd.DataFrame, target: str = "energy_consumption", float32: bool = False, cache_key: str | None = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     Structure the data for training:
     - Set the index as is required by sktime.
@@ -50,9 +56,9 @@ def prepare_data(data: pd.DataFrame, target: str = "energy_consumption") -> tupl
     - Prepare the time series to be forecasted.
     - Split the data into train and test sets.
     """
-    # Set the index as is required by sktime.
-    data["datetime_utc"] = pd.PeriodIndex(data["datetime_utc"], freq="H")
-    data = data.set_index(["area", "consumer_type", "datetime_utc"]).sort_index()
+    # Set the index as is required by sktime, with compact dtypes.
+    data = panel.build_panel(data, cache_key=cache_key, float32=float32)
+    schema.memory_report(data, stage="prepare_data")
 
     # Prepare exogenous variables.
     X = data.drop(columns=[target])
@@ -1,5 +1,4 @@
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
@@ -9,6 +8,7 @@ sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
 from src.batch_prediction_pipeline.src import batch
+from src.utils import profiling
 from src.utils.logger import get_logger
 
 logger = get_logger("logs", __name__)
@@ -28,20 +28,23 @@ if __name__ == "__main__":
         "forecasting_horizon": 24,
         "data_task_id": "8568e970ffd440ad9070de0f314f37b7",
         "training_task_id": "fcafa4c31b3c4b31bb184594b5b63cea",
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     # task.execute_remotely()
 
-    logger.info("Starting batch prediction task...")
-    t1 = time.time()
-    # Batch prediction.
-    data_task_id = args["data_task_id"]
-    training_task_id = args["training_task_id"]
-    fh = args["forecasting_horizon"]
-    batch.predict(task, data_task_id=data_task_id, training_task_id=training_task_id, fh=fh)
-    logger.info("Successfully ran batch prediction task in %.2f seconds.", time.time() - t1)
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Starting batch prediction task...")
+        with profiling.stage("batch") as stage:
+            # Batch prediction.
+            data_task_id = args["data_task_id"]
+            training_task_id = args["training_task_id"]
+            fh = args["forecasting_horizon"]
+            batch.predict(task, data_task_id=data_task_id, training_task_id=training_task_id, fh=fh)
+        logger.info("Successfully ran batch prediction task in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
@@ -1,12 +1,28 @@
 import pandas as pd
 from sklearn.pipeline import Pipeline
-from src.feature_pipeline.time_series_feat import creator, lag_generator
+from src.data.time_series_feat import creator, lag_generator, rolling
 
+SERIES_COLUMNS = ["area", "consumer_type"]
+TAIL_COLUMNS = ["datetime_utc", "area", "consumer_type", "energy_consumption"]
 
-def create_feature(data: pd.DataFrame, lag_time: tuple[int, ...], warn_on_na: bool, drop_na: bool):
+
+def create_feature(
+    data: pd.DataFrame,
+    lag_time: tuple[int, ...],
+    warn_on_na: bool,
+    drop_na: bool,
+    rolling_windows: dict[str, list[list[int]]] | None = None,
+):
     preprocessing_pipeline = Pipeline(
         [
             ("time_feature_creator", creator.TimeSeriesFeatureCreator()),
+            (
+                "rolling_stats_generator",
+                rolling.RollingStatsGenerator(
+                    windows=rolling_windows,
+                    warn_on_na=warn_on_na,
+                ),
+            ),
             (
                 "lag_feature_generator",
                 lag_generator.LagFeatureGenerator(
@@ -21,3 +37,66 @@ def create_feature(data: pd.DataFrame, lag_time: tuple[int, ...], warn_on_na: bo
     data = preprocessing_pipeline.fit_transform(data)
 
     return data
+
+
+def create_feature_incremental(
+    data: pd.DataFrame,
+    tail: pd.DataFrame | None,
+    lag_time: tuple[int, ...],
+    warn_on_na: bool,
+    drop_na: bool,
+    rolling_windows: dict[str, list[list[int]]] | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Create the features of newly appended hours only, using the tail buffer of every series as history context.
+
+    Args:
+        data: The new rows, with a `datetime_utc` column.
+        tail: The tail buffer returned by the previous run, if any. The new rows must directly follow it in time.
+        lag_time: The lags to compute.
+        warn_on_na: Warn about missing feature values.
+        drop_na: Drop the new rows with missing feature values.
+        rolling_windows: The rolling windows to compute. Defaults to the windows of `RollingStatsGenerator`.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The features of the new rows, indexed by `datetime_utc`, and the tail buffer
+            to pass to the next run.
+    """
+    context = data[TAIL_COLUMNS]
+    if tail is not None:
+        # On overlapping hours, e.g. when a window is processed again, the new values win.
+        context = pd.concat([tail[TAIL_COLUMNS], context], ignore_index=True)
+        context = context.drop_duplicates(subset=["datetime_utc", *SERIES_COLUMNS], keep="last")
+
+    features = create_feature(
+        context.reset_index(drop=True), lag_time, warn_on_na=False, drop_na=False, rolling_windows=rolling_windows
+    )
+
+    new_keys = pd.MultiIndex.from_frame(data[["datetime_utc", *SERIES_COLUMNS]])
+    feature_keys = pd.MultiIndex.from_arrays([features.index, *(features[column] for column in SERIES_COLUMNS)])
+    features = features[feature_keys.isin(new_keys)]
+
+    if warn_on_na:
+        for column, num_na in features.isna().sum().items():
+            if num_na > 0:
+                print(f"Warning: {num_na} NaN values detected in {column} column.")
+    if drop_na:
+        print("Automatically dropping rows with NaN values.")
+        features = features.dropna()
+
+    return features, build_tail(context, max_lookback(lag_time, rolling_windows))
+
+
+def max_lookback(lag_time: tuple[int, ...], rolling_windows: dict[str, list[list[int]]] | None = None) -> int:
+    """Compute the number of past hours the features of an hour depend on."""
+    rolling_windows = rolling_windows if rolling_windows is not None else rolling.DEFAULT_WINDOWS
+    spans = [lag + window_length - 1 for windows in rolling_windows.values() for lag, window_length in windows]
+
+    return max([*lag_time, *spans, 0])
+
+
+def build_tail(data: pd.DataFrame, lookback: int) -> pd.DataFrame:
+    """Keep the last `lookback` hours of every series, the history needed to compute the features of the next hours."""
+    tail = data[TAIL_COLUMNS].sort_values(by="datetime_utc", kind="stable")
+    tail = tail.groupby(SERIES_COLUMNS, sort=False).tail(lookback)
+
+    return tail.sort_values(by=[*SERIES_COLUMNS, "datetime_utc"], ignore_index=True)
@@ -1,19 +1,19 @@
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
-from src.data import create_feature
 
-CURRENT_DIR = Path(__file__).parent.parent.parent.parent
+CURRENT_DIR = Path(__file__).parent.parent.parent
 sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
+from src.data import create_feature
 from src.feature_pipeline.src import load
+from src.utils import profiling, storage
 from src.utils.logger import get_logger
 from src.utils.task_utils import get_task_artifacts
 
-logger = get_logger(__name__)
+logger = get_logger("logs", __name__)
 
 if __name__ == "__main__":
     task = Task.init(
@@ -28,37 +28,65 @@ if __name__ == "__main__":
         "lag_time": (1, 2, 3, 24, 168, 720),
         "warn_on_na": True,
         "drop_na": False,
+        "rolling_windows": {
+            "mean": [[1, 24], [1, 48], [1, 72]],
+            "std": [[1, 24], [1, 48], [1, 72]],
+        },
+        "incremental": True,
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     task.execute_remotely()
 
-    logger.info("Starting to create features ...")
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Starting to create features ...")
+
+        task_id = args["artifacts_task_id"]
+        lag_time = tuple(args["lag_time"])
+        warn_on_na = args["warn_on_na"]
+        drop_na = args["drop_na"]
+        rolling_windows = args["rolling_windows"]
+        incremental = args["incremental"]
 
-    task_id = args["artifacts_task_id"]
-    lag_time = args["lag_time"]
-    warn_on_na = args["warn_on_na"]
-    drop_na = args["drop_na"]
+        with profiling.stage("load_artifacts"):
+            task_artifacts = get_task_artifacts(task_id=task_id)
+            data = task_artifacts["data"].get()
+            metadata = task_artifacts["metadata"].get()
+        metadata["lag_time"] = lag_time
+        metadata["warn_on_na"] = warn_on_na
+        metadata["drop_na"] = drop_na
+        metadata["rolling_windows"] = rolling_windows
+        metadata["incremental_features"] = incremental
+        parent_datasets_id = metadata["feature_store_id"]
 
-    task_artifacts = get_task_artifacts(task_id=task_id)
-    data = task_artifacts["data"].get()
-    metadata = task_artifacts["metadata"].get()
-    metadata["lag_time"] = lag_time
-    metadata["warn_on_na"] = warn_on_na
-    metadata["drop_na"] = drop_na
+        with profiling.stage("create_feature") as stage:
+            if incremental:
+                # Only the new hours are computed, with the tail of every series kept in the feature store as history.
+                feature_tail = load.load_feature_tail(parent_datasets_id)
+                logger.info("Using a feature tail buffer of %d rows.", 0 if feature_tail is None else len(feature_tail))
+                data, feature_tail = create_feature.create_feature_incremental(
+                    data, feature_tail, lag_time, warn_on_na, drop_na, rolling_windows
+                )
+            else:
+                lookback = create_feature.max_lookback(lag_time, rolling_windows)
+                feature_tail = create_feature.build_tail(data, lookback)
+                data = create_feature.create_feature(data.copy(), lag_time, warn_on_na, drop_na, rolling_windows)
+            data = data.reset_index()
+            stage.num_rows = len(data)
+        logger.info("Successfully created features for %d rows in %.2f seconds.", len(data), stage.wall_seconds)
 
-    t1 = time.time()
-    data = create_feature.create_feature(data, lag_time, warn_on_na, drop_na)
-    logger.info("Successfully created features in %.2f seconds.", time.time() - t1)
-    ds = load.to_feature_store(data, metadata, [task_artifacts["feature_store"].get()])
-    logger.info("Successfully loaded data to the feature store in %.2f seconds.", time.time() - t1)
+        with profiling.stage("to_feature_store", num_rows=len(data)) as stage:
+            ds, metadata = load.to_feature_store(data, metadata, parent_datasets_id, feature_tail=feature_tail)
+        logger.info("Successfully loaded data to the feature store in %.2f seconds.", stage.wall_seconds)
 
-    t1 = time.time()
-    task.upload_artifact("feature_store", ds.id)
-    task.upload_artifact("data", data)
-    task.upload_artifact("metadata", metadata)
-    logger.info("Successfully uploaded data and metadata in %.2f seconds.", time.time() - t1)
+        with profiling.stage("upload_artifacts", num_rows=len(data)) as stage:
+            task.upload_artifact("feature_store", ds.id)
+            task.upload_artifact("data", data, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+            task.upload_artifact("metadata", metadata)
+        logger.info("Successfully uploaded data and metadata in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
@@ -1,6 +1,25 @@
+import hashlib
+from collections import OrderedDict
+
 import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 
+CALENDAR_DTYPES = {
+    "hour": "int8",
+    "day": "int8",
+    "week": "int8",
+    "dayofweek": "int8",
+    "month": "int8",
+    "daysinmonth": "int8",
+    "quarter": "int8",
+    "year": "int16",
+    "dayofyear": "int16",
+}
+# Number of calendar tables kept in memory, e.g. for the train and test splits of a few datasets.
+CALENDAR_CACHE_SIZE = 8
+
+_calendar_tables: OrderedDict[str, pd.DataFrame] = OrderedDict()
+
 
 class TimeSeriesFeatureCreator(BaseEstimator, TransformerMixin):
     def fit(self, X: pd.DataFrame, y=None):
@@ -13,15 +32,52 @@ class TimeSeriesFeatureCreator(BaseEstimator, TransformerMixin):
         # Convert index to DatetimeIndex
         processed_df.index = pd.to_datetime(processed_df.index)
 
-        # Create time series features based on time series index
-        processed_df["hour"] = processed_df.index.hour
-        processed_df["day"] = processed_df.index.day
-        processed_df["week"] = processed_df.index.isocalendar().week
-        processed_df["dayofweek"] = processed_df.index.dayofweek
-        processed_df["month"] = processed_df.index.month
-        processed_df["daysinmonth"] = processed_df.index.daysinmonth
-        processed_df["quarter"] = processed_df.index.quarter
-        processed_df["year"] = processed_df.index.year
-        processed_df["dayofyear"] = processed_df.index.dayofyear
+        # All the series share the same timestamps, so compute the features once per unique timestamp and broadcast
+        # them to the rows through the codes of the timestamps.
+        codes, unique_timestamps = pd.factorize(processed_df.index)
+        if (codes == -1).any():
+            raise ValueError("The index must not contain missing timestamps.")
+
+        table = calendar_table(unique_timestamps)
+        for column in CALENDAR_DTYPES:
+            processed_df[column] = table[column].to_numpy()[codes]
 
         return processed_df
+
+
+def calendar_table(timestamps: pd.DatetimeIndex) -> pd.DataFrame:
+    """Compute the calendar features of unique timestamps, memoized on the timestamps.
+
+    Args:
+        timestamps: The unique timestamps.
+
+    Returns:
+        pd.DataFrame: One row per timestamp, in the same order, with the compact integer features of `CALENDAR_DTYPES`.
+    """
+    digest = hashlib.sha256(timestamps.asi8.tobytes())
+    digest.update(str(timestamps.tz).encode())
+    key = digest.hexdigest()
+
+    if key in _calendar_tables:
+        _calendar_tables.move_to_end(key)
+        return _calendar_tables[key]
+
+    table = pd.DataFrame(
+        {
+            "hour": timestamps.hour,
+            "day": timestamps.day,
+            "week": timestamps.isocalendar().week.to_numpy(),
+            "dayofweek": timestamps.dayofweek,
+            "month": timestamps.month,
+            "daysinmonth": timestamps.daysinmonth,
+            "quarter": timestamps.quarter,
+            "year": timestamps.year,
+            "dayofyear": timestamps.dayofyear,
+        }
+    ).astype(CALENDAR_DTYPES)
+
+    _calendar_tables[key] = table
+    if len(_calendar_tables) > CALENDAR_CACHE_SIZE:
+        _calendar_tables.popitem(last=False)
+
+    return table
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from pandas.tseries.frequencies import infer_freq
 from sklearn.base import BaseEstimator, TransformerMixin
@@ -10,11 +11,13 @@ class LagFeatureGenerator(BaseEstimator, TransformerMixin):
         warn_on_na: bool = False,
         drop_na: bool = False,
         freq_type: str = "H",
+        dtype: str = "float64",
     ):
         self.lags = lags
         self.warn_on_na = warn_on_na
         self.drop_na = drop_na
         self.freq_type = freq_type
+        self.dtype = dtype
         self.group_cols = ["area", "consumer_type"]
 
     def fit(self, X: pd.DataFrame, y=None):
@@ -27,31 +30,97 @@ class LagFeatureGenerator(BaseEstimator, TransformerMixin):
         return False
 
     def transform(self, X: pd.DataFrame) -> pd.DataFrame:
-        lagged_data = X.copy()
-        lagged_data = lagged_data.sort_index(ascending=True)
+        lagged_data = X.sort_index(ascending=True)
 
         if not self.__check_freq(lagged_data):
             raise ValueError(f"Data must be indexed at {self.freq_type} frequency.")
 
-        laf_features = [lagged_data]
-        for lag in self.lags:
-            lagged_column = (
-                lagged_data.groupby(self.group_cols)
-                .shift(lag)
-                .rename(columns={"energy_consumption": f"energy_consumption_Lag_{lag}"})
-            )[f"energy_consumption_Lag_{lag}"]
+        # Sort the rows by series once, keeping the time order inside every series, and compute all the lags over
+        # the contiguous buffer of the sorted values.
+        group_ids, order = group_series(lagged_data, self.group_cols)
+        sorted_lags = compute_lags(
+            lagged_data["energy_consumption"].to_numpy(dtype=self.dtype)[order],
+            group_ids[order],
+            lags=self.lags,
+            dtype=self.dtype,
+        )
+        lag_values = np.empty_like(sorted_lags)
+        lag_values[order] = sorted_lags
+        # Rows with a missing group key do not belong to any series.
+        lag_values[group_ids == -1] = np.nan
 
-            check_na = lagged_column.isna()
-            if self.warn_on_na and check_na.any():
-                num_na = check_na.sum()
-                print(f"Warning: {num_na} NaN values detected in energy_consumption_Lag_{lag} column.")
+        lag_columns = [f"energy_consumption_Lag_{lag}" for lag in self.lags]
+        lag_features = pd.DataFrame(lag_values, index=lagged_data.index, columns=lag_columns)
 
-            laf_features.append(lagged_column)
+        if self.warn_on_na:
+            for lag_column, num_na in zip(lag_columns, np.isnan(lag_values).sum(axis=0)):
+                if num_na > 0:
+                    print(f"Warning: {num_na} NaN values detected in {lag_column} column.")
 
-        lagged_data = pd.concat(laf_features, axis=1)
+        lagged_data = pd.concat([lagged_data, lag_features], axis=1)
 
         if self.drop_na:
             print("Automatically dropping rows with NaN values.")
             lagged_data = lagged_data.dropna()
 
         return lagged_data
+
+
+def compute_lags(
+    values: np.ndarray, group_ids: np.ndarray, lags: tuple[int, ...], dtype: str = "float64"
+) -> np.ndarray:
+    """Compute the lags of series stored contiguously in a single buffer.
+
+    Args:
+        values: The values of all the series, sorted by series and then by time.
+        group_ids: The id of the series of every value. Rows of the same series must be contiguous.
+        lags: The lags to compute.
+        dtype: The dtype of the output.
+
+    Returns:
+        np.ndarray: A `(len(values), len(lags))` array whose columns are the lags. Values without enough history in
+            their series are NaN.
+    """
+    num_values = len(values)
+    positions = positions_in_groups(group_ids)
+
+    # Fortran order keeps every lag column contiguous.
+    lag_values = np.full((num_values, len(lags)), np.nan, dtype=dtype, order="F")
+    for column, lag in enumerate(lags):
+        if lag < num_values:
+            lag_values[lag:, column] = values[: num_values - lag]
+        lag_values[positions < lag, column] = np.nan
+
+    return lag_values
+
+
+def group_series(X: pd.DataFrame, group_cols: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Compute the series id of every row and the stable order sorting the rows by series.
+
+    Args:
+        X: The data, sorted by time.
+        group_cols: The columns identifying a series.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The series ids, -1 for rows with a missing key, and the order that makes the rows
+            of every series contiguous while keeping them sorted by time.
+    """
+    group_ids = X.groupby(group_cols, sort=False).ngroup().to_numpy()
+    order = np.argsort(group_ids, kind="stable")
+
+    return group_ids, order
+
+
+def positions_in_groups(group_ids: np.ndarray) -> np.ndarray:
+    """Compute the position of every row inside its group, for groups stored contiguously."""
+    num_values = len(group_ids)
+    if num_values == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    is_group_start = np.empty(num_values, dtype=bool)
+    is_group_start[0] = True
+    np.not_equal(group_ids[1:], group_ids[:-1], out=is_group_start[1:])
+    group_start_positions = np.flatnonzero(is_group_start)
+    group_lengths = np.diff(np.append(group_start_positions, num_values))
+
+    return np.arange(num_values) - np.repeat(group_start_positions, group_lengths)
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import infer_freq
+from sklearn.base import BaseEstimator, TransformerMixin
+from src.data.time_series_feat.lag_generator import group_series, positions_in_groups
+
+# Same windows as the `WindowSummarizer` of the forecaster: [lag, window_length] pairs, where the window of a row ends
+# `lag` steps before it.
+DEFAULT_WINDOWS = {
+    "mean": [[1, 24], [1, 48], [1, 72]],
+    "std": [[1, 24], [1, 48], [1, 72]],
+}
+SUPPORTED_STATS = ("mean", "std", "min", "max")
+
+
+class RollingStatsGenerator(BaseEstimator, TransformerMixin):
+    def __init__(
+        self,
+        windows: dict[str, list[list[int]]] | None = None,
+        target: str = "energy_consumption",
+        warn_on_na: bool = False,
+        drop_na: bool = False,
+        freq_type: str = "H",
+        dtype: str = "float64",
+    ):
+        self.windows = windows
+        self.target = target
+        self.warn_on_na = warn_on_na
+        self.drop_na = drop_na
+        self.freq_type = freq_type
+        self.dtype = dtype
+        self.group_cols = ["area", "consumer_type"]
+
+    def fit(self, X: pd.DataFrame, y=None):
+        return self
+
+    def __check_freq(self, X: pd.DataFrame) -> bool:
+        freq = infer_freq(X.index.drop_duplicates())
+        if freq == self.freq_type:
+            return True
+        return False
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        windows = self.windows if self.windows is not None else DEFAULT_WINDOWS
+        rolling_data = X.sort_index(ascending=True)
+
+        if not self.__check_freq(rolling_data):
+            raise ValueError(f"Data must be indexed at {self.freq_type} frequency.")
+
+        group_ids, order = group_series(rolling_data, self.group_cols)
+        sorted_stats = compute_rolling_stats(
+            rolling_data[self.target].to_numpy(dtype=np.float64)[order],
+            group_ids[order],
+            windows=windows,
+            dtype=self.dtype,
+        )
+        stat_values = np.empty_like(sorted_stats)
+        stat_values[order] = sorted_stats
+        # Rows with a missing group key do not belong to any series.
+        stat_values[group_ids == -1] = np.nan
+
+        stat_columns = rolling_column_names(self.target, windows)
+        stat_features = pd.DataFrame(stat_values, index=rolling_data.index, columns=stat_columns)
+
+        if self.warn_on_na:
+            for stat_column, num_na in zip(stat_columns, np.isnan(stat_values).sum(axis=0)):
+                if num_na > 0:
+                    print(f"Warning: {num_na} NaN values detected in {stat_column} column.")
+
+        rolling_data = pd.concat([rolling_data, stat_features], axis=1)
+
+        if self.drop_na:
+            print("Automatically dropping rows with NaN values.")
+            rolling_data = rolling_data.dropna()
+
+        return rolling_data
+
+
+def rolling_column_names(target: str, windows: dict[str, list[list[int]]]) -> list[str]:
+    """Build the names of the rolling statistics columns, following the `WindowSummarizer` naming."""
+    return [
+        f"{target}_{stat}_{lag}_{window_length}"
+        for stat, stat_windows in windows.items()
+        for lag, window_length in stat_windows
+    ]
+
+
+def compute_rolling_stats(
+    values: np.ndarray, group_ids: np.ndarray, windows: dict[str, list[list[int]]], dtype: str = "float64"
+) -> np.ndarray:
+    """Compute rolling statistics of series stored contiguously in a single buffer.
+
+    Sums are computed once as prefix sums of the values centered on the mean of their series, restarted at the first
+    value of every series, so every mean and standard deviation is an O(1) difference of prefix sums. Minimums and
+    maximums use the van Herk/Gil-Werman algorithm, in O(N) per window length. The standard deviation uses `ddof=1`, as pandas does.
+
+    Args:
+        values: The values of all the series, sorted by series and then by time.
+        group_ids: The id of the series of every value. Rows of the same series must be contiguous.
+        windows: Mapping from a statistic, one of "mean", "std", "min" and "max", to its [lag, window_length] pairs.
+        dtype: The dtype of the output.
+
+    Returns:
+        np.ndarray: A `(len(values), num_windows)` array whose columns follow `rolling_column_names`. Rows whose window
+            is not complete within their series or holds a NaN value are NaN.
+    """
+    unknown_stats = set(windows) - set(SUPPORTED_STATS)
+    if unknown_stats:
+        raise ValueError(f"Unsupported rolling statistics: {sorted(unknown_stats)}. Supported: {SUPPORTED_STATS}.")
+
+    num_values = len(values)
+    positions = positions_in_groups(group_ids)
+    is_na = np.isnan(values)
+
+    # Centering every series on its mean keeps the prefix sums small, and restarting them at every series keeps the
+    # rounding errors of a series independent of the magnitude of the series before it. Both limit the cancellation of
+    # the sum of squares formula for the variance.
+    series_codes = np.unique(group_ids, return_inverse=True)[1]
+    filled_values = np.where(is_na, 0.0, values)
+    series_sums = np.bincount(series_codes, weights=filled_values)
+    series_counts = np.maximum(np.bincount(series_codes, weights=~is_na), 1)
+    series_means = (series_sums / series_counts)[series_codes]
+    centered_values = filled_values - series_means
+    centered_values[is_na] = 0.0
+
+    prefix_na = _prefix_sum(is_na.astype(np.int64))
+    squared_values = centered_values**2 if "std" in windows else None
+    prefix_sum = _prefix_sum_in_groups(centered_values, positions)
+    prefix_sum_squares = _prefix_sum_in_groups(squared_values, positions) if "std" in windows else None
+    extremes = {}
+
+    num_columns = sum(len(stat_windows) for stat_windows in windows.values())
+    stat_values = np.full((num_values, num_columns), np.nan, dtype=dtype, order="F")
+    column = 0
+    for stat, stat_windows in windows.items():
+        for lag, window_length in stat_windows:
+            # The window of the row `i` covers the rows [i - lag - window_length + 1, i - lag].
+            span = lag + window_length - 1
+            rows = np.arange(span, num_values)
+            window_starts = rows - span
+            window_ends = rows - lag + 1
+
+            if stat in ("mean", "std"):
+                # The prefix sum before a window is the one at its first value minus this value, so it is zero at the
+                # first value of a series. Windows crossing two series are masked below.
+                window_sums = prefix_sum[window_ends - 1] - prefix_sum[window_starts] + centered_values[window_starts]
+                if stat == "mean":
+                    result = window_sums / window_length + series_means[rows]
+                else:
+                    window_sum_squares = (
+                        prefix_sum_squares[window_ends - 1]
+                        - prefix_sum_squares[window_starts]
+                        + squared_values[window_starts]
+                    )
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        variance = (window_sum_squares - window_sums**2 / window_length) / (window_length - 1)
+                    result = np.sqrt(np.maximum(variance, 0.0))
+            else:
+                key = (stat, window_length)
+                if key not in extremes:
+                    ufunc = np.minimum if stat == "min" else np.maximum
+                    extremes[key] = _sliding_extreme(filled_values, window_length, ufunc)
+                result = extremes[key][window_starts]
+
+            is_valid = (positions[rows] >= span) & (prefix_na[window_ends] == prefix_na[window_starts])
+            stat_values[rows[is_valid], column] = result[is_valid]
+            column += 1
+
+    return stat_values
+
+
+def _prefix_sum(values: np.ndarray) -> np.ndarray:
+    """Compute the prefix sums of the values, with a leading zero."""
+    prefix = np.zeros(len(values) + 1, dtype=values.dtype)
+    np.cumsum(values, out=prefix[1:])
+
+    return prefix
+
+
+def _prefix_sum_in_groups(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Compute the inclusive prefix sums of series stored contiguously in a single buffer, restarted at the first value
+    of every series."""
+    prefix = np.empty_like(values)
+    group_starts = np.flatnonzero(positions == 0)
+    for start, end in zip(group_starts, [*group_starts[1:], len(values)]):
+        np.cumsum(values[start:end], out=prefix[start:end])
+
+    return prefix
+
+
+def _sliding_extreme(values: np.ndarray, window_length: int, ufunc: np.ufunc) -> np.ndarray:
+    """Compute the minimum or maximum of every window with the van Herk/Gil-Werman algorithm.
+
+    Returns:
+        np.ndarray: The extreme of every window, indexed by the start of the window.
+    """
+    num_values = len(values)
+    num_windows = num_values - window_length + 1
+    if num_windows <= 0:
+        return np.zeros(0, dtype=values.dtype)
+
+    # The padding is never read, as a window starting in the last block ends within the values.
+    padding = (-num_values) % window_length
+    blocks = np.concatenate([values, np.zeros(padding, dtype=values.dtype)]).reshape(-1, window_length)
+    prefix_extremes = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix_extremes = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    window_starts = np.arange(num_windows)
+
+    return ufunc(suffix_extremes[window_starts], prefix_extremes[window_starts + window_length - 1])
@@ -0,0 +1,174 @@
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+from src.feature_pipeline.src import extract, transform, validate
+from src.utils import profiling
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+# Source data and its fingerprint shared with the worker processes. They are set once per worker by `_init_worker`
+# instead of being pickled along with every window.
+_worker_data: pd.DataFrame | str | Path | None = None
+_worker_fingerprint: str | None = None
+
+
+def run(
+    data: pd.DataFrame | str | Path,
+    start_datetime: dt.datetime,
+    end_datetime: dt.datetime,
+    days_export: int = 30,
+    datetime_format: str = "%Y-%m-%d %H:%M",
+    max_workers: int | None = None,
+    store_dir: Path | None = None,
+    fingerprint: str | None = None,
+) -> tuple[pd.DataFrame, dict[str, Any], pd.DataFrame]:
+    """Backfill the `[start_datetime, end_datetime)` range by running extract -> transform -> validate on windows of \
+    `days_export` days in a process pool.
+
+    Windows that fail validation are reported and left out of the consolidated data, so they can be backfilled again
+    once fixed. The metadata spans the first to the last valid window and lists the failed windows in between as
+    `missing_windows`, so a range with gaps is never mistaken for a contiguous one.
+
+    Args:
+        data: Source data, or the path to its file.
+        start_datetime: The start of the backfilled range.
+        end_datetime: The end of the backfilled range, excluded.
+        days_export: The number of days of every window. The last window may be shorter.
+        datetime_format: The datetime format used in the metadata.
+        max_workers: The number of worker processes. By default it is the number of CPUs.
+        store_dir: The directory of the time-partitioned store built from the source data.
+        fingerprint: The fingerprint of the source data, computed when the raw data artifact is produced. If None, it
+            is computed once from all the rows of the source data and shared with the workers.
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, Any], pd.DataFrame]: The consolidated data of all the valid windows, its \
+            metadata and a per-window report with the timings of every stage.
+    """
+    windows = split_windows(start_datetime, end_datetime, days_export=days_export)
+    logger.info("Backfilling %d windows from %s to %s.", len(windows), start_datetime, end_datetime)
+
+    # Build the partitioned store upfront so the workers only read from it, keyed by a fingerprint computed once.
+    if fingerprint is None:
+        data = extract.read_source_data(data)
+        fingerprint = extract.compute_fingerprint(data)
+    extract.build_partitioned_store(data, store_dir=store_dir, fingerprint=fingerprint)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(data, fingerprint)
+    ) as executor:
+        futures = [
+            executor.submit(_process_window, export_start, export_end, datetime_format, store_dir)
+            for export_start, export_end in windows
+        ]
+        results = [future.result() for future in futures]
+
+    report = pd.DataFrame([result["report"] for result in results])
+    for result in results:
+        if not result["report"]["success"]:
+            logger.warning(
+                "Window %s - %s failed validation and is skipped.",
+                result["report"]["export_datetime_utc_start"],
+                result["report"]["export_datetime_utc_end"],
+            )
+
+    valid_results = [result for result in results if result["report"]["success"]]
+    if len(valid_results) == 0:
+        raise RuntimeError("None of the backfilled windows passed validation.")
+
+    # The failed windows between the first and the last valid windows are gaps of the backfilled range, whereas the
+    # failed windows at its edges only shrink it.
+    valid_positions = [position for position, result in enumerate(results) if result["report"]["success"]]
+    first_valid, last_valid = valid_positions[0], valid_positions[-1]
+    missing_windows = [
+        {
+            "export_datetime_utc_start": result["report"]["export_datetime_utc_start"],
+            "export_datetime_utc_end": result["report"]["export_datetime_utc_end"],
+        }
+        for result in results[first_valid : last_valid + 1]
+        if not result["report"]["success"]
+    ]
+    if len(missing_windows) > 0:
+        logger.warning(
+            "The backfilled range is partial: %d windows between %s and %s are missing.",
+            len(missing_windows),
+            valid_results[0]["metadata"]["export_datetime_utc_start"],
+            valid_results[-1]["metadata"]["export_datetime_utc_end"],
+        )
+
+    consolidated_data = pd.concat([result["data"] for result in valid_results], ignore_index=True)
+    metadata = {
+        "days_export": days_export,
+        "export_datetime_utc_start": valid_results[0]["metadata"]["export_datetime_utc_start"],
+        "export_datetime_utc_end": valid_results[-1]["metadata"]["export_datetime_utc_end"],
+        "datetime_format": datetime_format,
+        "num_windows": len(valid_results),
+        "missing_windows": missing_windows,
+        "num_unique_samples_per_time_series": consolidated_data["datetime_utc"].nunique(),
+    }
+
+    return consolidated_data, metadata, report
+
+
+def split_windows(
+    start_datetime: dt.datetime, end_datetime: dt.datetime, days_export: int = 30
+) -> list[tuple[dt.datetime, dt.datetime]]:
+    """Split the `[start_datetime, end_datetime)` range into consecutive windows of `days_export` days."""
+    windows = []
+    window_start = start_datetime
+    while window_start < end_datetime:
+        window_end = min(window_start + dt.timedelta(days=days_export), end_datetime)
+        windows.append((window_start, window_end))
+        window_start = window_end
+
+    return windows
+
+
+def _init_worker(data: pd.DataFrame | str | Path, fingerprint: str):
+    global _worker_data, _worker_fingerprint
+    _worker_data = data
+    _worker_fingerprint = fingerprint
+
+
+def _process_window(
+    export_start: dt.datetime, export_end: dt.datetime, datetime_format: str, store_dir: Path | None
+) -> dict[str, Any]:
+    """Run extract -> transform -> validate on a single window inside a worker process.
+
+    The stages are measured in the worker, whose records never reach the profiler of the parent process, so their
+    durations are returned in the report of the window.
+    """
+    with profiling.stage("window") as window_stage:
+        with profiling.stage("extract") as extract_stage:
+            records, metadata = extract.from_window(
+                _worker_data,
+                export_start,
+                export_end,
+                datetime_format=datetime_format,
+                store_dir=store_dir,
+                fingerprint=_worker_fingerprint,
+            )
+            extract_stage.num_rows = len(records)
+
+        with profiling.stage("transform", num_rows=len(records)) as transform_stage:
+            data = transform.transform(records)
+
+        with profiling.stage("validate", num_rows=len(data)) as validate_stage:
+            validation_expectation_suite = validate.build_expectation_suite(data)
+            validation_result = validate.validate(data, validation_expectation_suite)
+
+    report = {
+        "export_datetime_utc_start": metadata["export_datetime_utc_start"],
+        "export_datetime_utc_end": metadata["export_datetime_utc_end"],
+        "num_rows": len(data),
+        "success": validation_result["success"],
+        "extract_seconds": extract_stage.wall_seconds,
+        "transform_seconds": transform_stage.wall_seconds,
+        "validate_seconds": validate_stage.wall_seconds,
+        "total_seconds": window_stage.wall_seconds,
+    }
+
+    return {"data": data, "metadata": metadata, "report": report}
@@ -1,21 +1,41 @@
 import datetime as dt
+import hashlib
+import os
 from pathlib import Path
 from typing import Any
 
 import pandas as pd
-from root import CACHED_DIR
+from root import CACHED_DIR, PARTITIONED_DIR
+from src.utils import cache_utils, storage
 from src.utils.logger import get_logger
+from src.utils.task_utils import load_json, save_json
 
 logger = get_logger("logs", __name__)
 
+PARTITION_FREQ = "M"
+MANIFEST_FILE_NAME = "manifest.json"
+CACHE_FILE_PATTERN = storage.file_name("cached_data_*")
+CACHE_MAX_SIZE_BYTES = 1024**3
+
+
+def read_source_data(source: pd.DataFrame | str | Path) -> pd.DataFrame:
+    """Read the source data from the raw data artifact, which is either the frame itself or the path to its parquet \
+    file."""
+    if isinstance(source, pd.DataFrame):
+        return source
+
+    return storage.load_frame(source)
+
 
 def from_file(
-    data: pd.DataFrame,
+    data: pd.DataFrame | str | Path,
     export_end_reference_datetime: dt.datetime | None = None,
     days_delay: int = 15,
     days_export: int = 30,
     datetime_format: str = "%Y-%m-%d %H:%M",
     cache_dir: Path | None = None,
+    store_dir: Path | None = None,
+    fingerprint: str | None = None,
 ) -> tuple[pd.DataFrame, dict[str, Any]] | None:
     """Extract data from the DK energy consumption API.
 
@@ -26,7 +46,8 @@ def from_file(
     Here is the link to the official obsolete dataset: https://www.energidataservice.dk/tso-electricity/ConsumptionDE35Hour
 
     Args:
-        data: Source data.
+        data: Source data, or the path to its file. With a `fingerprint`, it is only read when the export window is \
+            neither cached nor in the partitioned store.
         export_end_reference_datetime: The end reference datetime of the export window. If None, the current time is \
             used. Because the data is always delayed with "days_delay" days, this date is used only as a reference \
             point. The real extracted window will be computed as `[export_end_reference_datetime - days_delay - \
@@ -34,8 +55,13 @@ def from_file(
         days_delay: Data has a delay of N days. Thus, we have to shift our window with N days.
         days_export: The number of days to export.
         datetime_format: The datetime format of the fields from the file.
-        cache_dir: The directory where the downloaded data will be cached. By default it will be downloaded in the \
-            standard output directory.
+        cache_dir: The directory where the extracted windows are cached. Entries are keyed by the fingerprint of the \
+            source data and the export window, and are evicted in LRU order once the cache exceeds \
+            `CACHE_MAX_SIZE_BYTES`. By default it is `CACHED_DIR`.
+        store_dir: The directory of the time-partitioned store built from the source data. It is (re)built only \
+            when the source data changes. By default it is `PARTITIONED_DIR`.
+        fingerprint: The fingerprint of the source data, computed once when the raw data artifact is produced, e.g. \
+            by `compute_file_fingerprint`. If None, it is computed from all the rows of the source data, on every call.
 
     Returns:
         tuple[pd.DataFrame, dict[str, Any]]: The extracted data and the metadata.
@@ -45,17 +71,59 @@ def from_file(
         days_delay=days_delay,
         days_export=days_export,
     )
-    records = _extract_records_from_file(
+    records, window_metadata = from_window(
         data=data,
         export_start=export_start,
         export_end=export_end,
         datetime_format=datetime_format,
         cache_dir=cache_dir,
+        store_dir=store_dir,
+        fingerprint=fingerprint,
     )
 
     metadata = {
         "days_delay": days_delay,
         "days_export": days_export,
+        **window_metadata,
+    }
+
+    return records, metadata
+
+
+def from_window(
+    data: pd.DataFrame | str | Path,
+    export_start: dt.datetime,
+    export_end: dt.datetime,
+    datetime_format: str = "%Y-%m-%d %H:%M",
+    cache_dir: Path | None = None,
+    store_dir: Path | None = None,
+    fingerprint: str | None = None,
+) -> tuple[pd.DataFrame, dict[str, Any]]:
+    """Extract the records of an explicit `[export_start, export_end)` window, without any delay or clamping.
+
+    Args:
+        data: Source data, or the path to its file. See `from_file`.
+        export_start: The start of the export window.
+        export_end: The end of the export window, excluded.
+        datetime_format: The datetime format used in the metadata.
+        cache_dir: The directory where the extracted windows are cached. See `from_file`.
+        store_dir: The directory of the time-partitioned store built from the source data. See `from_file`.
+        fingerprint: The precomputed fingerprint of the source data. See `from_file`.
+
+    Returns:
+        tuple[pd.DataFrame, dict[str, Any]]: The extracted data and the metadata.
+    """
+    records = _extract_records_from_file(
+        data=data,
+        export_start=export_start,
+        export_end=export_end,
+        datetime_format=datetime_format,
+        cache_dir=cache_dir,
+        store_dir=store_dir,
+        fingerprint=fingerprint,
+    )
+
+    metadata = {
         "export_datetime_utc_start": export_start.strftime(datetime_format),
         "export_datetime_utc_end": export_end.strftime(datetime_format),
         "datetime_format": datetime_format,
@@ -66,11 +134,13 @@ def from_file(
 
 
 def _extract_records_from_file(
-    data: pd.DataFrame,
+    data: pd.DataFrame | str | Path,
     export_start: dt.datetime,
     export_end: dt.datetime,
     datetime_format: str,
     cache_dir: Path | None = None,
+    store_dir: Path | None = None,
+    fingerprint: str | None = None,
 ) -> pd.DataFrame:
     """Extract records from the file backup based on the given export window."""
     if cache_dir is None:
@@ -78,18 +148,152 @@ def _extract_records_from_file(
     else:
         cache_dir.mkdir(parents=True, exist_ok=True)
 
-    records = data[
-        (data["HourUTC"] >= export_start.strftime(datetime_format))
-        & (data["HourUTC"] < export_end.strftime(datetime_format))
-    ]
+    # With a precomputed fingerprint, a cached window is served without reading the source data.
+    if fingerprint is None:
+        data = read_source_data(data)
+        fingerprint = compute_fingerprint(data)
+    cache_file_path = cache_dir / _cache_file_name(fingerprint, export_start=export_start, export_end=export_end)
+    if cache_file_path.exists():
+        logger.info("Serving the export window from the cache: %s", cache_file_path)
+        cache_utils.touch(cache_file_path)
+
+        return storage.load_frame(cache_file_path)
 
-    # cache the extracted data
-    cache_file_path = cache_dir / f"cached_data_{export_start.strftime('%Y%m%d')}_{export_end.strftime('%Y%m%d')}.csv"
-    records.to_csv(cache_file_path, index=False)
+    if store_dir is None:
+        store_dir = PARTITIONED_DIR
+    manifest = build_partitioned_store(data, store_dir=store_dir, fingerprint=fingerprint)
+    records = _read_window_from_store(store_dir, manifest, export_start=export_start, export_end=export_end)
+
+    # Cache the extracted data. Write to a temporary file of this process first so concurrent readers never see a partial
+    # entry and concurrent writers never replace each other's partial file.
+    tmp_file_path = cache_file_path.with_name(f"{cache_file_path.name}.{os.getpid()}.tmp")
+    storage.save_frame(records, tmp_file_path, file_format=storage.DEFAULT_FORMAT)
+    tmp_file_path.replace(cache_file_path)
+    cache_utils.evict_lru(cache_dir, max_size_bytes=CACHE_MAX_SIZE_BYTES, pattern=CACHE_FILE_PATTERN)
 
     return records
 
 
+def _cache_file_name(fingerprint: str, export_start: dt.datetime, export_end: dt.datetime) -> str:
+    """Compute the content-addressed name of the cache entry of an export window."""
+    key = hashlib.sha256(f"{fingerprint}:{export_start.isoformat()}:{export_end.isoformat()}".encode("utf-8"))
+    window = f"{export_start.strftime('%Y%m%d%H')}_{export_end.strftime('%Y%m%d%H')}"
+
+    return storage.file_name(f"cached_data_{window}_{key.hexdigest()[:16]}")
+
+
+def build_partitioned_store(
+    data: pd.DataFrame | str | Path,
+    store_dir: Path | None = None,
+    force: bool = False,
+    fingerprint: str | None = None,
+) -> dict:
+    """Persist the source data as one parquet file per month, each indexed by a sorted datetime64 `HourUTC` index.
+
+    The store is described by a manifest holding the fingerprint of the source data and the time span of every
+    partition. If the manifest matches the given data, the existing store is reused as is.
+
+    Args:
+        data: Source data, or the path to its file, only read if the store is (re)built.
+        store_dir: The directory of the store. By default it is `PARTITIONED_DIR`.
+        force: Rebuild the store even if it is up to date.
+        fingerprint: The precomputed fingerprint of the source data, if already available.
+
+    Returns:
+        dict: The manifest of the store.
+    """
+    if store_dir is None:
+        store_dir = PARTITIONED_DIR
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    if fingerprint is None:
+        data = read_source_data(data)
+        fingerprint = compute_fingerprint(data)
+    manifest_path = store_dir / MANIFEST_FILE_NAME
+    if not force and manifest_path.exists():
+        manifest = load_json(manifest_path)
+        if manifest.get("fingerprint") == fingerprint:
+            return manifest
+
+    logger.info("Building the partitioned store of the source data in %s.", store_dir)
+    # Invalidate the store before touching the partitions so that a crash never leaves a stale manifest behind.
+    manifest_path.unlink(missing_ok=True)
+    for file_path in store_dir.glob(storage.file_name("*")):
+        file_path.unlink()
+
+    data = read_source_data(data)
+    frame = data.assign(HourUTC=pd.to_datetime(data["HourUTC"]))
+    frame = frame.set_index("HourUTC").sort_index(kind="stable")
+
+    partitions = {}
+    for period, partition in frame.groupby(frame.index.to_period(PARTITION_FREQ)):
+        file_name = storage.file_name(str(period))
+        storage.save_frame(partition, store_dir / file_name)
+        partitions[str(period)] = {
+            "file": file_name,
+            "start": partition.index[0].isoformat(),
+            "end": partition.index[-1].isoformat(),
+            "num_rows": len(partition),
+        }
+
+    manifest = {
+        "fingerprint": fingerprint,
+        "columns": data.columns.tolist(),
+        "partitions": partitions,
+    }
+    save_json(manifest, manifest_path)
+
+    return manifest
+
+
+def compute_file_fingerprint(path: str | Path, chunk_size: int = 1024**2) -> str:
+    """Compute the fingerprint of a source data file from its bytes, once, when the raw data artifact is produced."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+
+def compute_fingerprint(data: pd.DataFrame) -> str:
+    """Compute the fingerprint of the source data from its schema and the hashes of all its rows, so that any edit of \
+    the data changes it."""
+    hasher = hashlib.sha256()
+    hasher.update(repr((data.shape, data.columns.tolist(), data.dtypes.astype(str).tolist())).encode("utf-8"))
+    hasher.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+
+    return hasher.hexdigest()
+
+
+def _read_window_from_store(
+    store_dir: Path, manifest: dict, export_start: dt.datetime, export_end: dt.datetime
+) -> pd.DataFrame:
+    """Read the `[export_start, export_end)` window by opening only the overlapping partitions and binary searching \
+    their sorted index."""
+    export_start = pd.Timestamp(export_start)
+    export_end = pd.Timestamp(export_end)
+
+    frames = []
+    for partition_metadata in manifest["partitions"].values():
+        partition_start = pd.Timestamp(partition_metadata["start"])
+        partition_end = pd.Timestamp(partition_metadata["end"])
+        if partition_end < export_start or partition_start >= export_end:
+            continue
+
+        partition = storage.load_frame(store_dir / partition_metadata["file"])
+        start_idx = partition.index.searchsorted(export_start, side="left")
+        end_idx = partition.index.searchsorted(export_end, side="left")
+        frames.append(partition.iloc[start_idx:end_idx])
+
+    if len(frames) == 0:
+        return pd.DataFrame(columns=manifest["columns"])
+
+    records = pd.concat(frames).reset_index()
+
+    return records[manifest["columns"]]
+
+
 def _compute_extraction_window(
     export_end_reference_datetime: dt.datetime | None,
     days_delay: int,
@@ -1,14 +1,44 @@
+import shutil
+from pathlib import Path
+
 import pandas as pd
-from clearml import Dataset
+from clearml import Dataset, StorageManager, Task
 from configs.configs import DATASET_NAME, PROJECT_NAME
 from root import PROCESSED_DIR
+from src.utils import storage
 from src.utils.logger import get_logger
-from src.utils.task_utils import save_json
+from src.utils.task_utils import load_json, save_json
 
 logger = get_logger("logs", __name__)
 
+PARTITIONS_DIR_NAME = "partitions"
+MANIFEST_FILE_NAME = "manifest.json"
+KEY_COLUMNS = ["area", "consumer_type", "datetime_utc"]
+FEATURE_TAIL_FILE_NAME = storage.file_name("feature_tail")
+
+
+def to_feature_store(
+    data: pd.DataFrame,
+    metadata: dict,
+    parent_datasets_id: str,
+    incremental: bool = True,
+    feature_tail: pd.DataFrame | None = None,
+):
+    """Load the data of a window into a new version of the feature store.
 
-def to_feature_store(data: pd.DataFrame, metadata: dict, parent_datasets_id: str):
+    Args:
+        data: The transformed and validated data of the window.
+        metadata: The metadata of the window.
+        parent_datasets_id: The id of the previous version of the feature store.
+        incremental: Write only the partitions touched by the window, merged with their previous version, and let the
+            new dataset version inherit all the other partitions from its parent. Otherwise, rewrite the whole history
+            in a single `processed.parquet` file.
+        feature_tail: The last hours of every series, used as history context by the next incremental feature
+            computation. If None, the new version inherits the tail of its parent, if any.
+
+    Returns:
+        The new version of the feature store and the updated metadata.
+    """
     ds = Dataset.create(
         dataset_name=DATASET_NAME,
         dataset_project=PROJECT_NAME,
@@ -20,29 +50,161 @@ def to_feature_store(data: pd.DataFrame, metadata: dict, parent_datasets_id: str
     )
 
     parent_dataset = Dataset.get(parent_datasets_id)
-    local_path = parent_dataset.get_local_copy()
+    if incremental:
+        metadata["feature_store_delta_files"] = _add_partitions(ds, parent_dataset, data, metadata)
+    else:
+        _add_full_history(ds, parent_dataset, data)
+
+    if feature_tail is not None:
+        feature_tail_path = storage.save_frame(feature_tail, PROCESSED_DIR / FEATURE_TAIL_FILE_NAME)
+        ds.add_files(path=feature_tail_path, verbose=True)
 
-    if "processed.csv" in parent_dataset.list_files():
-        df = pd.read_csv(f"{local_path}/processed.csv")
+    metadata["feature_store_id"] = ds.id
+    save_json(metadata, PROCESSED_DIR / "metadata.json")
+    ds.add_files(path=PROCESSED_DIR / "metadata.json", verbose=True)
+
+    ds.upload(verbose=True)
+    ds.finalize()
+
+    return ds, metadata
+
+
+def load_feature_tail(dataset_id: str) -> pd.DataFrame | None:
+    """Load the feature tail buffer of a version of the feature store, if it holds one."""
+    dataset = Dataset.get(dataset_id)
+    if FEATURE_TAIL_FILE_NAME not in dataset.list_files():
+        return None
+
+    # Only the chunk holding the tail is downloaded, not the whole history of the feature store.
+    return storage.load_frame(_get_local_files(dataset, [FEATURE_TAIL_FILE_NAME])[FEATURE_TAIL_FILE_NAME])
+
+
+def _add_full_history(ds: Dataset, parent_dataset: Dataset, data: pd.DataFrame):
+    """Merge the data with the whole history of the parent dataset and add it as a single file."""
+    local_path = Path(parent_dataset.get_local_copy())
+    parent_files = parent_dataset.list_files()
+    processed_file_name = storage.file_name("processed")
+
+    df = None
+    if processed_file_name in parent_files:
+        df = storage.load_frame(local_path / processed_file_name)
+    elif "processed.csv" in parent_files:
+        # Legacy feature store versions, stored as CSV.
+        df = pd.read_csv(local_path / "processed.csv")
         df.drop(columns=["index"], inplace=True)
         df["datetime_utc"] = pd.to_datetime(df["datetime_utc"])
+        df = df.astype(data.dtypes.to_dict())
 
+    if df is not None:
         data_ = pd.concat([df, data], ignore_index=True)
         data_.sort_values(by="datetime_utc", inplace=True, ascending=False)
         data_.drop_duplicates(keep="first", inplace=True)
-
-        data_.to_csv(PROCESSED_DIR / "processed.csv", index_label=["index"])
+        data_.reset_index(drop=True, inplace=True)
     else:
-        data_ = data.copy()
-        data_.to_csv(PROCESSED_DIR / "processed.csv", index_label=["index"])
+        data_ = data.reset_index(drop=True)
 
-    ds.add_files(path=PROCESSED_DIR / "processed.csv", verbose=True)
+    processed_path = storage.save_frame(data_, PROCESSED_DIR / processed_file_name)
+    ds.add_files(path=processed_path, verbose=True)
 
-    metadata["feature_store_id"] = ds.id
-    save_json(metadata, PROCESSED_DIR / "metadata.json")
-    ds.add_files(path=PROCESSED_DIR / "metadata.json", verbose=True)
 
-    ds.upload(verbose=True)
-    ds.finalize()
+def _add_partitions(ds: Dataset, parent_dataset: Dataset, data: pd.DataFrame, metadata: dict) -> list[str]:
+    """Add to the dataset only the (area, month) partitions touched by the data.
 
-    return ds, metadata
+    Every touched partition is merged with its previous version, if any, and de-duplicated on
+    (area, consumer_type, datetime_utc), the new values winning. Consumer types are kept as a sort key inside the
+    partitions instead of a partition key, as per consumer type partitions would only hold a few hundred rows. The
+    manifest of the partitions is updated and added along with them.
+
+    Returns:
+        The paths, relative to the dataset root, of the added files.
+    """
+    parent_files = set(parent_dataset.list_files())
+    months = data["datetime_utc"].dt.to_period("M")
+    partition_keys = data.groupby([data["area"], months], sort=True).groups.keys()
+    partition_paths = {
+        key: f"{PARTITIONS_DIR_NAME}/area={key[0]}/{storage.file_name(f'month={key[1]}')}" for key in partition_keys
+    }
+
+    # Only the manifest and the previous version of the touched partitions are downloaded. All the other partitions
+    # are inherited from the parent through the dataset link, without any local copy.
+    parent_local_paths = _get_local_files(
+        parent_dataset, [path for path in [MANIFEST_FILE_NAME, *partition_paths.values()] if path in parent_files]
+    )
+
+    manifest = {"partitions": {}, "windows": []}
+    if MANIFEST_FILE_NAME in parent_local_paths:
+        manifest = load_json(parent_local_paths[MANIFEST_FILE_NAME])
+
+    delta_dir = PROCESSED_DIR / "delta" / ds.id
+    shutil.rmtree(delta_dir, ignore_errors=True)
+    delta_dir.mkdir(parents=True)
+
+    delta_files = []
+    for (area, month), partition in data.groupby([data["area"], months], sort=True):
+        relative_path = partition_paths[(area, month)]
+        if relative_path in parent_local_paths:
+            previous_partition = storage.load_frame(parent_local_paths[relative_path])
+            partition = pd.concat([previous_partition, partition], ignore_index=True)
+            partition = partition.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+
+        partition = partition.sort_values(by=KEY_COLUMNS, ignore_index=True)
+        storage.save_frame(partition, delta_dir / relative_path)
+
+        manifest["partitions"][relative_path] = {
+            "area": int(area),
+            "month": str(month),
+            "num_rows": len(partition),
+            "datetime_utc_start": partition["datetime_utc"].min().isoformat(),
+            "datetime_utc_end": partition["datetime_utc"].max().isoformat(),
+        }
+        delta_files.append(relative_path)
+
+    manifest["windows"].append(
+        {
+            "export_datetime_utc_start": metadata["export_datetime_utc_start"],
+            "export_datetime_utc_end": metadata["export_datetime_utc_end"],
+            "missing_windows": metadata.get("missing_windows", []),
+            "partitions": list(delta_files),
+        }
+    )
+    save_json(manifest, delta_dir / MANIFEST_FILE_NAME)
+    delta_files.append(MANIFEST_FILE_NAME)
+
+    logger.info(
+        "Adding %d partitions out of %d to the feature store.", len(delta_files) - 1, len(manifest["partitions"])
+    )
+    ds.add_files(path=delta_dir, recursive=True, verbose=True)
+
+    return delta_files
+
+
+def _get_local_files(dataset: Dataset, relative_paths: list[str]) -> dict[str, Path]:
+    """Download only the chunks of a dataset that hold the given files, instead of its whole local copy.
+
+    ClearML stores every file in a zip chunk of the dataset version that added it, so the files inherited by the
+    dataset are read from the chunks of its parents. The extracted chunks are cached by ClearML.
+
+    Returns:
+        The local path of every file, by its path relative to the dataset root.
+    """
+    chunks = {}
+    file_entries = dataset.file_entries_dict
+    for relative_path in relative_paths:
+        file_entry = file_entries[relative_path]
+        chunks.setdefault(file_entry.parent_dataset_id, {}).setdefault(file_entry.artifact_name, []).append(
+            relative_path
+        )
+
+    local_paths = {}
+    for owner_dataset_id, owner_chunks in chunks.items():
+        owner_artifacts = Task.get_task(task_id=owner_dataset_id).artifacts
+        for artifact_name, chunk_paths in owner_chunks.items():
+            chunk_dir = StorageManager.get_local_copy(
+                remote_url=owner_artifacts[artifact_name].url, cache_context="datasets", extract_archive=True
+            )
+            if chunk_dir is None:
+                raise ValueError(f"Could not download the chunk {artifact_name} of the dataset {owner_dataset_id}.")
+            for relative_path in chunk_paths:
+                local_paths[relative_path] = Path(chunk_dir) / relative_path
+
+    return local_paths
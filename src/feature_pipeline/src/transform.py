@@ -1,11 +1,33 @@
+import numpy as np
 import pandas as pd
+from src.utils import schema
 from src.utils.logger import get_logger
+from src.utils.schema import AREA_MAPPINGS
 
 logger = get_logger("logs", __name__)
 
+RENAMED_COLUMNS = {
+    "HourUTC": "datetime_utc",
+    "PriceArea": "area",
+    "ConsumerType_DE35": "consumer_type",
+    "TotalCon": "energy_consumption",
+}
+
+
+def transform(data: pd.DataFrame, single_pass: bool = True) -> pd.DataFrame:
+    """Transform the data to the correct format.
+
+    Args:
+        data: Extracted data.
+        single_pass: Run the fused `transform_single_pass` implementation, which copies the data at most once. \
+            Otherwise, run the chain of single-step transformations, each working on its own copy.
+
+    Returns:
+        pd.DataFrame: The transformed data.
+    """
+    if single_pass:
+        return transform_single_pass(data)
 
-def transform(data: pd.DataFrame) -> pd.DataFrame:
-    """Transform the data to the correct format."""
     data = drop_columns(data)
     data = clean_data(data)
     data = rename_columns(data)
@@ -15,6 +37,40 @@ def transform(data: pd.DataFrame) -> pd.DataFrame:
     return data
 
 
+def transform_single_pass(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop, clean, rename, cast and encode the data in a single pass.
+
+    The rows and columns to keep are computed on the input, then selected in one go, which is the only copy of the
+    data. Every other step works in place on that copy.
+    """
+    columns = df.columns.drop("HourDK")
+    keep = ~df.duplicated(subset=columns) & df["TotalCon"].notna()
+    data = df.loc[keep.to_numpy(), columns]
+
+    data.reset_index(drop=True, inplace=True)
+    data.rename(columns=RENAMED_COLUMNS, inplace=True)
+
+    data["datetime_utc"] = pd.to_datetime(data["datetime_utc"])
+    data["area"] = _encode_areas(data["area"])
+    data["consumer_type"] = data["consumer_type"].astype(schema.DTYPES["consumer_type"], copy=False)
+    data["energy_consumption"] = data["energy_consumption"].astype(schema.DTYPES["energy_consumption"], copy=False)
+    schema.memory_report(data, stage="transform")
+
+    return data
+
+
+def _encode_areas(areas: pd.Series) -> np.ndarray:
+    """Encode the areas to integers with a vectorized lookup of their categorical codes."""
+    codes = pd.Categorical(areas, dtype=schema.AREA_CATEGORIES).codes
+    unknown_areas = codes == -1
+    if unknown_areas.any():
+        raise ValueError(f"Unknown areas: {pd.unique(areas[unknown_areas]).tolist()}")
+
+    area_values = np.array(list(AREA_MAPPINGS.values()), dtype=schema.DTYPES["area"])
+
+    return area_values[codes]
+
+
 def drop_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Drop columns that are not relevant for our analysis."""
     data = df.copy()
@@ -39,15 +95,7 @@ def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Rename columns."""
     data = df.copy()
 
-    data.rename(
-        columns={
-            "HourUTC": "datetime_utc",
-            "PriceArea": "area",
-            "ConsumerType_DE35": "consumer_type",
-            "TotalCon": "energy_consumption",
-        },
-        inplace=True,
-    )
+    data.rename(columns=RENAMED_COLUMNS, inplace=True)
 
     return data
 
@@ -57,9 +105,10 @@ def cast_columns(df: pd.DataFrame) -> pd.DataFrame:
     data = df.copy()
 
     data["datetime_utc"] = pd.to_datetime(data["datetime_utc"])
-    data["area"] = data["area"].astype("string")
-    data["consumer_type"] = data["consumer_type"].astype("int32")
-    data["energy_consumption"] = data["energy_consumption"].astype("float64")
+    data["area"] = data["area"].astype(schema.AREA_CATEGORIES)
+    data["consumer_type"] = data["consumer_type"].astype(schema.DTYPES["consumer_type"])
+    data["energy_consumption"] = data["energy_consumption"].astype(schema.DTYPES["energy_consumption"])
+    schema.memory_report(data, stage="cast_columns")
 
     return data
 
@@ -68,23 +117,6 @@ def encode_area_column(df: pd.DataFrame) -> pd.DataFrame:
     """Encode the area column to integers."""
     data = df.copy()
 
-    area_mappings = {
-        "DK": 0,
-        "DK1": 1,
-        "DK2": 2,
-        "DE": 3,
-        "SE1": 4,
-        "SE2": 5,
-        "SE3": 6,
-        "SE4": 7,
-        "NO1": 8,
-        "NO2": 9,
-        "NO3": 10,
-        "NO4": 11,
-        "NO5": 12,
-    }
-
-    data["area"] = data["area"].map(lambda string_area: area_mappings.get(string_area))
-    data["area"] = data["area"].astype("int8")
+    data["area"] = _encode_areas(data["area"])
 
     return data
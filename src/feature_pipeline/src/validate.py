@@ -1,25 +1,45 @@
+import datetime as dt
+import functools
+import json
+from typing import Any, Callable
+
+import numpy as np
 import pandas as pd
 from great_expectations.core import ExpectationConfiguration, ExpectationSuite
 from great_expectations.dataset import PandasDataset
 from src.utils.logger import get_logger
+from src.utils.schema import AREA_VALUES, CONSUMER_TYPE_VALUES, DTYPES
 
 logger = get_logger("logs", __name__)
 
+COLUMNS = ["datetime_utc", "area", "consumer_type", "energy_consumption"]
+
+# Number of unexpected values reported in `partial_unexpected_list`, as Great Expectations does.
+PARTIAL_UNEXPECTED_COUNT = 20
+
+
+def build_expectation_suite(df: pd.DataFrame | None = None) -> ExpectationSuite:
+    """Builder used to retrieve an instance of the validation expectation suite.
 
-def build_expectation_suite(df: pd.DataFrame) -> ExpectationSuite:
-    """Builder used to retrieve an instance of the validation expectation suite."""
-    dataset = PandasDataset(df)
+    The suite does not depend on the data, `df` is kept for backward compatibility. It is built once and shared by all
+    the callers, which must not modify it.
+    """
+    return _build_default_expectation_suite()
+
+
+@functools.cache
+def _build_default_expectation_suite() -> ExpectationSuite:
     expectation_suite_ec = ExpectationSuite(expectation_suite_name="energy_consumption_suite")
 
     # Columns.
     expectation_suite_ec.add_expectation(
         ExpectationConfiguration(
             expectation_type="expect_table_columns_to_match_ordered_list",
-            kwargs={"column_list": ["datetime_utc", "area", "consumer_type", "energy_consumption"]},
+            kwargs={"column_list": COLUMNS},
         )
     )
     expectation_suite_ec.add_expectation(
-        ExpectationConfiguration(expectation_type="expect_table_column_count_to_equal", kwargs={"value": 4})
+        ExpectationConfiguration(expectation_type="expect_table_column_count_to_equal", kwargs={"value": len(COLUMNS)})
     )
 
     # Datetime UTC
@@ -33,12 +53,12 @@ def build_expectation_suite(df: pd.DataFrame) -> ExpectationSuite:
     expectation_suite_ec.add_expectation(
         ExpectationConfiguration(
             expectation_type="expect_column_distinct_values_to_be_in_set",
-            kwargs={"column": "area", "value_set": list(range(0, 13))},
+            kwargs={"column": "area", "value_set": AREA_VALUES},
         )
     )
     expectation_suite_ec.add_expectation(
         ExpectationConfiguration(
-            expectation_type="expect_column_values_to_be_of_type", kwargs={"column": "area", "type_": "int8"}
+            expectation_type="expect_column_values_to_be_of_type", kwargs={"column": "area", "type_": DTYPES["area"]}
         )
     )
 
@@ -48,52 +68,14 @@ def build_expectation_suite(df: pd.DataFrame) -> ExpectationSuite:
             expectation_type="expect_column_distinct_values_to_be_in_set",
             kwargs={
                 "column": "consumer_type",
-                "value_set": [
-                    111,
-                    112,
-                    119,
-                    121,
-                    122,
-                    123,
-                    130,
-                    211,
-                    212,
-                    215,
-                    220,
-                    310,
-                    320,
-                    330,
-                    340,
-                    350,
-                    360,
-                    370,
-                    381,
-                    382,
-                    390,
-                    410,
-                    421,
-                    422,
-                    431,
-                    432,
-                    433,
-                    441,
-                    442,
-                    443,
-                    444,
-                    445,
-                    446,
-                    447,
-                    450,
-                    461,
-                    462,
-                    999,
-                ],
+                "value_set": CONSUMER_TYPE_VALUES,
             },
         )
     )
     expectation_suite_ec.add_expectation(
         ExpectationConfiguration(
-            expectation_type="expect_column_values_to_be_of_type", kwargs={"column": "consumer_type", "type_": "int32"}
+            expectation_type="expect_column_values_to_be_of_type",
+            kwargs={"column": "consumer_type", "type_": DTYPES["consumer_type"]},
         )
     )
 
@@ -107,7 +89,7 @@ def build_expectation_suite(df: pd.DataFrame) -> ExpectationSuite:
     expectation_suite_ec.add_expectation(
         ExpectationConfiguration(
             expectation_type="expect_column_values_to_be_of_type",
-            kwargs={"column": "energy_consumption", "type_": "float64"},
+            kwargs={"column": "energy_consumption", "type_": DTYPES["energy_consumption"]},
         )
     )
     expectation_suite_ec.add_expectation(
@@ -117,11 +99,222 @@ def build_expectation_suite(df: pd.DataFrame) -> ExpectationSuite:
         )
     )
 
-    return dataset.get_expectation_suite(expectation_suite_ec)
+    return expectation_suite_ec
+
+
+def validate(df: pd.DataFrame, expectation_suite: ExpectationSuite | None = None, audit: bool = False) -> dict:
+    """Validate the data.
+
+    By default the expectations are evaluated by the native engine, which runs vectorized NumPy checks and returns a
+    result dict with the same layout as Great Expectations. Audit runs go through Great Expectations itself.
+
+    Args:
+        df: The data to validate.
+        expectation_suite: The expectation suite. If None, the suite of `build_expectation_suite` is used.
+        audit: Validate with Great Expectations instead of the native engine.
+
+    Returns:
+        dict: The JSON serializable validation result.
+    """
+    if expectation_suite is None:
+        expectation_suite = build_expectation_suite()
+
+    if audit:
+        dataset = PandasDataset(df)
+        validation_results = dataset.validate(expectation_suite=expectation_suite, catch_exceptions=True)
+        return validation_results.to_json_dict()
+
+    return validate_native(df, expectation_suite)
+
+
+def validate_native(df: pd.DataFrame, expectation_suite: ExpectationSuite) -> dict:
+    """Evaluate the expectation suite with vectorized NumPy checks and return a Great Expectations compatible result."""
+    validation_time = dt.datetime.now(dt.timezone.utc)
+    if expectation_suite is _build_default_expectation_suite():
+        serialized_suite = _serialize_default_expectation_suite()
+    else:
+        serialized_suite = _serialize_expectation_suite(expectation_suite)
+    compiled_suite = _compile_expectation_suite(serialized_suite)
+
+    results = []
+    for expectation_config, check in compiled_suite:
+        exception_info = {"raised_exception": False, "exception_message": None, "exception_traceback": None}
+        try:
+            success, result = check(df)
+        except Exception as e:
+            success, result = False, {}
+            exception_info = {"raised_exception": True, "exception_message": repr(e), "exception_traceback": None}
+
+        results.append(
+            {
+                "success": success,
+                "expectation_config": expectation_config,
+                "result": result,
+                "meta": {},
+                "exception_info": exception_info,
+            }
+        )
+
+    num_successful = sum(result["success"] for result in results)
+    statistics = {
+        "evaluated_expectations": len(results),
+        "successful_expectations": num_successful,
+        "unsuccessful_expectations": len(results) - num_successful,
+        "success_percent": 100 * num_successful / len(results) if len(results) > 0 else None,
+    }
+
+    return {
+        "success": num_successful == len(results),
+        "results": results,
+        "evaluation_parameters": {},
+        "statistics": statistics,
+        "meta": {
+            "engine": "native",
+            "expectation_suite_name": expectation_suite.expectation_suite_name,
+            "run_id": {"run_name": None, "run_time": validation_time.isoformat()},
+            "validation_time": validation_time.strftime("%Y%m%dT%H%M%S.%fZ"),
+        },
+    }
+
+
+def _serialize_expectation_suite(expectation_suite: ExpectationSuite) -> str:
+    """Serialize the expectations of a suite into a hashable key."""
+    expectations = [
+        {"expectation_type": expectation.expectation_type, "kwargs": dict(expectation.kwargs)}
+        for expectation in expectation_suite.expectations
+    ]
+
+    return json.dumps(expectations, sort_keys=True)
+
+
+@functools.cache
+def _serialize_default_expectation_suite() -> str:
+    """Serialize the shared default suite once, as it is never modified."""
+    return _serialize_expectation_suite(_build_default_expectation_suite())
+
+
+@functools.lru_cache(maxsize=8)
+def _compile_expectation_suite(serialized_suite: str) -> tuple[tuple[dict, Callable], ...]:
+    """Compile every expectation of a serialized suite into a check function. Compiled suites are memoized."""
+    compiled_suite = []
+    for expectation in json.loads(serialized_suite):
+        expectation_config = {**expectation, "meta": {}}
+        compile_check = _CHECK_COMPILERS.get(expectation["expectation_type"])
+        if compile_check is None:
+            raise ValueError(
+                f"Unknown expectation type {expectation['expectation_type']}. Supported expectation types: "
+                f"{tuple(_CHECK_COMPILERS)}."
+            )
+
+        compiled_suite.append((expectation_config, compile_check(**expectation["kwargs"])))
+
+    return tuple(compiled_suite)
+
+
+def _compile_columns_to_match_ordered_list(column_list: list[str]) -> Callable:
+    def check(df: pd.DataFrame) -> tuple[bool, dict[str, Any]]:
+        observed_value = df.columns.tolist()
+        if observed_value == column_list:
+            return True, {"observed_value": observed_value}
+
+        mismatched = [
+            {
+                "Expected Column Position": position,
+                "Expected": expected,
+                "Found": observed_value[position] if position < len(observed_value) else None,
+            }
+            for position, expected in enumerate(column_list)
+            if position >= len(observed_value) or observed_value[position] != expected
+        ]
+
+        return False, {"observed_value": observed_value, "details": {"mismatched": mismatched}}
+
+    return check
+
+
+def _compile_column_count_to_equal(value: int) -> Callable:
+    def check(df: pd.DataFrame) -> tuple[bool, dict[str, Any]]:
+        observed_value = len(df.columns)
+        return observed_value == value, {"observed_value": observed_value}
+
+    return check
+
+
+def _compile_values_to_not_be_null(column: str) -> Callable:
+    def check(df: pd.DataFrame) -> tuple[bool, dict[str, Any]]:
+        element_count = len(df)
+        unexpected_count = int(df[column].isna().to_numpy().sum())
+        unexpected_percent = 100 * unexpected_count / element_count if element_count > 0 else 0.0
+        result = {
+            "element_count": element_count,
+            "unexpected_count": unexpected_count,
+            "unexpected_percent": unexpected_percent,
+            "unexpected_percent_total": unexpected_percent,
+            "partial_unexpected_list": [None] * min(unexpected_count, PARTIAL_UNEXPECTED_COUNT),
+        }
+
+        return unexpected_count == 0, result
+
+    return check
+
+
+def _compile_distinct_values_to_be_in_set(column: str, value_set: list) -> Callable:
+    allowed_values = np.asarray(value_set)
+
+    def check(df: pd.DataFrame) -> tuple[bool, dict[str, Any]]:
+        values = df[column].dropna().to_numpy()
+        distinct_values = np.unique(values)
+        result = {
+            "observed_value": distinct_values.tolist(),
+            "element_count": len(df),
+            "missing_count": None,
+            "missing_percent": None,
+        }
+
+        return bool(np.isin(distinct_values, allowed_values).all()), result
+
+    return check
+
+
+def _compile_values_to_be_of_type(column: str, type_: str) -> Callable:
+    def check(df: pd.DataFrame) -> tuple[bool, dict[str, Any]]:
+        observed_value = df[column].dtype.name
+        return observed_value == type_, {"observed_value": observed_value}
+
+    return check
+
+
+def _compile_min_to_be_between(
+    column: str, min_value: float | None = None, max_value: float | None = None, strict_min: bool = False
+) -> Callable:
+    def check(df: pd.DataFrame) -> tuple[bool, dict[str, Any]]:
+        values = df[column].to_numpy()
+        observed_value = np.nanmin(values).item() if len(values) > 0 else None
+        result = {
+            "observed_value": observed_value,
+            "element_count": len(df),
+            "missing_count": None,
+            "missing_percent": None,
+        }
+        if observed_value is None:
+            return False, result
+
+        success = True
+        if min_value is not None:
+            success &= observed_value > min_value if strict_min else observed_value >= min_value
+        if max_value is not None:
+            success &= observed_value <= max_value
+
+        return success, result
+
+    return check
 
 
-def validate(df: pd.DataFrame, expectation_suite: ExpectationSuite) -> dict:
-    """Validate the data."""
-    dataset = PandasDataset(df)
-    validation_results = dataset.validate(expectation_suite=expectation_suite, catch_exceptions=True)
-    return validation_results.to_json_dict()
+_CHECK_COMPILERS: dict[str, Callable[..., Callable]] = {
+    "expect_table_columns_to_match_ordered_list": _compile_columns_to_match_ordered_list,
+    "expect_table_column_count_to_equal": _compile_column_count_to_equal,
+    "expect_column_values_to_not_be_null": _compile_values_to_not_be_null,
+    "expect_column_distinct_values_to_be_in_set": _compile_distinct_values_to_be_in_set,
+    "expect_column_values_to_be_of_type": _compile_values_to_be_of_type,
+    "expect_column_min_to_be_between": _compile_min_to_be_between,
+}
@@ -0,0 +1,99 @@
+import datetime as dt
+import sys
+from pathlib import Path
+
+from clearml import Task, TaskTypes
+
+CURRENT_DIR = Path(__file__).parent.parent.parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from configs.configs import PROJECT_NAME
+from src.feature_pipeline.src import backfill, load
+from src.utils import profiling, storage
+from src.utils.logger import get_logger
+from src.utils.task_utils import get_task_artifacts
+
+logger = get_logger("logs", __name__)
+
+if __name__ == "__main__":
+    task = Task.init(
+        project_name=PROJECT_NAME,
+        task_name="Backfilling data",
+        task_type=TaskTypes.data_processing,
+        tags="data-pipeline",
+    )
+
+    args = {
+        # "artifacts_task_id": "OVERWRITE_ME",
+        # "feature_store_id": "OVERWRITE_ME",
+        "start_datetime": "2020-06-30 22:00",
+        "end_datetime": "2023-06-30 22:00",
+        "days_export": 30,
+        "max_workers": 0,
+        "feature_group_version": 1,
+        "artifacts_task_id": "3dfe30f7f8ca4619b535e43f64f66d05",
+        "feature_store_id": "649430da2e0247db8ef3a073e30223b2",
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
+    }
+    task.connect(args)
+    print(f"Arguments: {args}")
+
+    # task.execute_remotely()
+
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Backfilling data.")
+
+        with profiling.stage("get_source_data"):
+            task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
+            # The workers only read the source data if the partitioned store has to be rebuilt. The raw data tasks
+            # older than the fingerprint artifact fall back to hashing the source data once.
+            source_data = task_artifacts["data"].get()
+            fingerprint = task_artifacts["data_fingerprint"].get() if "data_fingerprint" in task_artifacts else None
+
+        start_datetime = dt.datetime.strptime(args["start_datetime"], "%Y-%m-%d %H:%M")
+        end_datetime = dt.datetime.strptime(args["end_datetime"], "%Y-%m-%d %H:%M")
+        max_workers = int(args["max_workers"]) or None
+
+        with profiling.stage("backfill") as stage:
+            data, metadata, report = backfill.run(
+                source_data,
+                start_datetime,
+                end_datetime,
+                days_export=int(args["days_export"]),
+                max_workers=max_workers,
+                fingerprint=fingerprint,
+            )
+            stage.num_rows = len(data)
+        logger.info("Successfully backfilled %d windows in %.2f seconds.", len(report), stage.wall_seconds)
+        for _, window in report.iterrows():
+            logger.info(
+                "Window %s - %s: %d rows in %.2f seconds (extract %.2f, transform %.2f, validate %.2f).",
+                window["export_datetime_utc_start"],
+                window["export_datetime_utc_end"],
+                window["num_rows"],
+                window["total_seconds"],
+                window["extract_seconds"],
+                window["transform_seconds"],
+                window["validate_seconds"],
+            )
+        task.get_logger().report_table(title="Backfill windows", series="Timings", iteration=0, table_plot=report)
+
+        with profiling.stage("to_feature_store", num_rows=len(data)) as stage:
+            metadata["feature_group_version"] = args["feature_group_version"]
+            metadata["feature_store_id"] = args["feature_store_id"]
+            ds, metadata = load.to_feature_store(data, metadata, parent_datasets_id=metadata["feature_store_id"])
+        logger.info("Successfully loaded data to the feature store in %.2f seconds.", stage.wall_seconds)
+
+        task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
+        if len(metadata["missing_windows"]) > 0:
+            task.add_tags(["partial"])
+
+        with profiling.stage("upload_artifacts", num_rows=len(data)) as stage:
+            task.upload_artifact("data", data, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+            task.upload_artifact("metadata", metadata)
+            task.upload_artifact("backfill_report", report, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+        logger.info("Successfully uploaded data and metadata in %.2f seconds.", stage.wall_seconds)
+
+    logger.info("=" * 80)
+    print("Done!")
@@ -1,6 +1,5 @@
 import datetime as dt
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
@@ -10,6 +9,7 @@ sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
 from src.feature_pipeline.src import extract
+from src.utils import profiling, storage
 from src.utils.logger import get_logger
 from src.utils.task_utils import get_task_artifacts
 
@@ -31,43 +31,53 @@ if __name__ == "__main__":
         "days_export": 30,
         "artifacts_task_id": "3dfe30f7f8ca4619b535e43f64f66d05",
         "feature_store_id": "649430da2e0247db8ef3a073e30223b2",
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     # task.execute_remotely()
 
-    logger.info("Extracting data from API.")
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Extracting data from API.")
 
-    task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
-    data = task_artifacts["data"].get()
+        with profiling.stage("get_source_data"):
+            task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
+            # The source data is passed as is, e.g. as the path to its file, and only read if the export window is not
+            # cached. The raw data tasks older than the fingerprint artifact fall back to hashing the source data.
+            source_data = task_artifacts["data"].get()
+            fingerprint = task_artifacts["data_fingerprint"].get() if "data_fingerprint" in task_artifacts else None
 
-    export_end_reference_datetime = args["export_end_reference_datetime"]
-    if export_end_reference_datetime == "":
-        export_end_reference_datetime = None
-    else:
-        export_end_reference_datetime = dt.datetime.strptime(export_end_reference_datetime, "%Y-%m-%d %H:%M")
+        export_end_reference_datetime = args["export_end_reference_datetime"]
+        if export_end_reference_datetime == "":
+            export_end_reference_datetime = None
+        else:
+            export_end_reference_datetime = dt.datetime.strptime(export_end_reference_datetime, "%Y-%m-%d %H:%M")
 
-    days_delay = args["days_delay"]
-    days_export = args["days_export"]
+        days_delay = args["days_delay"]
+        days_export = args["days_export"]
 
-    t1 = time.time()
-    data, metadata = extract.from_file(data, export_end_reference_datetime, days_delay, days_export)
-    if metadata["num_unique_samples_per_time_series"] < days_export * 24:
-        raise RuntimeError(
-            f"Could not extract the expected number of samples from the api: {metadata['num_unique_samples_per_time_series']} < {days_export * 24}. \
-            Check out the API at: https://www.energidataservice.dk/tso-electricity/ConsumptionDE35Hour "
-        )
-    # metadata["feature_store_id"] = task_artifacts["feature_store"].get()
-    metadata["feature_store_id"] = args["feature_store_id"]
-    logger.info("Successfully extracted data in %.2f seconds.", time.time() - t1)
+        with profiling.stage("extract") as stage:
+            data, metadata = extract.from_file(
+                source_data, export_end_reference_datetime, days_delay, days_export, fingerprint=fingerprint
+            )
+            stage.num_rows = len(data)
+        if metadata["num_unique_samples_per_time_series"] < days_export * 24:
+            raise RuntimeError(
+                f"Could not extract the expected number of samples from the api: {metadata['num_unique_samples_per_time_series']} < {days_export * 24}. \
+                Check out the API at: https://www.energidataservice.dk/tso-electricity/ConsumptionDE35Hour "
+            )
+        # metadata["feature_store_id"] = task_artifacts["feature_store"].get()
+        metadata["feature_store_id"] = args["feature_store_id"]
+        logger.info("Successfully extracted data in %.2f seconds.", stage.wall_seconds)
 
-    task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
+        task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
 
-    t1 = time.time()
-    task.upload_artifact("data", data)
-    task.upload_artifact("metadata", metadata)
-    logger.info("Successfully uploaded data and metadata in %.2f seconds.", time.time() - t1)
+        with profiling.stage("upload_artifacts", num_rows=len(data)) as stage:
+            task.upload_artifact("data", data, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+            task.upload_artifact("metadata", metadata)
+        logger.info("Successfully uploaded data and metadata in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
@@ -1,5 +1,4 @@
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
@@ -9,6 +8,7 @@ sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
 from src.feature_pipeline.src import transform
+from src.utils import profiling, storage
 from src.utils.logger import get_logger
 from src.utils.task_utils import get_task_artifacts
 
@@ -26,28 +26,32 @@ if __name__ == "__main__":
     args = {
         # "artifacts_task_id": "OVERWRITE_ME",
         "artifacts_task_id": "58764c6b9cac4049b5d897488d3302a1",
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     # task.execute_remotely()
 
-    logger.info("Transforming data.")
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Transforming data.")
 
-    task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
-    data = task_artifacts["data"].get()
-    metadata = task_artifacts["metadata"].get()
+        with profiling.stage("load_artifacts"):
+            task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
+            data = task_artifacts["data"].get()
+            metadata = task_artifacts["metadata"].get()
 
-    t1 = time.time()
-    data = transform.transform(data)
-    logger.info("Successfully transformed data in %.2f seconds.", time.time() - t1)
+        with profiling.stage("transform", num_rows=len(data)) as stage:
+            data = transform.transform(data)
+        logger.info("Successfully transformed data in %.2f seconds.", stage.wall_seconds)
 
-    task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
+        task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
 
-    t1 = time.time()
-    task.upload_artifact("data", data)
-    task.upload_artifact("metadata", metadata)
-    logger.info("Successfully uploaded data and metadata in %.2f seconds.", time.time() - t1)
+        with profiling.stage("upload_artifacts", num_rows=len(data)) as stage:
+            task.upload_artifact("data", data, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+            task.upload_artifact("metadata", metadata)
+        logger.info("Successfully uploaded data and metadata in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
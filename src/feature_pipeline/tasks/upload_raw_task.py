@@ -1,9 +1,9 @@
-import csv
 import sys
-import time
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from clearml import Dataset, Task, TaskTypes
 
 CURRENT_DIR = Path(__file__).parent.parent.parent.parent
@@ -11,48 +11,103 @@ sys.path.insert(0, str(CURRENT_DIR))
 
 from configs.configs import DATASET_NAME, PROJECT_NAME
 from root import DATA_DIR, RAW_DIR
+from src.feature_pipeline.src import extract
+from src.utils import profiling, schema
 from src.utils.logger import get_logger
 
 logger = get_logger("logs", __name__)
 
 
-def convert_txt_to_csv(input_filepath, output_filepath):
-    with open(input_filepath) as input_file:
-        with open(output_filepath, "w", newline="") as output_file:
-            reader = csv.reader(input_file, delimiter=";")
-            writer = csv.writer(output_file)
-            writer.writerows(reader)
+def convert_txt_to_parquet(
+    input_filepath: Path, output_filepath: Path, chunksize: int = 500_000, compression: str = "zstd"
+) -> int:
+    """Stream the semicolon separated backup into a compressed parquet file.
 
+    The backup is read in chunks of `chunksize` rows, each chunk is cast to its final dtypes and written as a row
+    group, so the peak memory does not depend on the size of the backup.
 
-if __name__ == "__main__":
-    # Example usage:
-    in_filepath = DATA_DIR / "backup" / "ConsumptionDE35Hour.csv"
-    out_filepath = RAW_DIR / "ConsumptionDE35Hour.csv"
-    convert_txt_to_csv(in_filepath, out_filepath)
+    Args:
+        input_filepath (Path): Path to the semicolon separated backup.
+        output_filepath (Path): Path to the parquet file to write.
+        chunksize (int, optional): Number of rows per chunk. Defaults to 500_000.
+        compression (str, optional): Parquet compression codec. Defaults to "zstd".
+
+    Returns: The number of converted rows.
+    """
+    chunks = pd.read_csv(
+        input_filepath,
+        sep=";",
+        chunksize=chunksize,
+        dtype={"PriceArea": "string", "ConsumerType_DE35": schema.DTYPES["consumer_type"], "TotalCon": "float64"},
+        parse_dates=["HourUTC", "HourDK"],
+    )
+
+    num_rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            areas = chunk["PriceArea"].astype(schema.AREA_CATEGORIES)
+            unknown_areas = areas.isna() & chunk["PriceArea"].notna()
+            if unknown_areas.any():
+                raise ValueError(f"Unknown price areas: {chunk.loc[unknown_areas, 'PriceArea'].unique().tolist()}")
+            chunk["PriceArea"] = areas
+
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_filepath, table.schema, compression=compression)
+            writer.write_table(table)
+            num_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return num_rows
 
+
+if __name__ == "__main__":
     task = Task.init(
         project_name=PROJECT_NAME,
         task_name="Upload raw data",
         task_type=TaskTypes.data_processing,
         tags="data-source",
     )
+
+    args = {
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
+    }
+    task.connect(args)
+    print(f"Arguments: {args}")
+
     # task.execute_remotely()
 
-    ds = Dataset.create(
-        dataset_name=DATASET_NAME,
-        dataset_project=PROJECT_NAME,
-        dataset_tags=["raw"],
-    )
-    ds.add_files(path=out_filepath, verbose=True)
-    ds.upload(verbose=True)
-    ds.finalize()
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        # Example usage:
+        in_filepath = DATA_DIR / "backup" / "ConsumptionDE35Hour.csv"
+        out_filepath = RAW_DIR / "ConsumptionDE35Hour.parquet"
+        with profiling.stage("convert_txt_to_parquet") as stage:
+            num_rows = convert_txt_to_parquet(in_filepath, out_filepath)
+            stage.num_rows = num_rows
+        logger.info("Successfully converted %d rows to %s in %.2f seconds.", num_rows, out_filepath, stage.wall_seconds)
 
-    df = pd.read_csv(out_filepath)
+        with profiling.stage("upload_dataset", num_rows=num_rows):
+            ds = Dataset.create(
+                dataset_name=DATASET_NAME,
+                dataset_project=PROJECT_NAME,
+                dataset_tags=["raw"],
+            )
+            ds.add_files(path=out_filepath, verbose=True)
+            ds.upload(verbose=True)
+            ds.finalize()
 
-    t1 = time.time()
-    task.upload_artifact("feature_store", ds.id)
-    task.upload_artifact("data", df)
-    logger.info("Successfully uploaded data and metadata in %.2f seconds.", time.time() - t1)
+        with profiling.stage("upload_artifacts", num_rows=num_rows) as stage:
+            task.upload_artifact("feature_store", ds.id)
+            # Upload the parquet file itself, the consumers load it with `extract.read_source_data`.
+            task.upload_artifact("data", out_filepath)
+            # The fingerprint keys the partitioned store and the cache of the extracted windows, so the consumers do
+            # not hash the whole source data on every extraction.
+            task.upload_artifact("data_fingerprint", extract.compute_file_fingerprint(out_filepath))
+        logger.info("Successfully uploaded data and metadata in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
@@ -1,5 +1,4 @@
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
@@ -9,6 +8,7 @@ sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
 from src.feature_pipeline.src import validate
+from src.utils import profiling, storage
 from src.utils.logger import get_logger
 from src.utils.task_utils import get_task_artifacts
 
@@ -25,32 +25,38 @@ if __name__ == "__main__":
     args = {
         # "artifacts_task_id": "OVERWRITE_ME",
         "artifacts_task_id": "384713a685d944e188769c73ccb5c6b2",
+        "audit": False,
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     # task.execute_remotely()
 
-    logger.info("Validating data.")
-
-    task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
-    data = task_artifacts["data"].get()
-    metadata = task_artifacts["metadata"].get()
-
-    t1 = time.time()
-    validation_expectation_suite = validate.build_expectation_suite(data)
-    logger.info("Successfully built validation expectation suite in %.2f seconds.", time.time() - t1)
-    result = validate.validate(data, validation_expectation_suite)
-    logger.info("Successfully validated data in %.2f seconds.", time.time() - t1)
-
-    task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
-
-    t1 = time.time()
-    task.upload_artifact("data", data)
-    task.upload_artifact("metadata", metadata)
-    task.upload_artifact("validation_expectation_suite", validation_expectation_suite)
-    task.upload_artifact("validation_result", result)
-    logger.info("Successfully uploaded data and metadata in %.2f seconds.", time.time() - t1)
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Validating data.")
+
+        with profiling.stage("load_artifacts"):
+            task_artifacts = get_task_artifacts(task_id=args["artifacts_task_id"])
+            data = task_artifacts["data"].get()
+            metadata = task_artifacts["metadata"].get()
+
+        with profiling.stage("build_expectation_suite", num_rows=len(data)) as stage:
+            validation_expectation_suite = validate.build_expectation_suite(data)
+        logger.info("Successfully built validation expectation suite in %.2f seconds.", stage.wall_seconds)
+        with profiling.stage("validate", num_rows=len(data)) as stage:
+            result = validate.validate(data, validation_expectation_suite, audit=args["audit"])
+        logger.info("Successfully validated data in %.2f seconds.", stage.wall_seconds)
+
+        task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
+
+        with profiling.stage("upload_artifacts", num_rows=len(data)) as stage:
+            task.upload_artifact("data", data, extension_name=storage.FRAME_ARTIFACT_EXTENSION)
+            task.upload_artifact("metadata", metadata)
+            task.upload_artifact("validation_expectation_suite", validation_expectation_suite)
+            task.upload_artifact("validation_result", result)
+        logger.info("Successfully uploaded data and metadata in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
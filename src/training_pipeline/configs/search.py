@@ -1,5 +1,6 @@
+# The estimator threads are set by the core budget of the search engine, thus `forecaster__estimator__n_jobs` is not
+# part of the grid.
 search_spaces = {
-    "forecaster__estimator__n_jobs": [-1],
     "forecaster__estimator__n_estimators": [1000, 2000, 2500],
     "forecaster__estimator__learning_rate": [0.1, 0.15],
     "forecaster__estimator__max_depth": [-1, 5],
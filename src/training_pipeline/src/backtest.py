@@ -0,0 +1,358 @@
+import copy
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from src.training_pipeline.src.data import load_dataset
+from src.training_pipeline.src.direct import HORIZON_COLUMN, DirectHorizonForecaster
+from src.training_pipeline.src.metrics import METRICS, SLICE_LEVELS, compute_metrics
+from src.training_pipeline.src.models import build_baseline_model, build_model
+from src.training_pipeline.src.search_engine import ESTIMATOR_PARAM, CoreBudget, DesignMatrixCapture
+from src.training_pipeline.src.warm_start import lookback
+from src.utils import profiling
+from src.utils.logger import get_logger
+from src.utils.task_utils import get_task_artifacts
+
+logger = get_logger("logs", __name__)
+
+ORIGIN_LEVEL = "origin"
+HORIZON_LEVEL = "horizon"
+
+
+@dataclass
+class BacktestResult:
+    """Result of a rolling-origin backtest.
+
+    Attributes:
+        predictions: The ground truth and the predictions of every origin, indexed by origin, horizon step and slice.
+        horizon_curve: The metrics of every horizon step, over all the origins and slices.
+        slice_curves: The metrics of every slice and horizon step, over all the origins.
+        origin_metrics: The metrics of every origin, averaged over the slices as in the evaluation of the test set.
+        summary: The mean of every metric over the origins and its standard error.
+    """
+
+    predictions: pd.DataFrame
+    horizon_curve: pd.DataFrame
+    slice_curves: pd.DataFrame
+    origin_metrics: pd.DataFrame
+    summary: pd.DataFrame
+
+
+def run(
+    task,
+    data_task_id: str,
+    hpo_task_id: str,
+    fh: int = 24,
+    num_origins: int = 10,
+    step: int = 24,
+    n_jobs: int = -1,
+    estimator_jobs: int = 4,
+):
+    """Backtest the best model found in the hyperparameter optimization run and the baseline from rolling origins.
+
+    Args:
+        fh (int, optional): Forecasting horizon. Defaults to 24.
+        num_origins (int, optional): Number of forecasting origins. Defaults to 10.
+        step (int, optional): Number of hours between two origins. Defaults to 24.
+        n_jobs (int, optional): Core budget of the backtest, -1 for all the cores. Defaults to -1.
+        estimator_jobs (int, optional): Number of threads of every LightGBM estimator. Defaults to 4.
+    """
+    task_logger = task.get_logger()
+
+    logger.info("Loading data from feature store...")
+    with profiling.stage("load_data") as stage:
+        (y_train, y_test, X_train, X_test), _ = load_dataset(task_id=data_task_id, fh=fh)
+        y = pd.concat([y_train, y_test]).sort_index()
+        X = pd.concat([X_train, X_test]).sort_index()
+        stage.num_rows = len(y)
+    logger.info("Successfully loaded data from feature store in %.2f seconds.", stage.wall_seconds)
+
+    task_artifacts = get_task_artifacts(task_id=hpo_task_id)
+    best_config_artifact = task_artifacts["best_params"].get()
+    best_config_artifact.update(task_artifacts["model_cfg"].get())
+    task.upload_artifact("model_cfg", best_config_artifact)
+
+    models = {
+        "Baseline": build_baseline_model(seasonal_periodicity=fh),
+        "Best model": build_model(best_config_artifact, dataset_key=data_task_id),
+    }
+    results = {}
+    for name, model in models.items():
+        logger.info("Backtesting %s...", name)
+        with profiling.stage(f"backtest_{name.lower().replace(' ', '_')}", num_rows=len(y)) as stage:
+            results[name] = run_backtest(
+                model, y, X, fh=fh, num_origins=num_origins, step=step, n_jobs=n_jobs, estimator_jobs=estimator_jobs
+            )
+            report_backtest(task, name, results[name])
+        logger.info("Successfully backtested %s in %.2f seconds.", name, stage.wall_seconds)
+
+    # The models are evaluated on the same origins, so their paired differences cancel the variance of the origins.
+    metrics = list(METRICS)
+    differences = results["Best model"].origin_metrics[metrics] - results["Baseline"].origin_metrics[metrics]
+    comparison = pd.DataFrame(
+        {"mean_difference": differences.mean(), "standard_error": differences.sem(ddof=1)}
+    ).rename_axis("metric")
+    for metric, row in comparison.iterrows():
+        logger.info("Best model - Baseline %s: %.5f +/- %.5f", metric, row["mean_difference"], row["standard_error"])
+    task_logger.report_table(
+        title="Backtest comparison", series="Best model - Baseline", iteration=0, table_plot=comparison.reset_index()
+    )
+
+
+def report_backtest(task, name: str, result: "BacktestResult"):
+    """Report the error curves of a backtest to ClearML."""
+    task_logger = task.get_logger()
+    for metric in METRICS:
+        for horizon, value in zip(result.horizon_curve[HORIZON_LEVEL], result.horizon_curve[metric]):
+            task_logger.report_scalar(f"Backtest {metric} by horizon", name, float(value), iteration=int(horizon))
+        for origin_index, value in enumerate(result.origin_metrics[metric]):
+            task_logger.report_scalar(f"Backtest {metric} by origin", name, float(value), iteration=origin_index)
+        logger.info(
+            "%s backtest %s: %.5f +/- %.5f",
+            name,
+            metric,
+            result.summary.loc[metric, "mean"],
+            result.summary.loc[metric, "standard_error"],
+        )
+
+    task_logger.report_table(
+        title="Backtest summary", series=f"{name} results", iteration=0, table_plot=result.summary.reset_index()
+    )
+    task_logger.report_table(
+        title="Backtest origins", series=f"{name} results", iteration=0, table_plot=result.origin_metrics
+    )
+    task_logger.report_table(
+        title="Backtest slices by horizon", series=f"{name} results", iteration=0, table_plot=result.slice_curves
+    )
+    artifact_name = name.lower().replace(" ", "_")
+    task.upload_artifact(f"backtest_predictions_{artifact_name}", result.predictions)
+    task.upload_artifact(f"backtest_slice_curves_{artifact_name}", result.slice_curves)
+
+
+def rolling_origins(y: pd.DataFrame, fh: int, num_origins: int, step: int) -> pd.Index:
+    """Compute the forecasting origins, every `step` hours, the last one leaving `fh` hours to forecast.
+
+    Returns:
+        pd.Index: The cutoffs of the origins, from the oldest to the latest.
+    """
+    times = y.index.get_level_values(-1).unique().sort_values()
+    positions = len(times) - fh - 1 - step * np.arange(num_origins)[::-1]
+    if positions[0] < 0:
+        raise ValueError(f"Not enough data for {num_origins} origins every {step} hours with a horizon of {fh} hours.")
+
+    return times[positions]
+
+
+def run_backtest(
+    forecaster,
+    y: pd.DataFrame,
+    X: pd.DataFrame,
+    fh: int = 24,
+    num_origins: int = 10,
+    step: int = 24,
+    n_jobs: int = -1,
+    estimator_jobs: int = 4,
+    cache_features: bool = True,
+) -> BacktestResult:
+    """Backtest a forecaster from rolling origins, fitting it on all the data before every origin.
+
+    The origins are evaluated in parallel processes, one origin per worker. For the reduction pipelines, the window
+    features of a value only depend on the values before it, thus the feature pipeline is fitted once on the whole data
+    to materialize the design matrix of all the origins, and every worker only fits the regressor on the rows whose
+    target is before its origin. The feature pipeline of an origin is then fitted on the last values of every series
+    only, which is all it needs to forecast. Other forecasters, e.g. the baseline, are fitted on every origin.
+
+    The training origins of a `DirectHorizonForecaster` are aligned on the end of its data, every `origin_stride`
+    hours. Its shared design matrix is thus built with the origins on the grid of every backtest origin, i.e. every
+    `gcd(origin_stride, step, fh)` hours, and every worker only keeps the rows on the grid of its origin. When `step`
+    is not a multiple of the stride, the shared design matrix is larger than the one of an origin by the ratio of the
+    stride to this divisor.
+
+    Args:
+        forecaster: The sktime forecaster to backtest.
+        y: The time series to forecast.
+        X: The exogenous variables.
+        fh: Forecasting horizon.
+        num_origins: Number of forecasting origins.
+        step: Number of hours between two origins.
+        n_jobs: Total number of cores of the backtest, -1 for all the available cores.
+        estimator_jobs: Number of threads of every estimator.
+        cache_features: Materialize the design matrix once for all the origins and only fit the regressor of every
+            origin. If False, the whole forecaster is fitted on every origin.
+
+    Returns:
+        BacktestResult: The predictions and the error curves of the backtest.
+    """
+    t1 = time.perf_counter()
+    fh_ = np.arange(fh) + 1
+    origins = rolling_origins(y, fh, num_origins, step)
+    budget = CoreBudget.allocate(n_jobs=n_jobs, estimator_jobs=estimator_jobs, max_search_jobs=len(origins))
+    logger.info(
+        "Backtesting %d origins from %s to %s with %d parallel origins of %d estimator threads.",
+        len(origins),
+        origins[0],
+        origins[-1],
+        budget.search_jobs,
+        budget.estimator_jobs,
+    )
+
+    times = y.index.get_level_values(-1)
+    X_times = X.index.get_level_values(-1)
+    series_levels = list(range(y.index.nlevels - 1))
+    test_windows = [(times > origin) & (times <= origin + fh) for origin in origins]
+    X_test_windows = [(X_times > origin) & (X_times <= origin + fh) for origin in origins]
+
+    if cache_features and ESTIMATOR_PARAM in forecaster.get_params():
+        # Fitted feature pipeline of the whole data, sharing its design matrix with all the origins.
+        fitted_forecaster = clone(forecaster).set_params(**{ESTIMATOR_PARAM: DesignMatrixCapture()})
+        origin_stride = None
+        reducer = forecaster.get_params()["forecaster"]
+        if isinstance(reducer, DirectHorizonForecaster):
+            origin_stride = reducer.origin_stride if reducer.origin_stride is not None else fh
+            fitted_forecaster.set_params(forecaster__origin_stride=math.gcd(origin_stride, step, fh))
+        fitted_forecaster.fit(y=y, X=X, fh=fh_)
+        capture = fitted_forecaster.forecaster_.estimator_
+        Xt, yt = capture.X_, np.asarray(capture.y_)
+        train_rows = [_train_rows(Xt, origin, origin_stride) for origin in origins]
+        logger.info("Materialized a design matrix of shape %s in %.2f seconds.", Xt.shape, time.perf_counter() - t1)
+
+        # Twice the lookback leaves enough values to the feature pipeline to compute the features of a full window.
+        context = 2 * lookback(fitted_forecaster) + fh
+        estimator = clone(forecaster.get_params()[ESTIMATOR_PARAM])
+        if "n_jobs" in estimator.get_params():
+            estimator.set_params(n_jobs=budget.estimator_jobs)
+        # Regressors sharing the bin mappers of their binned datasets, e.g. `NativeLGBMRegressor`, bin all the origins
+        # with the bin boundaries of the training rows of the first origin, so no origin is binned with the data after
+        # it. The reference of the backtest is scoped by its own key, apart from the one of the search on the data.
+        if getattr(estimator, "dataset_dir", None) is not None:
+            estimator.set_params(dataset_key=f"{estimator.dataset_key}-backtest-{origins[0]}-{origin_stride}")
+            estimator.build_reference(Xt[train_rows[0]], yt[train_rows[0]])
+        tasks = (
+            delayed(_backtest_origin_on_design)(
+                forecaster,
+                estimator,
+                Xt,
+                yt,
+                is_train,
+                y[times <= origin].groupby(level=series_levels, sort=False).tail(context),
+                X[X_times <= origin].groupby(level=series_levels, sort=False).tail(context),
+                X[X_test_window],
+                fh_,
+            )
+            for origin, is_train, X_test_window in zip(origins, train_rows, X_test_windows)
+        )
+    else:
+        if getattr(forecaster.get_params().get(ESTIMATOR_PARAM), "dataset_dir", None) is not None:
+            # Every origin bins its own training data, rather than with the shared bins of the whole data.
+            forecaster = clone(forecaster).set_params(**{f"{ESTIMATOR_PARAM}__dataset_dir": None})
+        tasks = (
+            delayed(_backtest_origin)(forecaster, y[times <= origin], X[X_times <= origin], X[X_test_window], fh_)
+            for origin, X_test_window in zip(origins, X_test_windows)
+        )
+
+    y_preds = Parallel(n_jobs=budget.search_jobs)(tasks)
+
+    predictions = pd.concat(
+        [
+            _label_origin(y[test_window], y_pred, origin)
+            for origin, test_window, y_pred in zip(origins, test_windows, y_preds)
+        ]
+    )
+    result = _build_result(predictions)
+    logger.info("Backtested %d origins in %.2f seconds.", len(origins), time.perf_counter() - t1)
+
+    return result
+
+
+def _train_rows(Xt: pd.DataFrame, origin, origin_stride: int | None = None) -> np.ndarray:
+    """Select the rows of the shared design matrix the forecaster fitted on the data before an origin is trained on.
+
+    For a direct forecaster, the rows are also restricted to its training origins, every `origin_stride` hours before
+    the backtest origin.
+    """
+    target_times = Xt.index.get_level_values(-1)
+    is_train = np.asarray(target_times <= origin)
+    if origin_stride is not None:
+        # The hourly periods are ordinals, so the hours between two periods are the difference of their ordinals.
+        hours_before_origin = origin.ordinal - (target_times.asi8 - Xt[HORIZON_COLUMN].to_numpy())
+        is_train &= hours_before_origin % origin_stride == 0
+
+    return is_train
+
+
+def _backtest_origin_on_design(
+    forecaster,
+    estimator,
+    Xt: pd.DataFrame,
+    yt: np.ndarray,
+    is_train: np.ndarray,
+    y_context: pd.DataFrame,
+    X_context: pd.DataFrame,
+    X_test: pd.DataFrame,
+    fh: np.ndarray,
+) -> pd.DataFrame:
+    """Fit the regressor of an origin on the shared design matrix and forecast from the origin."""
+    origin_forecaster = clone(forecaster).set_params(**{ESTIMATOR_PARAM: DesignMatrixCapture()})
+    origin_forecaster.fit(y=y_context, X=X_context, fh=fh)
+    origin_forecaster.forecaster_.estimator_ = copy.deepcopy(estimator).fit(Xt[is_train], yt[is_train])
+
+    return origin_forecaster.predict(fh=fh, X=X_test)
+
+
+def _backtest_origin(forecaster, y_train, X_train, X_test, fh) -> pd.DataFrame:
+    """Fit a forecaster on the data before an origin and forecast from the origin."""
+    origin_forecaster = clone(forecaster)
+    origin_forecaster.fit(y=y_train, X=X_train, fh=fh)
+
+    return origin_forecaster.predict(fh=fh, X=X_test)
+
+
+def _label_origin(y_test: pd.DataFrame, y_pred: pd.DataFrame, origin) -> pd.DataFrame:
+    """Align the predictions of an origin on its ground truth, indexed by origin, horizon step and slice."""
+    times = y_test.index.get_level_values(-1)
+    frame = pd.DataFrame(
+        {
+            ORIGIN_LEVEL: origin,
+            # The hourly periods are ordinals, so their difference is the number of hours after the origin.
+            HORIZON_LEVEL: times.asi8 - origin.ordinal,
+            **{level: y_test.index.get_level_values(level) for level in SLICE_LEVELS},
+            "datetime_utc": times,
+            "y_true": y_test.iloc[:, 0].to_numpy(),
+            "y_pred": y_pred.iloc[:, 0].reindex(y_test.index).to_numpy(),
+        }
+    )
+
+    return frame.set_index([ORIGIN_LEVEL, HORIZON_LEVEL, *SLICE_LEVELS])
+
+
+def _build_result(predictions: pd.DataFrame) -> BacktestResult:
+    """Compute the error curves of the backtest from its predictions."""
+    y_true, y_pred = predictions[["y_true"]], predictions[["y_pred"]]
+
+    _, horizon_curve = compute_metrics(y_true, y_pred, slice_levels=(HORIZON_LEVEL,))
+    _, slice_curves = compute_metrics(y_true, y_pred, slice_levels=(*SLICE_LEVELS, HORIZON_LEVEL))
+
+    # Every origin is evaluated as the test set, averaging the metrics of its slices.
+    _, origin_slices = compute_metrics(y_true, y_pred, slice_levels=(ORIGIN_LEVEL, *SLICE_LEVELS))
+    origin_metrics = origin_slices.groupby(ORIGIN_LEVEL)[list(METRICS)].mean()
+    origin_metrics["RMSPE"] = np.sqrt((origin_slices["RMSPE"] ** 2).groupby(origin_slices[ORIGIN_LEVEL]).mean())
+    origin_metrics = origin_metrics.reset_index()
+
+    summary = pd.DataFrame(
+        {
+            "mean": origin_metrics[list(METRICS)].mean(),
+            "standard_error": origin_metrics[list(METRICS)].sem(ddof=1),
+        }
+    ).rename_axis("metric")
+
+    return BacktestResult(
+        predictions=predictions,
+        horizon_curve=horizon_curve,
+        slice_curves=slice_curves,
+        origin_metrics=origin_metrics,
+        summary=summary,
+    )
@@ -2,6 +2,7 @@ from typing import Any
 
 import pandas as pd
 from sktime.forecasting.model_selection import temporal_train_test_split
+from src.utils import panel, schema
 from src.utils.logger import get_logger
 from src.utils.task_utils import get_task_artifacts
 
@@ -9,13 +10,14 @@ logger = get_logger("logs", __name__)
 
 
 def load_dataset(
-    task_id: str, target: str = "energy_consumption", fh: int = 24
+    task_id: str, target: str = "energy_consumption", fh: int = 24, float32: bool = False
 ) -> tuple[tuple[pd.DataFrame, ...], dict[str, Any]]:
     """Load features from feature store.
 
     Args:
         training_dataset_version (int): Feature store training dataset version to load data from.
         fh (int, optional): Forecast horizon. Defaults to 24.
+        float32 (bool, optional): Cast the target and the float features to float32. Defaults to False.
 
     Returns:
         Train and test splits loaded from the feature store as pandas dataframes.
@@ -24,7 +26,7 @@ def load_dataset(
     data: pd.DataFrame = task_artifacts["data"].get()
     metadata = task_artifacts["metadata"].get()
 
-    y_train, y_test, X_train, X_test = prepare_data(data, target=target, fh=fh)
+    y_train, y_test, X_train, X_test = prepare_data(data, target=target, fh=fh, float32=float32, cache_key=task_id)
 
     exp: dict[str, Any] = {"fh": fh}
     for split in ["train", "test"]:
@@ -66,7 +68,11 @@ def load_dataset(
 
 
 def prepare_data(
-    data: pd.DataFrame, target: str = "energy_consumption", fh: int = 24
+    data: pd.DataFrame,
+    target: str = "energy_consumption",
+    fh: int = 24,
+    float32: bool = False,
+    cache_key: str | None = None,
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Structure the data for training:
@@ -75,9 +81,9 @@ def prepare_data(
     - Prepare the time series to be forecasted.
     - Split the data into train and test sets.
     """
-    # Set the index as is required by sktime.
-    data["datetime_utc"] = pd.PeriodIndex(data["datetime_utc"], freq="H")
-    data = data.set_index(["area", "consumer_type", "datetime_utc"]).sort_index()
+    # Set the index as is required by sktime, with compact dtypes.
+    data = panel.build_panel(data, cache_key=cache_key, float32=float32)
+    schema.memory_report(data, stage="prepare_data")
 
     # Prepare exogenous variables.
     X = data.drop(columns=[target])
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sktime.forecasting.base import BaseForecaster
+from src.data.time_series_feat.lag_generator import compute_lags, positions_in_groups
+from src.data.time_series_feat.rolling import DEFAULT_WINDOWS, compute_rolling_stats, rolling_column_names
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+DEFAULT_LAGS = tuple(range(1, 72 + 1))
+HORIZON_COLUMN = "horizon"
+
+
+class DirectHorizonForecaster(BaseForecaster):
+    """Direct multi-horizon forecaster: a single global regressor that takes the step of the horizon as a feature.
+
+    Every training row pairs a forecasting origin of a series with a step of the horizon. Its features are the lags and
+    the rolling statistics of the series at the origin, the step and the exogenous variables at the target time. All
+    the steps of all the series are thus predicted with one vectorized `predict` call of the regressor, instead of the
+    `len(fh)` sequential calls of the recursive reduction, which recomputes the window features after every step.
+
+    All the series are expected to be regular and to end at the cutoff, as in the recursive reduction.
+
+    Args:
+        estimator: Tabular regressor, e.g. a LightGBM regressor.
+        lags: Lags of the target, as in the `WindowSummarizer`: the lag 1 is the last value observed at the origin.
+        windows: Rolling statistics of the target, as a mapping from a statistic to its [lag, window_length] pairs,
+            with the same semantics as the lags. Defaults to the windows of the feature pipeline.
+        origin_stride: Steps between two training origins of a series. The origins are aligned on the last value of
+            every series, i.e. on the origin of the forecasts. The design matrix has about
+            `len(y) * len(fh) / origin_stride` rows. Defaults to `len(fh)`, which keeps it as large as the data.
+        dtype: Dtype of the window features.
+    """
+
+    _tags = {
+        "scitype:y": "univariate",
+        "requires-fh-in-fit": True,
+        "ignores-exogeneous-X": False,
+        "handles-missing-data": False,
+        "X_inner_mtype": ["pd-multiindex", "pd_multiindex_hier"],
+        "y_inner_mtype": ["pd-multiindex", "pd_multiindex_hier"],
+    }
+
+    def __init__(
+        self,
+        estimator,
+        lags: tuple[int, ...] = DEFAULT_LAGS,
+        windows: dict[str, list[list[int]]] | None = None,
+        origin_stride: int | None = None,
+        dtype: str = "float64",
+    ):
+        self.estimator = estimator
+        self.lags = lags
+        self.windows = windows
+        self.origin_stride = origin_stride
+        self.dtype = dtype
+        super().__init__()
+
+    def _fit(self, y: pd.DataFrame, X: pd.DataFrame | None = None, fh=None):
+        steps = self._steps(fh)
+        if not y.index.is_monotonic_increasing:
+            y = y.sort_index()
+        if X is not None:
+            X = X.reindex(y.index)
+
+        values = y.iloc[:, 0].to_numpy(dtype=np.float64)
+        series_ids = _series_ids(y.index)
+        positions = positions_in_groups(series_ids)
+        rows_to_end = _rows_to_end(series_ids)
+        window_features = self._window_features(values, series_ids)
+
+        # Only the origins with a complete history are used, aligned on the end of their series.
+        origin_stride = self.origin_stride if self.origin_stride is not None else len(steps)
+        origins = np.flatnonzero((positions >= self.lookback() - 1) & (rows_to_end % origin_stride == 0))
+        origin_rows, target_rows, step_rows = [], [], []
+        for step in steps:
+            step_origins = origins[rows_to_end[origins] >= step]
+            step_origins = step_origins[~np.isnan(values[step_origins + step])]
+            origin_rows.append(step_origins)
+            target_rows.append(step_origins + step)
+            step_rows.append(np.full(len(step_origins), step))
+        origin_rows = np.concatenate(origin_rows)
+        target_rows = np.concatenate(target_rows)
+        if len(origin_rows) == 0:
+            raise ValueError(f"The series are too short for a lookback of {self.lookback()} and a horizon of {steps}.")
+
+        Xt = self._design_matrix(
+            y.columns[0],
+            window_features[origin_rows],
+            np.concatenate(step_rows),
+            X.iloc[target_rows] if X is not None else None,
+            index=y.index[target_rows],
+        )
+        self.estimator_ = clone(self.estimator).fit(Xt, values[target_rows])
+        logger.info("Fitted the direct forecaster on a design matrix of shape %s.", Xt.shape)
+
+        return self
+
+    def _predict(self, fh, X: pd.DataFrame | None = None) -> pd.DataFrame:
+        steps = self._steps(fh)
+        y = self._y if self._y.index.is_monotonic_increasing else self._y.sort_index()
+
+        # The features of the origins only depend on the last `lookback()` values of every series.
+        series_ids = _series_ids(y.index)
+        tail_rows = np.flatnonzero(_rows_to_end(series_ids) < self.lookback())
+        tail_series_ids = series_ids[tail_rows]
+        tail_features = self._window_features(y.iloc[tail_rows, 0].to_numpy(dtype=np.float64), tail_series_ids)
+        is_origin = _rows_to_end(tail_series_ids) == 0
+        origin_features = tail_features[is_origin]
+        instances = y.index.droplevel(-1)[tail_rows[is_origin]]
+
+        num_series, num_steps = len(instances), len(steps)
+        series_rows = np.repeat(np.arange(num_series), num_steps)
+        step_rows = np.tile(np.arange(num_steps), num_series)
+        pred_times = fh.to_absolute_index(self.cutoff)
+        pred_index = pd.MultiIndex.from_arrays(
+            [instances.get_level_values(level)[series_rows] for level in range(instances.nlevels)]
+            + [pred_times[step_rows]],
+            names=y.index.names,
+        )
+
+        Xt = self._design_matrix(
+            y.columns[0],
+            origin_features[series_rows],
+            steps[step_rows],
+            X.reindex(pred_index) if X is not None else None,
+            index=pred_index,
+        )
+        y_pred = self.estimator_.predict(Xt)
+
+        return pd.DataFrame(y_pred, index=pred_index, columns=y.columns)
+
+    def lookback(self) -> int:
+        """Number of values of a series needed to compute the features of an origin."""
+        windows = self.windows if self.windows is not None else DEFAULT_WINDOWS
+        spans = [lag + window_length - 1 for stat_windows in windows.values() for lag, window_length in stat_windows]
+
+        return max([*self.lags, *spans])
+
+    def _steps(self, fh) -> np.ndarray:
+        """Get the steps of the horizon, relative to the cutoff."""
+        steps = fh.to_relative(self.cutoff).to_numpy().astype(np.int64)
+        if np.any(steps < 1):
+            raise ValueError(f"The direct forecaster only forecasts out of sample, got the steps {steps}.")
+
+        return steps
+
+    def _window_features(self, values: np.ndarray, series_ids: np.ndarray) -> np.ndarray:
+        """Compute the lags and rolling statistics of every row, seen as a forecasting origin.
+
+        The features of a row describe the step after it, as the `WindowSummarizer` features of the recursive
+        reduction do, so all the lags are shifted by one step.
+        """
+        windows = self.windows if self.windows is not None else DEFAULT_WINDOWS
+        lag_values = compute_lags(values, series_ids, lags=[lag - 1 for lag in self.lags], dtype=self.dtype)
+        shifted_windows = {
+            stat: [[lag - 1, window_length] for lag, window_length in stat_windows]
+            for stat, stat_windows in windows.items()
+        }
+        stat_values = compute_rolling_stats(values, series_ids, windows=shifted_windows, dtype=self.dtype)
+
+        return np.hstack([lag_values, stat_values])
+
+    def _design_matrix(
+        self, target: str, window_features: np.ndarray, steps: np.ndarray, X: pd.DataFrame | None, index: pd.Index
+    ) -> pd.DataFrame:
+        """Build the design matrix from the window features of the origins, the steps and the exogenous variables.
+
+        The rows are indexed by their target, as the rows of the design matrix of the recursive reduction.
+        """
+        windows = self.windows if self.windows is not None else DEFAULT_WINDOWS
+        columns = [f"{target}_lag_{lag}" for lag in self.lags] + rolling_column_names(target, windows)
+        design = pd.DataFrame(window_features, columns=columns)
+        design[HORIZON_COLUMN] = steps
+        if X is not None:
+            design = pd.concat([design, X.reset_index(drop=True)], axis=1)
+
+        # The targets repeat when the origins are closer than the horizon, so the index is only set after the concat.
+        return design.set_axis(index, axis=0)
+
+
+def _series_ids(index: pd.MultiIndex) -> np.ndarray:
+    """Compute the id of the series of every row of a panel, from the codes of the instance levels of its index."""
+    instance_levels = range(index.nlevels - 1)
+
+    return np.ravel_multi_index(
+        [index.codes[level] for level in instance_levels], [len(index.levels[level]) for level in instance_levels]
+    )
+
+
+def _rows_to_end(series_ids: np.ndarray) -> np.ndarray:
+    """Compute the number of rows after every row in its series, for series stored contiguously."""
+    num_values = len(series_ids)
+    is_series_end = np.ones(num_values, dtype=bool)
+    np.not_equal(series_ids[1:], series_ids[:-1], out=is_series_end[:-1])
+    series_end_positions = np.flatnonzero(is_series_end)
+    series_lengths = np.diff(np.concatenate([[-1], series_end_positions]))
+
+    return np.repeat(series_end_positions, series_lengths) - np.arange(num_values)
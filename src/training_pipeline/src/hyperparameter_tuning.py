@@ -3,28 +3,48 @@ import warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 import os
-import time
 import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
-from root import OUTPUT_DIR, MODEL_DIR
-from sktime.forecasting.model_selection import ExpandingWindowSplitter, ForecastingGridSearchCV
+from root import HPO_CACHE_DIR, OUTPUT_DIR, MODEL_DIR
+from sktime.forecasting.model_selection import ExpandingWindowSplitter
 from sktime.performance_metrics.forecasting import MeanAbsolutePercentageError
 from sktime.utils.plotting import plot_windows
 from src.training_pipeline.configs import search as search_configs
 from src.training_pipeline.src.data import load_dataset
 from src.training_pipeline.src.models import build_model
+from src.training_pipeline.src.search_engine import run_search
+from src.training_pipeline.src.trial_cache import TrialCache, hash_config
+from src.utils import profiling
 from src.utils.logger import get_logger
 from src.utils.task_utils import save_model
 
 logger = get_logger("logs", __name__)
 
 
-def run(task, task_id: str, model_cfg: dict, fh: int = 24, k: int = 3):
+def run(
+    task,
+    task_id: str,
+    model_cfg: dict,
+    fh: int = 24,
+    k: int = 3,
+    n_trials: int | None = None,
+    n_jobs: int = -1,
+    estimator_jobs: int = 4,
+    pruning: bool = True,
+    resume: bool = True,
+):
     """Run hyperparameter optimization search.
 
     Args:
         fh (int, optional): Forecasting horizon. Defaults to 24.
+        k (int, optional): Number of CV folds. Defaults to 3.
+        n_trials (int, optional): Number of sampled trials. If None, the whole grid is searched. Defaults to None.
+        n_jobs (int, optional): Core budget of the search, -1 for all the cores. Defaults to -1.
+        estimator_jobs (int, optional): Number of threads of every LightGBM estimator. Defaults to 4.
+        pruning (bool, optional): Prune bad configurations with successive halving over the folds. Defaults to True.
+        resume (bool, optional): Persist the trials locally, keyed by the data task id and the model config, to resume
+            an interrupted search and serve the configurations already evaluated. Defaults to True.
         feature_view_version (Optional[int], optional): feature store - feature view version.
              If none, it will try to load the version from the cached feature_view_metadata.json file. Defaults to None.
         training_dataset_version (Optional[int], optional): feature store - feature view - training dataset version.
@@ -32,13 +52,43 @@ def run(task, task_id: str, model_cfg: dict, fh: int = 24, k: int = 3):
     """
     task_logger = task.get_logger()
 
-    (y_train, y_test, X_train, X_test), metadata = load_dataset(task_id=task_id, fh=fh)
+    with profiling.stage("load_data") as stage:
+        (y_train, y_test, X_train, X_test), metadata = load_dataset(task_id=task_id, fh=fh)
+        stage.num_rows = len(y_train) + len(y_test)
     task.register_artifact("y_train", y_train)
     task.register_artifact("y_test", y_test)
     task.register_artifact("X_train", X_train)
     task.register_artifact("X_test", X_test)
 
-    results = run_hyperparameter_optimization(y_train, X_train, model_cfg, task_logger, fh=fh, k=k)
+    trial_cache, storage, study_name = None, None, None
+    if resume:
+        # Fold results only depend on the data, the model config and the CV scheme.
+        context_key = hash_config({"task_id": task_id, "model_cfg": model_cfg, "fh": fh, "k": k})
+        trial_cache = TrialCache(HPO_CACHE_DIR / "trials.db", context_key)
+        storage = f"sqlite:///{HPO_CACHE_DIR / 'optuna.db'}"
+        study_name = "hpo-{}-{}".format(
+            context_key,
+            hash_config({"param_grid": search_configs.search_spaces, "n_trials": n_trials, "pruning": pruning}),
+        )
+        logger.info("Persisting the search in the study %s.", study_name)
+
+    with profiling.stage("search", num_rows=len(y_train)):
+        results = run_hyperparameter_optimization(
+            y_train,
+            X_train,
+            model_cfg,
+            task_logger,
+            fh=fh,
+            k=k,
+            n_trials=n_trials,
+            n_jobs=n_jobs,
+            estimator_jobs=estimator_jobs,
+            pruning=pruning,
+            trial_cache=trial_cache,
+            storage=storage,
+            study_name=study_name,
+            dataset_key=task_id,
+        )
     hpo_result = results.cv_results_.sort_values("rank_test_MeanAbsolutePercentageError")
     hpo_result = hpo_result.rename(
         columns={
@@ -58,23 +108,41 @@ def run(task, task_id: str, model_cfg: dict, fh: int = 24, k: int = 3):
     logger.info("Best score: %s", results.best_score_)
     logger.info("Mean fit time in %.2f seconds.", hpo_result["mean_fit_time"].mean())
     logger.info("Mean prediction time in %.2f seconds.", hpo_result["mean_prediction_time"].mean())
+    logger.info("Pruned %d trials out of %d.", (hpo_result["state"] == "PRUNED").sum(), len(hpo_result))
 
     # Save best model.
     logger.info("Saving best model...")
-    t1 = time.time()
-    save_model(results.best_forecaster_, MODEL_DIR / "model.pkl")
-    task.upload_artifact("model", MODEL_DIR / "model.pkl")
-    task.upload_artifact("best_forecaster", results.best_forecaster_)
-    task.upload_artifact("metadata", metadata)
-    task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
-    logger.info("Successfully saved best model in %.2f seconds.", time.time() - t1)
+    with profiling.stage("save_model") as stage:
+        save_model(results.best_forecaster_, MODEL_DIR / "model.pkl")
+        task.upload_artifact("model", MODEL_DIR / "model.pkl")
+        task.upload_artifact("best_forecaster", results.best_forecaster_)
+        task.upload_artifact("metadata", metadata)
+        task.add_tags([metadata["export_datetime_utc_start"], metadata["export_datetime_utc_end"]])
+    logger.info("Successfully saved best model in %.2f seconds.", stage.wall_seconds)
 
 
 def run_hyperparameter_optimization(
-    y_train: pd.DataFrame, X_train: pd.DataFrame, model_cfg: dict, task_logger, fh: int = 24, k: int = 3
+    y_train: pd.DataFrame,
+    X_train: pd.DataFrame,
+    model_cfg: dict,
+    task_logger,
+    fh: int = 24,
+    k: int = 3,
+    n_trials: int | None = None,
+    n_jobs: int = -1,
+    estimator_jobs: int = 4,
+    pruning: bool = True,
+    trial_cache: TrialCache | None = None,
+    storage: str | None = None,
+    study_name: str | None = None,
+    dataset_key: str | None = None,
 ):
-    """Run hyperparameter optimization search."""
-    model = build_model(model_cfg)
+    """Run hyperparameter optimization search.
+
+    The `dataset_key`, e.g. the id of the data task, scopes the binned LightGBM datasets shared by the folds, the
+    trials and the final fit.
+    """
+    model = build_model(model_cfg, dataset_key=dataset_key)
     data_length = len(y_train.index.get_level_values(-1).unique())
     assert data_length >= fh * 10, "Not enough data to perform a 3 fold CV."
 
@@ -87,32 +155,24 @@ def run_hyperparameter_optimization(
     )
     render_cv_scheme(cv, y_train, task_logger)
 
-    # search = ForecastingSkoptSearchCV(
-    #     forecaster=model,
-    #     cv=cv,
-    #     param_distributions=search_configs.search_spaces,
-    #     n_iter=2,
-    #     random_state=42,
-    #     scoring=MeanAbsolutePercentageError(symmetric=False),
-    #     strategy="refit",
-    #     n_jobs=-1,
-    #     refit=True,
-    #     verbose=10,
-    #     error_score="raise",
-    # )
-    search = ForecastingGridSearchCV(
+    result = run_search(
         forecaster=model,
+        y=y_train,
+        X=X_train,
         cv=cv,
         param_grid=search_configs.search_spaces,
         scoring=MeanAbsolutePercentageError(symmetric=False),
-        strategy="refit",
-        n_jobs=-1,
+        fh=np.arange(fh) + 1,
+        n_trials=n_trials,
+        n_jobs=n_jobs,
+        estimator_jobs=estimator_jobs,
+        pruning=pruning,
+        trial_cache=trial_cache,
+        storage=storage,
+        study_name=study_name,
         refit=True,
-        verbose=10,
-        # return_train_score=True,
-        error_score="raise",
+        task_logger=task_logger,
     )
-    result = search.fit(y=y_train, X=X_train, fh=np.arange(fh) + 1)
 
     return result
 
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+SLICE_LEVELS = ("area", "consumer_type")
+# Same guard against division by zero as the sktime metrics.
+EPS = np.finfo(np.float64).eps
+METRICS = ("RMSPE", "MAPE", "MAE", "sMAPE", "Bias")
+
+
+def compute_metrics(
+    y_true: pd.DataFrame, y_pred: pd.DataFrame, slice_levels: tuple[str, ...] = SLICE_LEVELS
+) -> tuple[dict[str, float], pd.DataFrame]:
+    """Compute the forecasting metrics of every slice and their average over the slices in a single pass.
+
+    The predictions are aligned on the ground truth once, then every metric of every slice is a grouped sum of the
+    pointwise errors. The metrics follow the sktime definitions, e.g. `mean_absolute_percentage_error`, and the
+    aggregated metrics average the slices uniformly, as the sktime metrics do on a panel:
+        - RMSPE: root mean squared percentage error.
+        - MAPE: mean absolute percentage error.
+        - MAE: mean absolute error.
+        - sMAPE: symmetric mean absolute percentage error.
+        - Bias: mean error, positive when the forecasts are too high.
+
+    Args:
+        y_true: The ground truth, indexed by the slice levels and the time.
+        y_pred: The predictions, with the same index as the ground truth, in any order.
+        slice_levels: The index levels identifying a slice.
+
+    Returns:
+        tuple[dict[str, float], pd.DataFrame]: The aggregated metrics and the table of the metrics of every slice.
+    """
+    true_values = y_true.iloc[:, 0].to_numpy(dtype=np.float64)
+    if y_pred.index.equals(y_true.index):
+        pred_values = y_pred.iloc[:, 0].to_numpy(dtype=np.float64)
+    else:
+        pred_values = y_pred.iloc[:, 0].reindex(y_true.index).to_numpy(dtype=np.float64)
+
+    # The slices are identified from the codes of the index levels, without materializing the keys of every row.
+    index = y_true.index
+    level_numbers = [index.names.index(level) for level in slice_levels]
+    level_sizes = [len(index.levels[level]) for level in level_numbers]
+    slice_codes = np.ravel_multi_index([index.codes[level] for level in level_numbers], level_sizes)
+    unique_slice_codes, slice_ids = np.unique(slice_codes, return_inverse=True)
+    slices = pd.DataFrame(
+        {
+            level: index.levels[level_number].take(codes)
+            for level, level_number, codes in zip(
+                slice_levels, level_numbers, np.unravel_index(unique_slice_codes, level_sizes)
+            )
+        }
+    )
+    slice_sizes = np.bincount(slice_ids, minlength=len(slices))
+
+    errors = pred_values - true_values
+    absolute_errors = np.abs(errors)
+    percentage_errors = absolute_errors / np.maximum(np.abs(true_values), EPS)
+    symmetric_percentage_errors = 2 * absolute_errors / np.maximum(np.abs(true_values) + np.abs(pred_values), EPS)
+
+    def slice_mean(values: np.ndarray) -> np.ndarray:
+        return np.bincount(slice_ids, weights=values, minlength=len(slices)) / slice_sizes
+
+    slices["RMSPE"] = np.sqrt(slice_mean(percentage_errors**2))
+    slices["MAPE"] = slice_mean(percentage_errors)
+    slices["MAE"] = slice_mean(absolute_errors)
+    slices["sMAPE"] = slice_mean(symmetric_percentage_errors)
+    slices["Bias"] = slice_mean(errors)
+
+    results = {metric: float(slices[metric].mean()) for metric in METRICS}
+    # As in sktime, the root is taken after averaging the squared percentage errors of the slices.
+    results["RMSPE"] = float(np.sqrt(np.mean(slices["RMSPE"] ** 2)))
+
+    return results, slices
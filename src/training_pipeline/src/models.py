@@ -1,15 +1,21 @@
 import lightgbm as lgb
+from root import LGBM_DATASET_CACHE_DIR
 from sktime.forecasting.compose import ForecastingPipeline, make_reduction
 from sktime.forecasting.naive import NaiveForecaster
 from sktime.transformations.series.date import DateTimeFeatures
 from sktime.transformations.series.summarize import WindowSummarizer
 from src.training_pipeline.src import transformers
+from src.training_pipeline.src.direct import DirectHorizonForecaster
+from src.training_pipeline.src.native_lgbm import NativeLGBMRegressor
 from src.utils.logger import get_logger
 
 logger = get_logger("logs", __name__)
 
+STRATEGIES = ("recursive", "direct")
+REGRESSORS = ("native", "sklearn")
 
-def build_model(config: dict):
+
+def build_model(config: dict, dataset_key: str | None = None):
     """
     Build an Sktime model using the given config.
 
@@ -17,7 +23,24 @@ def build_model(config: dict):
     - lag: list(range(1, 72 + 1))
     - mean: [[1, 24], [1, 48], [1, 72]]
     - std: [[1, 24], [1, 48], [1, 72]]
+
+    The `strategy` key selects the reduction, "recursive" by default: the recursive reduction predicts the horizon
+    step by step, while the "direct" strategy predicts all the steps at once with a `DirectHorizonForecaster`, whose
+    `origin_stride` is set by the `origin_stride` key.
+
+    The `regressor` key selects the LightGBM regressor, "native" by default: a `NativeLGBMRegressor`, which caches
+    its binned datasets and bins the fits of the same `dataset_key`, e.g. the id of the data task, with the bin
+    mappers of the reference dataset built by the search on the training window of its first fold. The "sklearn"
+    regressor is the `lgb.LGBMRegressor`, which bins the features on every fit.
     """
+    strategy = config.pop("strategy", "recursive")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}. Supported strategies: {STRATEGIES}.")
+    origin_stride = config.pop("origin_stride", None)
+    regressor_type = config.pop("regressor", "native")
+    if regressor_type not in REGRESSORS:
+        raise ValueError(f"Unknown regressor {regressor_type}. Supported regressors: {REGRESSORS}.")
+
     lag = config.pop(
         "forecaster_transformers__window_summarizer__lag_feature__lag",
         list(range(1, 72 + 1)),
@@ -31,19 +54,33 @@ def build_model(config: dict):
         [[1, 24], [1, 48], [1, 72]],
     )
     n_jobs = config.pop("forecaster_transformers__window_summarizer__n_jobs", 1)
-    window_summarizer = WindowSummarizer(
-        **{"lag_feature": {"lag": lag, "mean": mean, "std": std}},
-        n_jobs=n_jobs,
-    )
 
-    regressor = lgb.LGBMRegressor()
-    forecaster = make_reduction(
-        regressor,
-        transformers=[window_summarizer],
-        strategy="recursive",
-        pooling="global",
-        window_length=None,
-    )
+    if regressor_type == "native":
+        regressor = NativeLGBMRegressor(
+            dataset_dir=str(LGBM_DATASET_CACHE_DIR) if dataset_key is not None else None,
+            dataset_key=dataset_key,
+        )
+    else:
+        regressor = lgb.LGBMRegressor()
+    if strategy == "direct":
+        forecaster = DirectHorizonForecaster(
+            regressor,
+            lags=tuple(lag),
+            windows={"mean": mean, "std": std},
+            origin_stride=origin_stride,
+        )
+    else:
+        window_summarizer = WindowSummarizer(
+            **{"lag_feature": {"lag": lag, "mean": mean, "std": std}},
+            n_jobs=n_jobs,
+        )
+        forecaster = make_reduction(
+            regressor,
+            transformers=[window_summarizer],
+            strategy="recursive",
+            pooling="global",
+            window_length=None,
+        )
 
     pipe = ForecastingPipeline(
         steps=[
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import lightgbm as lgb
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.utils.validation import check_is_fitted
+from src.utils import cache_utils
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+LGBM_DATASET_CACHE_MAX_SIZE_BYTES = 5 * 1024**3
+DATASET_FILE_PATTERN = "*.bin"
+
+
+class NativeLGBMRegressor(BaseEstimator, RegressorMixin):
+    """LightGBM regressor trained with the native API, which reuses the binned datasets of its previous fits.
+
+    The sklearn wrapper of LightGBM rebins the features on every fit. This regressor builds every `lgb.Dataset` once,
+    without keeping the raw data, and saves its binary form in `dataset_dir`, keyed by a fingerprint of the data. The
+    next fits on the same data, e.g. the trials of a hyperparameter search on the same CV fold, load the binary dataset
+    instead of binning the features again. The datasets of new data are binned with the bin mappers of the reference
+    dataset of the same `dataset_key`, features and binning parameters, if one was built with `build_reference`, so
+    they skip the search of the bin boundaries. Otherwise, they search their own bin boundaries.
+
+    The hyperparameters and their defaults are the ones of `lgb.LGBMRegressor`.
+
+    Args:
+        dataset_dir: Directory of the binary datasets. If None, the datasets are built in memory on every fit.
+        dataset_key: Scope of the shared bin mappers, e.g. the id of the task that produced the data.
+    """
+
+    def __init__(
+        self,
+        n_estimators: int = 100,
+        learning_rate: float = 0.1,
+        num_leaves: int = 31,
+        max_depth: int = -1,
+        min_child_samples: int = 20,
+        min_child_weight: float = 1e-3,
+        min_split_gain: float = 0.0,
+        subsample: float = 1.0,
+        subsample_freq: int = 0,
+        colsample_bytree: float = 1.0,
+        reg_alpha: float = 0.0,
+        reg_lambda: float = 0.0,
+        max_bin: int = 255,
+        subsample_for_bin: int = 200000,
+        random_state: int | None = None,
+        n_jobs: int | None = None,
+        verbosity: int = -1,
+        dataset_dir: str | None = None,
+        dataset_key: str | None = None,
+    ):
+        self.n_estimators = n_estimators
+        self.learning_rate = learning_rate
+        self.num_leaves = num_leaves
+        self.max_depth = max_depth
+        self.min_child_samples = min_child_samples
+        self.min_child_weight = min_child_weight
+        self.min_split_gain = min_split_gain
+        self.subsample = subsample
+        self.subsample_freq = subsample_freq
+        self.colsample_bytree = colsample_bytree
+        self.reg_alpha = reg_alpha
+        self.reg_lambda = reg_lambda
+        self.max_bin = max_bin
+        self.subsample_for_bin = subsample_for_bin
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.verbosity = verbosity
+        self.dataset_dir = dataset_dir
+        self.dataset_key = dataset_key
+
+    def fit(self, X: pd.DataFrame, y) -> "NativeLGBMRegressor":
+        X = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X)
+        dataset_file = self.build_dataset(X, y) if self.dataset_dir is not None else None
+        if dataset_file is not None:
+            train_set = lgb.Dataset(str(dataset_file), params=self._dataset_params())
+        else:
+            train_set = lgb.Dataset(X, label=y, params=self._dataset_params(), free_raw_data=True)
+
+        self.booster_ = lgb.train(self._train_params(), train_set, num_boost_round=self.n_estimators)
+        self.n_features_in_ = X.shape[1]
+
+        return self
+
+    def continue_fit(self, X: pd.DataFrame, y, num_boost_round: int) -> "NativeLGBMRegressor":
+        """Continue the boosting of the fitted booster on new data, e.g. the latest window of the series.
+
+        The new trees are fitted on the residuals of the current booster on the new data, so the booster is updated
+        without binning and training again on the data it was fitted on.
+
+        Args:
+            X: The new features.
+            y: The new target.
+            num_boost_round: Number of trees to add.
+        """
+        check_is_fitted(self, "booster_")
+
+        train_set = lgb.Dataset(X, label=y, params=self._dataset_params(), free_raw_data=True)
+        self.booster_ = lgb.train(
+            self._train_params(),
+            train_set,
+            num_boost_round=num_boost_round,
+            init_model=self.booster_,
+            keep_training_booster=True,
+        )
+
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        check_is_fitted(self, "booster_")
+
+        return self.booster_.predict(X, num_threads=self._num_threads())
+
+    def build_dataset(self, X: pd.DataFrame, y) -> Path | None:
+        """Build the binned dataset of the data and save it in `dataset_dir`, unless it is already there.
+
+        Args:
+            X: The features.
+            y: The target.
+
+        Returns:
+            Path | None: The binary dataset, or None if the features cannot be cached, as the binary datasets do not
+                store the categories of the pandas categorical features.
+        """
+        if not _is_numeric(X):
+            return None
+
+        dataset_dir = Path(self.dataset_dir)
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+
+        dataset_file = dataset_dir / f"{_fingerprint(X, y, self.dataset_key, self._dataset_params())}.bin"
+        if dataset_file.exists():
+            cache_utils.touch(dataset_file)
+            return dataset_file
+
+        reference_file = self._reference_file(X)
+        reference = None
+        if reference_file.exists():
+            cache_utils.touch(reference_file)
+            reference = lgb.Dataset(str(reference_file), params=self._dataset_params()).construct()
+
+        dataset = lgb.Dataset(X, label=y, reference=reference, params=self._dataset_params(), free_raw_data=True)
+        dataset.construct()
+        _save_binary(dataset, dataset_file)
+        logger.info(
+            "Built the binned dataset %s of shape %s%s.",
+            dataset_file.name,
+            X.shape,
+            " with the shared bin mappers" if reference is not None else "",
+        )
+        cache_utils.evict_lru(dataset_dir, LGBM_DATASET_CACHE_MAX_SIZE_BYTES, pattern=DATASET_FILE_PATTERN)
+
+        return dataset_file
+
+    def build_reference(self, X: pd.DataFrame, y) -> Path | None:
+        """Build the binned dataset of the data with its own bin boundaries and make it the reference of the next \
+        datasets of the same `dataset_key`, features and binning parameters.
+
+        The reference should be built from data that precedes the test windows of the next datasets, e.g. the training
+        window of the first fold of a search, so no dataset is binned with boundaries computed from the data it is
+        evaluated on. Its bin boundaries are reused as is by the next datasets. A `dataset_key` is expected to always
+        have the same reference data, as the datasets already built with the previous reference are kept.
+
+        Args:
+            X: The features.
+            y: The target.
+
+        Returns:
+            Path | None: The binary dataset, or None if the features cannot be cached.
+        """
+        if not _is_numeric(X):
+            return None
+
+        dataset_dir = Path(self.dataset_dir)
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+
+        dataset = lgb.Dataset(X, label=y, params=self._dataset_params(), free_raw_data=True)
+        dataset.construct()
+        reference_file = self._reference_file(X)
+        _save_binary(dataset, reference_file)
+        # The reference is also the dataset of its data, e.g. of the refit on the whole training data.
+        dataset_file = dataset_dir / f"{_fingerprint(X, y, self.dataset_key, self._dataset_params())}.bin"
+        _save_binary(dataset, dataset_file)
+        logger.info("Built the reference dataset %s of shape %s.", reference_file.name, X.shape)
+        cache_utils.evict_lru(dataset_dir, LGBM_DATASET_CACHE_MAX_SIZE_BYTES, pattern=DATASET_FILE_PATTERN)
+
+        return dataset_file
+
+    def _reference_file(self, X: pd.DataFrame) -> Path:
+        features_key = [[str(column) for column in X.columns], [str(dtype) for dtype in X.dtypes]]
+
+        return (
+            Path(self.dataset_dir) / f"reference-{_hash([self.dataset_key, features_key, self._dataset_params()])}.bin"
+        )
+
+    def _dataset_params(self) -> dict[str, Any]:
+        # Without the pre-filtering of the features, a dataset can be reused by any `min_child_samples`.
+        return {
+            "max_bin": self.max_bin,
+            "bin_construct_sample_cnt": self.subsample_for_bin,
+            "feature_pre_filter": False,
+            "verbosity": self.verbosity,
+        }
+
+    def _train_params(self) -> dict[str, Any]:
+        params = {
+            "objective": "regression",
+            "boosting_type": "gbdt",
+            "learning_rate": self.learning_rate,
+            "num_leaves": self.num_leaves,
+            "max_depth": self.max_depth,
+            "min_child_samples": self.min_child_samples,
+            "min_child_weight": self.min_child_weight,
+            "min_split_gain": self.min_split_gain,
+            "subsample": self.subsample,
+            "subsample_freq": self.subsample_freq,
+            "colsample_bytree": self.colsample_bytree,
+            "reg_alpha": self.reg_alpha,
+            "reg_lambda": self.reg_lambda,
+            "num_threads": self._num_threads(),
+            **self._dataset_params(),
+        }
+        if self.random_state is not None:
+            params["seed"] = self.random_state
+
+        return params
+
+    def _num_threads(self) -> int:
+        """Convert `n_jobs` to LightGBM threads, following the joblib conventions of `lgb.LGBMRegressor`."""
+        if self.n_jobs is None:
+            return 0
+        if self.n_jobs < 0:
+            return max(os.cpu_count() + 1 + self.n_jobs, 1)
+
+        return self.n_jobs
+
+
+def _is_numeric(X: pd.DataFrame) -> bool:
+    return all(pd.api.types.is_numeric_dtype(dtype) for dtype in X.dtypes)
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _fingerprint(X: pd.DataFrame, y, *keys) -> str:
+    """Hash the data and the given keys, column by column to avoid copying the features."""
+    digest = hashlib.blake2b(json.dumps(keys, sort_keys=True, default=str).encode(), digest_size=16)
+    digest.update(json.dumps([[str(column) for column in X.columns], [str(dtype) for dtype in X.dtypes]]).encode())
+    for column in range(X.shape[1]):
+        digest.update(np.ascontiguousarray(X.iloc[:, column].to_numpy()))
+    digest.update(np.ascontiguousarray(np.asarray(y, dtype=np.float64)))
+
+    return digest.hexdigest()
+
+
+def _save_binary(dataset: lgb.Dataset, file_path: Path):
+    """Save a dataset atomically, so concurrent fits never load a partial file."""
+    tmp_file = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+    dataset.save_binary(str(tmp_file))
+    os.replace(tmp_file, file_path)
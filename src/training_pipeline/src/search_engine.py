@@ -0,0 +1,503 @@
+import copy
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import optuna
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from src.training_pipeline.src.trial_cache import TrialCache, hash_config
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+ESTIMATOR_PARAM = "forecaster__estimator"
+ESTIMATOR_PARAM_PREFIX = f"{ESTIMATOR_PARAM}__"
+ESTIMATOR_N_JOBS_PARAM = f"{ESTIMATOR_PARAM_PREFIX}n_jobs"
+
+
+@dataclass(frozen=True)
+class CoreBudget:
+    """Split of the cores between the search, which evaluates trials in parallel, and the estimator threads."""
+
+    search_jobs: int
+    estimator_jobs: int
+
+    @classmethod
+    def allocate(cls, n_jobs: int = -1, estimator_jobs: int = 4, max_search_jobs: int | None = None) -> "CoreBudget":
+        """Allocate the cores so that `search_jobs * estimator_jobs` never exceeds the budget.
+
+        Args:
+            n_jobs: Total number of cores of the budget, -1 for all the available cores.
+            estimator_jobs: Number of threads of every estimator, e.g. LightGBM threads.
+            max_search_jobs: Maximum number of trials worth evaluating in parallel.
+        """
+        total_cores = available_cores() if n_jobs in (-1, None) else n_jobs
+        estimator_jobs = max(1, min(estimator_jobs, total_cores))
+        search_jobs = max(1, total_cores // estimator_jobs)
+        if max_search_jobs is not None:
+            search_jobs = max(1, min(search_jobs, max_search_jobs))
+        # Give the cores left by a capped search to the estimators.
+        estimator_jobs = max(estimator_jobs, total_cores // search_jobs)
+
+        return cls(search_jobs=search_jobs, estimator_jobs=estimator_jobs)
+
+
+@dataclass
+class SearchResult:
+    """Result of a search, exposing the attributes of the sktime searches used downstream."""
+
+    cv_results_: pd.DataFrame
+    best_params_: dict[str, Any]
+    best_score_: float
+    best_index_: int
+    best_forecaster_: Any = None
+    study: optuna.Study | None = field(default=None, repr=False)
+
+
+def available_cores() -> int:
+    """Number of cores the process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def run_search(
+    forecaster,
+    y: pd.DataFrame,
+    X: pd.DataFrame,
+    cv,
+    param_grid: dict[str, list],
+    scoring,
+    fh: np.ndarray,
+    n_trials: int | None = None,
+    n_jobs: int = -1,
+    estimator_jobs: int = 4,
+    pruning: bool = True,
+    cache_features: bool = True,
+    trial_cache: TrialCache | None = None,
+    storage: str | None = None,
+    study_name: str | None = None,
+    refit: bool = True,
+    random_state: int = 42,
+    task_logger=None,
+) -> SearchResult:
+    """Search the hyperparameters of a forecaster with cross-validation.
+
+    Trials are evaluated fold by fold, in batches of `search_jobs` trials running in parallel processes, each
+    estimator using `estimator_jobs` threads. After every fold, the mean score of every trial of the batch is reported
+    to a successive halving pruner, which stops the bad configurations before their remaining folds.
+
+    When only the hyperparameters of the regressor are searched, the features of the reduction, e.g. the lag and window
+    features, do not depend on the trial. Thus, the forecasting pipeline is fitted once per fold to materialize the
+    design matrix of the reduced regression problem, and every trial only fits its regressor on it.
+
+    With a `storage`, the study is persisted and resumed: the trials finished by a previous run of the same study are
+    kept, the trials it left running are evaluated again and, with a `trial_cache`, every fold result already computed
+    for the same context is served from the cache instead of being evaluated again.
+
+    Args:
+        forecaster: The sktime forecaster to tune.
+        y: The time series to forecast.
+        X: The exogenous variables.
+        cv: The sktime splitter of the cross-validation.
+        param_grid: The values of every hyperparameter.
+        scoring: The sktime metric to minimize.
+        fh: The forecasting horizon.
+        n_trials: Number of trials sampled by TPE. If None, the whole grid is evaluated.
+        n_jobs: Total number of cores of the search, -1 for all the available cores.
+        estimator_jobs: Number of threads of every estimator.
+        pruning: Prune the bad trials with successive halving over the folds.
+        cache_features: Materialize the design matrix once per fold and only fit the regressor of every trial. Ignored
+            if hyperparameters other than the ones of the regressor are searched.
+        trial_cache: Cache of the fold results, which are persisted as soon as they are computed.
+        storage: Optuna storage URL of the study, e.g. `sqlite:///optuna.db`. If None, the study is kept in memory.
+        study_name: Name of the study in the storage.
+        refit: Fit the best configuration on the whole data.
+        random_state: Seed of the sampler.
+        task_logger: ClearML logger used to report the wall-clock time of every trial.
+
+    Returns:
+        SearchResult: The results of the search.
+    """
+    param_grid = {name: list(values) for name, values in param_grid.items() if name != ESTIMATOR_N_JOBS_PARAM}
+    pruner = (
+        optuna.pruners.SuccessiveHalvingPruner(min_resource=1, reduction_factor=3)
+        if pruning
+        else optuna.pruners.NopPruner()
+    )
+    study = optuna.create_study(
+        study_name=study_name,
+        storage=storage,
+        load_if_exists=True,
+        direction="minimize",
+        sampler=optuna.samplers.TPESampler(seed=random_state),
+        pruner=pruner,
+    )
+    num_remaining_trials = _prepare_study(study, param_grid, n_trials)
+
+    budget = CoreBudget.allocate(
+        n_jobs=n_jobs, estimator_jobs=estimator_jobs, max_search_jobs=max(1, num_remaining_trials)
+    )
+    folds = list(cv.split(y))
+    logger.info(
+        "Searching %d trials over %d folds with %d parallel trials of %d estimator threads.",
+        num_remaining_trials,
+        len(folds),
+        budget.search_jobs,
+        budget.estimator_jobs,
+    )
+
+    # Fitted feature pipeline and design matrix of every fold, shared by all the trials.
+    fold_designs = None
+    if cache_features:
+        if all(name.startswith(ESTIMATOR_PARAM_PREFIX) for name in param_grid):
+            fold_designs = {}
+        else:
+            logger.info("Not caching the fold features, as the search is not restricted to the regressor.")
+
+    # Regressors sharing the bin mappers of their binned datasets, e.g. `NativeLGBMRegressor`, bin the training rows
+    # of the first fold first, so the folds, the refit and the later fits on the same data all use its bin boundaries
+    # and no fold is binned with the data after it.
+    if getattr(forecaster.get_params().get(ESTIMATOR_PARAM), "dataset_dir", None) is not None:
+        first_train_index = folds[0][0]
+        _build_reference(forecaster, y.iloc[first_train_index], X.iloc[first_train_index], fh)
+
+    num_asked = 0
+    with Parallel(n_jobs=budget.search_jobs) as parallel:
+        while num_asked < num_remaining_trials:
+            batch_size = min(budget.search_jobs, num_remaining_trials - num_asked)
+            batch = [_ask(study, param_grid) for _ in range(batch_size)]
+            num_asked += batch_size
+
+            batch_records = _run_batch(
+                parallel, batch, forecaster, y, X, folds, scoring, fh, budget, fold_designs, trial_cache
+            )
+            for (trial, params), record in zip(batch, batch_records):
+                if task_logger is not None:
+                    task_logger.report_scalar(
+                        "Trial wall clock", "seconds", record["wall_clock_time"], iteration=trial.number
+                    )
+                logger.info(
+                    "Trial %d %s after %d folds in %.2f seconds: %s=%.5f, params=%s",
+                    trial.number,
+                    record["state"],
+                    record["num_folds"],
+                    record["wall_clock_time"],
+                    scoring.name,
+                    record[f"mean_test_{scoring.name}"],
+                    params,
+                )
+
+    result = _build_result(scoring, study)
+    if refit:
+        best_forecaster = clone(forecaster).set_params(
+            **result.best_params_, **{ESTIMATOR_N_JOBS_PARAM: budget.search_jobs * budget.estimator_jobs}
+        )
+        result.best_forecaster_ = best_forecaster.fit(y=y, X=X, fh=fh)
+
+    return result
+
+
+def expand_grid(param_grid: dict[str, list]) -> list[dict[str, Any]]:
+    """List all the configurations of a grid."""
+    names = list(param_grid.keys())
+
+    return [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+
+
+def _prepare_study(study: optuna.Study, param_grid: dict[str, list], n_trials: int | None) -> int:
+    """Prepare a new or resumed study and compute the number of trials left to run.
+
+    Returns:
+        int: The number of trials to ask.
+    """
+    # A resumed study can hold trials left running by a killed run, which are evaluated again.
+    for trial in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.RUNNING,)):
+        study.tell(trial.number, state=optuna.trial.TrialState.FAIL)
+
+    finished_trials = study.get_trials(
+        deepcopy=False, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    )
+    waiting_trials = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.WAITING,))
+    if len(finished_trials) > 0:
+        logger.info("Resuming the study %s with %d finished trials.", study.study_name, len(finished_trials))
+
+    if n_trials is not None:
+        return max(0, n_trials - len(finished_trials))
+
+    # Enqueue the grid instead of using the `GridSampler`, which stops the study from its callbacks, thus does not
+    # support the ask-and-tell interface.
+    queued_keys = {hash_config(trial.params) for trial in finished_trials}
+    queued_keys.update(hash_config(trial.system_attrs.get("fixed_params", {})) for trial in waiting_trials)
+    num_enqueued = 0
+    for params in expand_grid(param_grid):
+        if hash_config(params) not in queued_keys:
+            study.enqueue_trial(params)
+            num_enqueued += 1
+
+    return len(waiting_trials) + num_enqueued
+
+
+def _ask(study: optuna.Study, param_grid: dict[str, list]) -> tuple[optuna.Trial, dict[str, Any]]:
+    """Ask the study for a new trial and sample its configuration."""
+    trial = study.ask()
+    params = {name: trial.suggest_categorical(name, values) for name, values in param_grid.items()}
+
+    return trial, params
+
+
+def _run_batch(
+    parallel,
+    batch,
+    forecaster,
+    y,
+    X,
+    folds,
+    scoring,
+    fh,
+    budget: CoreBudget,
+    fold_designs: dict | None = None,
+    trial_cache: TrialCache | None = None,
+) -> list[dict[str, Any]]:
+    """Evaluate a batch of trials fold by fold, pruning the bad ones after every fold.
+
+    If `fold_designs` is not None, it caches the fitted feature pipeline and the design matrix of every fold. If
+    `trial_cache` is not None, the fold results are read from and written to it.
+    """
+    fold_results = {trial.number: [] for trial, _ in batch}
+    states = {trial.number: optuna.trial.TrialState.RUNNING for trial, _ in batch}
+
+    for fold_index, (train_index, test_index) in enumerate(folds):
+        live_trials = [(trial, params) for trial, params in batch if not states[trial.number].is_finished()]
+        if len(live_trials) == 0:
+            break
+
+        cached_results = {}
+        if trial_cache is not None:
+            for trial, params in live_trials:
+                cached_result = trial_cache.get(params, fold_index)
+                if cached_result is not None:
+                    cached_results[trial.number] = cached_result
+        evaluated_trials = [(trial, params) for trial, params in live_trials if trial.number not in cached_results]
+
+        y_train, y_test = y.iloc[train_index], y.iloc[test_index]
+        X_train, X_test = X.iloc[train_index], X.iloc[test_index]
+        if fold_designs is None:
+            results = parallel(
+                delayed(_evaluate_fold)(
+                    forecaster,
+                    {**params, ESTIMATOR_N_JOBS_PARAM: budget.estimator_jobs},
+                    y_train,
+                    y_test,
+                    X_train,
+                    X_test,
+                    scoring,
+                    fh,
+                )
+                for _, params in evaluated_trials
+            )
+        elif len(evaluated_trials) > 0:
+            if fold_index not in fold_designs:
+                fold_designs[fold_index] = _fit_design_matrix(forecaster, y_train, X_train, fh)
+            fitted_forecaster, Xt, yt = fold_designs[fold_index]
+            estimator = forecaster.get_params()[ESTIMATOR_PARAM]
+            results = parallel(
+                delayed(_evaluate_fold_on_design)(
+                    fitted_forecaster,
+                    _build_estimator(estimator, {**params, ESTIMATOR_N_JOBS_PARAM: budget.estimator_jobs}),
+                    Xt,
+                    yt,
+                    y_test,
+                    X_test,
+                    scoring,
+                    fh,
+                )
+                for _, params in evaluated_trials
+            )
+        else:
+            results = []
+
+        for (trial, params), fold_result in zip(evaluated_trials, results):
+            cached_results[trial.number] = fold_result
+            if trial_cache is not None:
+                trial_cache.put(params, fold_index, fold_result)
+
+        for trial, _ in live_trials:
+            fold_results[trial.number].append(cached_results[trial.number])
+            # The pruner compares the trials on their mean score over the same number of folds.
+            trial.report(np.mean([result["score"] for result in fold_results[trial.number]]), step=fold_index + 1)
+            if fold_index + 1 < len(folds) and trial.should_prune():
+                states[trial.number] = optuna.trial.TrialState.PRUNED
+
+    records = []
+    for trial, params in batch:
+        trial_results = fold_results[trial.number]
+        mean_score = float(np.mean([result["score"] for result in trial_results]))
+        if states[trial.number] != optuna.trial.TrialState.PRUNED:
+            states[trial.number] = optuna.trial.TrialState.COMPLETE
+
+        record = {
+            "trial": trial.number,
+            "params": params,
+            f"mean_test_{scoring.name}": mean_score,
+            "mean_fit_time": float(np.mean([result["fit_time"] for result in trial_results])),
+            "mean_pred_time": float(np.mean([result["pred_time"] for result in trial_results])),
+            "wall_clock_time": float(np.sum([result["wall_clock_time"] for result in trial_results])),
+            "num_folds": len(trial_results),
+            "state": states[trial.number].name,
+        }
+        # The record is stored with the trial, so a resumed study rebuilds the results of its previous runs.
+        trial.set_user_attr("record", record)
+        if states[trial.number] == optuna.trial.TrialState.PRUNED:
+            trial.study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+        else:
+            trial.study.tell(trial, mean_score)
+        records.append(record)
+
+    return records
+
+
+def _evaluate_fold(forecaster, params, y_train, y_test, X_train, X_test, scoring, fh) -> dict[str, float]:
+    """Fit a configuration on the training window of a fold and score it on the test window."""
+    t1 = time.perf_counter()
+    forecaster = clone(forecaster).set_params(**params)
+    forecaster.fit(y=y_train, X=X_train, fh=fh)
+    fit_time = time.perf_counter() - t1
+
+    t2 = time.perf_counter()
+    y_pred = forecaster.predict(fh=fh, X=X_test)
+    pred_time = time.perf_counter() - t2
+    score = scoring(y_test, y_pred)
+
+    return {
+        "score": float(score),
+        "fit_time": fit_time,
+        "pred_time": pred_time,
+        "wall_clock_time": time.perf_counter() - t1,
+    }
+
+
+def _fit_design_matrix(forecaster, y_train, X_train, fh) -> tuple[Any, pd.DataFrame, np.ndarray]:
+    """Fit the feature pipeline of a fold once, capturing the design matrix of the reduced regression problem.
+
+    Returns:
+        tuple[Any, pd.DataFrame, np.ndarray]: The fitted forecasting pipeline, without regressor, and the design matrix
+            with its target.
+    """
+    t1 = time.perf_counter()
+    fitted_forecaster = clone(forecaster).set_params(**{ESTIMATOR_PARAM: DesignMatrixCapture()})
+    fitted_forecaster.fit(y=y_train, X=X_train, fh=fh)
+
+    reducer = fitted_forecaster.forecaster_
+    capture = reducer.estimator_
+    # Drop the reference to the design matrix, so copying the fitted pipeline does not copy it.
+    reducer.estimator_ = None
+    logger.info("Materialized a design matrix of shape %s in %.2f seconds.", capture.X_.shape, time.perf_counter() - t1)
+
+    # Regressors caching their binned training data, e.g. `NativeLGBMRegressor`, bin the fold once for all the trials.
+    estimator = forecaster.get_params()[ESTIMATOR_PARAM]
+    if getattr(estimator, "dataset_dir", None) is not None:
+        estimator.build_dataset(capture.X_, capture.y_)
+
+    return fitted_forecaster, capture.X_, capture.y_
+
+
+def _build_reference(forecaster, y_train, X_train, fh):
+    """Bin the design matrix of the first training window as the reference dataset of the regressor of the forecaster.
+
+    Every fold is thus binned with bin boundaries computed from data before its test window, as the backtest does with
+    its first origin. The features of the later rows outside of the boundaries fall in the first or the last bin.
+    """
+    t1 = time.perf_counter()
+    capture_forecaster = clone(forecaster).set_params(**{ESTIMATOR_PARAM: DesignMatrixCapture()})
+    capture_forecaster.fit(y=y_train, X=X_train, fh=fh)
+    capture = capture_forecaster.forecaster_.estimator_
+    forecaster.get_params()[ESTIMATOR_PARAM].build_reference(capture.X_, capture.y_)
+    logger.info("Built the reference dataset of the search in %.2f seconds.", time.perf_counter() - t1)
+
+
+def _build_estimator(estimator, params: dict[str, Any]):
+    """Build the regressor of a trial from the hyperparameters of the forecasting pipeline."""
+    estimator_params = {name[len(ESTIMATOR_PARAM_PREFIX) :]: value for name, value in params.items()}
+
+    return clone(estimator).set_params(**estimator_params)
+
+
+def _evaluate_fold_on_design(
+    fitted_forecaster, estimator, Xt: pd.DataFrame, yt: np.ndarray, y_test, X_test, scoring, fh
+) -> dict[str, float]:
+    """Fit the regressor of a configuration on the cached design matrix of a fold and score it on the test window."""
+    t1 = time.perf_counter()
+    forecaster = copy.deepcopy(fitted_forecaster)
+    forecaster.forecaster_.estimator_ = estimator.fit(Xt, yt)
+    fit_time = time.perf_counter() - t1
+
+    t2 = time.perf_counter()
+    y_pred = forecaster.predict(fh=fh, X=X_test)
+    pred_time = time.perf_counter() - t2
+    score = scoring(y_test, y_pred)
+
+    return {
+        "score": float(score),
+        "fit_time": fit_time,
+        "pred_time": pred_time,
+        "wall_clock_time": time.perf_counter() - t1,
+    }
+
+
+class DesignMatrixCapture(BaseEstimator, RegressorMixin):
+    """Regressor that only stores the data it is fitted on, used to capture the design matrix of a reduction."""
+
+    def fit(self, X, y):
+        self.X_ = X
+        self.y_ = y
+
+        return self
+
+    def predict(self, X):
+        raise NotImplementedError("The design matrix capture is not a forecasting regressor.")
+
+
+def _build_result(scoring, study: optuna.Study) -> SearchResult:
+    """Build the sktime-like result of all the finished trials of the study, ranking the completed trials first."""
+    score_column = f"mean_test_{scoring.name}"
+    records = [
+        trial.user_attrs["record"]
+        for trial in study.get_trials(
+            deepcopy=False, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+        )
+        if "record" in trial.user_attrs
+    ]
+    num_complete = sum(record["state"] == optuna.trial.TrialState.COMPLETE.name for record in records)
+    if num_complete == 0:
+        raise RuntimeError(
+            f"None of the {len(records)} finished trials of the study {study.study_name} completed all the folds, "
+            "thus there is no best configuration. Relax the pruning or run more trials."
+        )
+
+    cv_results = pd.DataFrame(records)
+    params = pd.DataFrame(cv_results["params"].tolist()).add_prefix("param_")
+    cv_results = pd.concat([cv_results, params], axis=1)
+
+    is_complete = cv_results["state"] == optuna.trial.TrialState.COMPLETE.name
+    rank_score = cv_results[score_column].where(is_complete, np.inf)
+    cv_results[f"rank_test_{scoring.name}"] = rank_score.rank(method="min").astype(int)
+
+    # The pruned trials are scored on fewer folds, so the best configuration is selected among the completed ones.
+    best_index = int(cv_results.loc[is_complete, score_column].idxmin())
+
+    return SearchResult(
+        cv_results_=cv_results,
+        best_params_=cv_results.loc[best_index, "params"],
+        best_score_=float(cv_results.loc[best_index, score_column]),
+        best_index_=best_index,
+        study=study,
+    )
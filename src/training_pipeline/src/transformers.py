@@ -5,6 +5,9 @@ class AttachAreaConsumerType(BaseTransformer):
     """Transformer used to extract the area and consumer type from the index to the input data."""
 
     def fit(self, X, y=None):
+        # The public methods are overridden, so the fitted state used by `update` is set here.
+        self._is_fitted = True
+
         return self
 
     def transform(self, X, y=None):
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+
+def hash_config(config: Any) -> str:
+    """Hash a JSON serializable configuration, independently of the order of its keys."""
+    serialized_config = json.dumps(config, sort_keys=True, default=str)
+
+    return hashlib.sha256(serialized_config.encode()).hexdigest()[:16]
+
+
+class TrialCache:
+    """SQLite cache of the fold results of the hyperparameter search.
+
+    Results are keyed by the search context, e.g. the data task id and the hash of the model config, the trial
+    hyperparameters and the fold. Every result is committed as soon as it is computed, so a search killed partway
+    loses at most its running folds, and identical configurations are never evaluated twice on the same context.
+    """
+
+    def __init__(self, db_path: Path, context_key: str):
+        self.db_path = Path(db_path)
+        self.context_key = context_key
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fold_results (
+                    context_key TEXT NOT NULL,
+                    params_key TEXT NOT NULL,
+                    fold INTEGER NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (context_key, params_key, fold)
+                )
+                """
+            )
+
+    def get(self, params: dict[str, Any], fold: int) -> dict[str, float] | None:
+        """Get the cached result of a configuration on a fold, if any."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT result FROM fold_results WHERE context_key = ? AND params_key = ? AND fold = ?",
+                (self.context_key, hash_config(params), fold),
+            ).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, params: dict[str, Any], fold: int, result: dict[str, float]):
+        """Persist the result of a configuration on a fold."""
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO fold_results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.context_key,
+                    hash_config(params),
+                    fold,
+                    json.dumps(params, sort_keys=True, default=str),
+                    json.dumps(result),
+                    time.time(),
+                ),
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
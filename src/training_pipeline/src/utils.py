@@ -1,15 +1,13 @@
 import joblib
-from clearml import Task
 from src.utils.logger import get_logger
+from src.utils.task_utils import get_task_artifacts
 
 logger = get_logger("logs", __name__)
 
 
 def get_model(model_task_id: str):
     if model_task_id:
-        model_task = Task.get_task(task_id=model_task_id)
-        logger.info(f"Input task id={model_task_id} artifacts {list(model_task.artifacts.keys())}".format())  # noqa
-        model_ckpt = model_task.artifacts["model"].get()
+        model_ckpt = get_task_artifacts(task_id=model_task_id)["model"].get()
         loaded_model = joblib.load(model_ckpt)
         return loaded_model
     else:
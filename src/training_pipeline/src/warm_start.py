@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from src.training_pipeline.src.direct import DirectHorizonForecaster
+from src.training_pipeline.src.search_engine import ESTIMATOR_PARAM, DesignMatrixCapture
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+RETRAIN_MODES = ("full", "warm_start")
+# Share of the trees of the fitted booster added on the new data.
+WARM_START_TREES_RATIO = 0.1
+
+
+def supports_warm_start(forecaster) -> bool:
+    """Check whether the regressor of a fitted forecasting pipeline can continue its boosting on new data."""
+    return hasattr(forecaster.forecaster_.estimator_, "continue_fit")
+
+
+def lookback(forecaster) -> int:
+    """Compute the number of past values of a series needed to compute the window features of its next value."""
+    reducer = forecaster.forecaster_
+    if isinstance(reducer, DirectHorizonForecaster):
+        return reducer.lookback()
+
+    spans = [1]
+    for transformer in reducer.transformers or []:
+        for feature, windows in transformer.lag_feature.items():
+            if feature == "lag":
+                spans.extend(windows)
+            else:
+                spans.extend(lag + window_length - 1 for lag, window_length in windows)
+
+    return max(spans)
+
+
+def update_forecaster(
+    forecaster,
+    y_train: pd.DataFrame,
+    X_train: pd.DataFrame,
+    y_new: pd.DataFrame,
+    X_new: pd.DataFrame,
+    fh: int,
+    num_boost_round: int | None = None,
+):
+    """Update a fitted forecasting pipeline with new data by continuing the boosting of its LightGBM booster.
+
+    Instead of refitting the pipeline on the concatenation of all the data, the window features are only computed for
+    the new values, from the last `lookback` values of every series, and trees fitted on the residuals of the booster
+    on these new values are added to it. The pipeline is then updated to forecast from the end of the new data.
+
+    Args:
+        forecaster: The forecasting pipeline, fitted on the training data, with a regressor supporting `continue_fit`.
+        y_train: The training data of the forecaster.
+        X_train: The exogenous variables of the training data.
+        y_new: The new data, following the training data.
+        X_new: The exogenous variables of the new data.
+        fh: Forecasting horizon.
+        num_boost_round: Number of trees to add. Defaults to 10% of the trees of the regressor.
+
+    Returns:
+        The updated forecaster.
+    """
+    t1 = time.perf_counter()
+    estimator = forecaster.forecaster_.estimator_
+    if not supports_warm_start(forecaster):
+        raise ValueError(f"The regressor {type(estimator).__name__} does not support warm start.")
+
+    # Only the tail of the training data is needed to compute the features of the new values.
+    history = lookback(forecaster)
+    series_levels = list(range(y_train.index.nlevels - 1))
+    y_tail = pd.concat([y_train.groupby(level=series_levels, sort=False).tail(history), y_new]).sort_index()
+    X_tail = pd.concat([X_train.groupby(level=series_levels, sort=False).tail(history), X_new]).sort_index()
+
+    capture_forecaster = clone(forecaster).set_params(**{ESTIMATOR_PARAM: DesignMatrixCapture()})
+    capture_forecaster.fit(y_tail, X=X_tail, fh=np.arange(fh) + 1)
+    capture = capture_forecaster.forecaster_.estimator_
+    is_new = np.asarray(capture.X_.index.get_level_values(-1) > y_train.index.get_level_values(-1).max())
+
+    if num_boost_round is None:
+        num_boost_round = max(1, int(estimator.n_estimators * WARM_START_TREES_RATIO))
+    estimator.continue_fit(capture.X_[is_new], np.asarray(capture.y_)[is_new], num_boost_round=num_boost_round)
+    forecaster.update(y_new, X=X_new, update_params=False)
+    logger.info(
+        "Warm started the forecaster with %d trees on %d new rows in %.2f seconds.",
+        num_boost_round,
+        is_new.sum(),
+        time.perf_counter() - t1,
+    )
+
+    return forecaster
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+from clearml import Task, TaskTypes
+
+CURRENT_DIR = Path(__file__).parent.parent.parent.parent
+sys.path.append(str(CURRENT_DIR))
+
+from configs.configs import PROJECT_NAME
+from src.training_pipeline.src import backtest
+from src.utils import profiling
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+
+if __name__ == "__main__":
+    task = Task.init(
+        project_name=PROJECT_NAME,
+        task_name="Backtesting",
+        task_type=TaskTypes.testing,
+        tags="training-pipeline",
+    )
+
+    args = {
+        # "data_task_id": "OVERWRITE_ME",
+        # "hpo_task_id": "OVERWRITE_ME",
+        "forecasting_horizon": 24,
+        "num_origins": 10,
+        "origin_step": 24,
+        "n_jobs": -1,
+        "estimator_jobs": 4,
+        "data_task_id": "8568e970ffd440ad9070de0f314f37b7",
+        "hpo_task_id": "a07d1f54a8654f37be8bff1847767e83",
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
+    }
+    task.connect(args)
+    print(f"Arguments: {args}")
+
+    # task.execute_remotely()
+
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Starting backtesting task...")
+        with profiling.stage("backtest") as stage:
+            backtest.run(
+                task,
+                data_task_id=args["data_task_id"],
+                hpo_task_id=args["hpo_task_id"],
+                fh=args["forecasting_horizon"],
+                num_origins=int(args["num_origins"]),
+                step=int(args["origin_step"]),
+                n_jobs=int(args["n_jobs"]),
+                estimator_jobs=int(args["estimator_jobs"]),
+            )
+        logger.info("Successfully ran backtesting task in %.2f seconds.", stage.wall_seconds)
+
+    logger.info("=" * 80)
+    print("Done!")
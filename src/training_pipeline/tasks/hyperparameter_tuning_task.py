@@ -1,6 +1,5 @@
 import ast
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
@@ -10,6 +9,7 @@ sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
 from src.training_pipeline.src import hyperparameter_tuning as hpo
+from src.utils import profiling
 from src.utils.logger import get_logger
 
 logger = get_logger("logs", __name__)
@@ -33,42 +33,67 @@ if __name__ == "__main__":
         "lag_feature_mean": [[1, 24], [1, 48], [1, 72]],
         "lag_feature_std": [[1, 24], [1, 48], [1, 72]],
         "datetime_features": ["day_of_week", "hour_of_day"],
+        "strategy": "recursive",
+        "origin_stride": 0,
+        "n_trials": 0,
+        "n_jobs": -1,
+        "estimator_jobs": 4,
+        "pruning": True,
+        "resume": True,
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     # task.execute_remotely()
 
-    logger.info("Starting hyperparameter tuning task...")
-    t1 = time.time()
-    lag: list[int] = list(range(args["lag_feature_lag_min"], args["lag_feature_lag_max"] + 1))
-    mean: list[list[int]] = (
-        ast.literal_eval(args["lag_feature_mean"])
-        if isinstance(args["lag_feature_mean"], str)
-        else args["lag_feature_mean"]
-    )
-    std: list[list[int]] = (
-        ast.literal_eval(args["lag_feature_std"])
-        if isinstance(args["lag_feature_std"], str)
-        else args["lag_feature_std"]
-    )
-    dt_features: list[str] = (
-        ast.literal_eval(args["datetime_features"])
-        if isinstance(args["datetime_features"], str)
-        else args["datetime_features"]
-    )
-    model_cfg = {
-        "forecaster_transformers__window_summarizer__lag_feature__lag": lag,
-        "forecaster_transformers__window_summarizer__lag_feature__mean": mean,
-        "forecaster_transformers__window_summarizer__lag_feature__std": std,
-        "daily_season__manual_selection": dt_features,
-    }
-    # Save model config to artifacts
-    task.upload_artifact("model_cfg", model_cfg)
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Starting hyperparameter tuning task...")
+        lag: list[int] = list(range(args["lag_feature_lag_min"], args["lag_feature_lag_max"] + 1))
+        mean: list[list[int]] = (
+            ast.literal_eval(args["lag_feature_mean"])
+            if isinstance(args["lag_feature_mean"], str)
+            else args["lag_feature_mean"]
+        )
+        std: list[list[int]] = (
+            ast.literal_eval(args["lag_feature_std"])
+            if isinstance(args["lag_feature_std"], str)
+            else args["lag_feature_std"]
+        )
+        dt_features: list[str] = (
+            ast.literal_eval(args["datetime_features"])
+            if isinstance(args["datetime_features"], str)
+            else args["datetime_features"]
+        )
+        model_cfg = {
+            "forecaster_transformers__window_summarizer__lag_feature__lag": lag,
+            "forecaster_transformers__window_summarizer__lag_feature__mean": mean,
+            "forecaster_transformers__window_summarizer__lag_feature__std": std,
+            "daily_season__manual_selection": dt_features,
+            "strategy": args["strategy"],
+            # 0 uses one training origin per horizon length.
+            "origin_stride": int(args["origin_stride"]) or None,
+        }
+        # Save model config to artifacts
+        task.upload_artifact("model_cfg", model_cfg)
 
-    # Hyperparameter optimization
-    hpo.run(task, task_id=args["artifacts_task_id"], model_cfg=model_cfg, fh=args["forecasting_horizon"], k=args["k"])
-    logger.info("Successfully ran hyperparameter tuning task in %.2f seconds.", time.time() - t1)
+        # Hyperparameter optimization
+        with profiling.stage("hpo") as stage:
+            hpo.run(
+                task,
+                task_id=args["artifacts_task_id"],
+                model_cfg=model_cfg,
+                fh=args["forecasting_horizon"],
+                k=args["k"],
+                # 0 searches the whole grid.
+                n_trials=int(args["n_trials"]) or None,
+                n_jobs=int(args["n_jobs"]),
+                estimator_jobs=int(args["estimator_jobs"]),
+                pruning=args["pruning"],
+                resume=args["resume"],
+            )
+        logger.info("Successfully ran hyperparameter tuning task in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
@@ -1,5 +1,4 @@
 import sys
-import time
 from pathlib import Path
 
 from clearml import Task, TaskTypes
@@ -9,6 +8,7 @@ sys.path.append(str(CURRENT_DIR))
 
 from configs.configs import PROJECT_NAME
 from src.training_pipeline.src import train
+from src.utils import profiling
 from src.utils.logger import get_logger
 
 logger = get_logger("logs", __name__)
@@ -26,22 +26,35 @@ if __name__ == "__main__":
         # "data_task_id": "OVERWRITE_ME",
         # "hpo_task_id": "OVERWRITE_ME",
         "forecasting_horizon": 24,
+        "render_mode": "images",
+        # "full" or "warm_start", faster but less accurate.
+        "retrain_mode": "full",
         "data_task_id": "8568e970ffd440ad9070de0f314f37b7",
         "hpo_task_id": "a07d1f54a8654f37be8bff1847767e83",
+        # "" for no profiler, "cprofile" or "sampling".
+        "profiler": "",
     }
     task.connect(args)
     print(f"Arguments: {args}")
 
     # task.execute_remotely()
 
-    logger.info("Starting training task...")
-    t1 = time.time()
-    # Train model.
-    data_task_id = args["data_task_id"]
-    hpo_task_id = args["hpo_task_id"]
-    fh = args["forecasting_horizon"]
-    train.run_from_best_config(task, data_task_id=data_task_id, hpo_task_id=hpo_task_id, fh=fh)
-    logger.info("Successfully ran training task in %.2f seconds.", time.time() - t1)
+    with profiling.RunProfiler(task, profiler=args["profiler"] or None):
+        logger.info("Starting training task...")
+        with profiling.stage("train") as stage:
+            # Train model.
+            data_task_id = args["data_task_id"]
+            hpo_task_id = args["hpo_task_id"]
+            fh = args["forecasting_horizon"]
+            train.run_from_best_config(
+                task,
+                data_task_id=data_task_id,
+                hpo_task_id=hpo_task_id,
+                fh=fh,
+                render_mode=args["render_mode"],
+                retrain_mode=args["retrain_mode"],
+            )
+        logger.info("Successfully ran training task in %.2f seconds.", stage.wall_seconds)
 
     logger.info("=" * 80)
     print("Done!")
@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+
+def touch(file_path: Path):
+    """Mark a cache entry as recently used by bumping its modification time."""
+    os.utime(file_path)
+
+
+def evict_lru(cache_dir: Path, max_size_bytes: int, pattern: str = "*") -> list[Path]:
+    """Delete the least recently used entries of a cache directory until it fits in the given size.
+
+    Entries are ordered by modification time, thus readers have to `touch` the entries they serve.
+
+    Args:
+        cache_dir (Path): The cache directory.
+        max_size_bytes (int): The maximum total size of the entries matching `pattern`.
+        pattern (str, optional): Glob pattern of the entries managed by the cache. Defaults to "*".
+
+    Returns: The evicted entries.
+    """
+    entries = [(file_path, file_path.stat()) for file_path in cache_dir.glob(pattern) if file_path.is_file()]
+    entries.sort(key=lambda entry: entry[1].st_mtime)
+
+    total_size = sum(stat.st_size for _, stat in entries)
+    evicted = []
+    for file_path, stat in entries:
+        if total_size <= max_size_bytes:
+            break
+
+        file_path.unlink(missing_ok=True)
+        total_size -= stat.st_size
+        evicted.append(file_path)
+
+    if len(evicted) > 0:
+        logger.info("Evicted %d entries from %s.", len(evicted), cache_dir)
+
+    return evicted
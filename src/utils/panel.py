@@ -0,0 +1,105 @@
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from root import PANEL_CACHE_DIR
+from src.utils import cache_utils, schema, storage
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+INDEX_COLUMNS = ["area", "consumer_type", "datetime_utc"]
+FREQ = "H"
+# Panels are as large as the full history, so only a few of them are kept in memory.
+PANEL_MEMORY_CACHE_SIZE = 2
+PANEL_CACHE_MAX_SIZE_BYTES = 5 * 1024**3
+
+_panels: OrderedDict[str, pd.DataFrame] = OrderedDict()
+
+
+def build_panel(
+    data: pd.DataFrame, cache_key: str | None = None, float32: bool = False, cache_dir: Path = PANEL_CACHE_DIR
+) -> pd.DataFrame:
+    """Build the sktime panel of the data, indexed by (area, consumer_type, datetime_utc) with hourly periods.
+
+    The index is built directly from the codes of the three keys and the rows are sorted with a single sort, which is
+    skipped when the data is already sorted. The data is not modified.
+
+    Args:
+        data: The data, with the index keys as columns.
+        cache_key: Identifier of the data, e.g. the id of the task that produced it. If given, the panel is cached in
+            memory and on disk under this key, so the next builds of the same data are served from the cache.
+        float32: Cast the float columns to float32.
+        cache_dir: Directory of the disk cache.
+
+    Returns:
+        pd.DataFrame: The panel, with the compact dtypes of `schema.compact_frame`.
+    """
+    if cache_key is None:
+        return _build_panel(data, float32=float32)
+
+    key = f"{cache_key}-{'float32' if float32 else 'float64'}"
+    if key in _panels:
+        logger.info("Panel %s served from the memory cache.", key)
+        _panels.move_to_end(key)
+        return _panels[key].copy(deep=False)
+
+    cache_file = cache_dir / storage.file_name(key)
+    if cache_file.exists():
+        logger.info("Panel %s served from the disk cache.", key)
+        cache_utils.touch(cache_file)
+        panel = storage.load_frame(cache_file)
+    else:
+        panel = _build_panel(data, float32=float32)
+
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        storage.save_frame(panel, tmp_file, file_format=storage.DEFAULT_FORMAT)
+        os.replace(tmp_file, cache_file)
+        cache_utils.evict_lru(cache_dir, PANEL_CACHE_MAX_SIZE_BYTES, pattern=storage.file_name("*"))
+
+    _panels[key] = panel
+    if len(_panels) > PANEL_MEMORY_CACHE_SIZE:
+        _panels.popitem(last=False)
+
+    return panel.copy(deep=False)
+
+
+def _build_panel(data: pd.DataFrame, float32: bool = False) -> pd.DataFrame:
+    """Build the panel without any caching."""
+    keys = schema.compact_frame(data[INDEX_COLUMNS])
+    area_codes, areas = pd.factorize(keys["area"], sort=True)
+    consumer_type_codes, consumer_types = pd.factorize(keys["consumer_type"], sort=True)
+    # The ordinals of hourly periods are the hours since the epoch.
+    ordinals = keys["datetime_utc"].to_numpy(dtype="datetime64[h]").astype(np.int64)
+    datetime_codes, unique_ordinals = pd.factorize(ordinals, sort=True)
+
+    # A single integer key orders the rows as the MultiIndex does, so one stable sort of it is a lexicographic sort of
+    # the three keys.
+    num_consumer_types, num_datetimes = len(consumer_types), len(unique_ordinals)
+    sort_key = (area_codes.astype(np.int64) * num_consumer_types + consumer_type_codes) * num_datetimes + datetime_codes
+    values = data.drop(columns=INDEX_COLUMNS)
+    if np.all(sort_key[1:] >= sort_key[:-1]):
+        order = None
+    else:
+        order = np.argsort(sort_key, kind="stable")
+        values = values.take(order)
+        area_codes = area_codes[order]
+        consumer_type_codes = consumer_type_codes[order]
+        datetime_codes = datetime_codes[order]
+
+    index = pd.MultiIndex(
+        levels=[
+            pd.Index(areas, name="area"),
+            pd.Index(consumer_types, name="consumer_type"),
+            pd.PeriodIndex(pd.arrays.PeriodArray(unique_ordinals, dtype=pd.PeriodDtype(FREQ)), name="datetime_utc"),
+        ],
+        codes=[area_codes, consumer_type_codes, datetime_codes],
+        names=INDEX_COLUMNS,
+        verify_integrity=False,
+    )
+    panel = schema.compact_frame(values.set_axis(index, axis=0), float32=float32)
+    logger.info("Built a panel of %d rows, %s.", len(panel), "already sorted" if order is None else "sorted")
+
+    return panel
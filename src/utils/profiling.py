@@ -0,0 +1,356 @@
+import cProfile
+import functools
+import json
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import pandas as pd
+from root import PROFILE_DIR
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+PROFILERS = ("cprofile", "sampling")
+# Number of functions of the cProfile statistics reported to ClearML.
+CPROFILE_TOP_FUNCTIONS = 30
+
+# The profiler of the current run and the stack of the stages being run.
+_active_profiler: "RunProfiler | None" = None
+_open_stages: list["StageRecord"] = []
+
+
+@dataclass
+class StageRecord:
+    """Resources used by a stage of a run.
+
+    Attributes:
+        name: Name of the stage, prefixed by the names of its enclosing stages, e.g. "train/baseline".
+        wall_seconds: Elapsed time.
+        cpu_seconds: CPU time of all the threads of the process. The CPU time of worker processes is not included.
+        peak_rss_mb: Peak resident memory of the process during the stage.
+        num_rows: Number of rows processed by the stage, if it processes a frame.
+    """
+
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    num_rows: int | None = None
+
+    @property
+    def rows_per_second(self) -> float | None:
+        if self.num_rows is None or self.wall_seconds <= 0:
+            return None
+
+        return self.num_rows / self.wall_seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "rows_per_second": self.rows_per_second}
+
+
+class RunProfiler:
+    """Profile the stages of a run, e.g. a ClearML task, and report them when the run ends.
+
+    The stages are the `stage` blocks run while the profiler is active, including the ones of the library code. When
+    the run ends, the resources of every stage are logged, reported as ClearML scalars, so the runs of a task can be
+    compared over time, and written in a JSON profile, also uploaded as an artifact of the task.
+
+    Example:
+        with RunProfiler(task, name="transform"):
+            with profiling.stage("transform") as transform_stage:
+                data = transform.transform(data)
+                transform_stage.num_rows = len(data)
+
+    Args:
+        task: The ClearML task of the run. If None, the profile is only logged and written on disk.
+        name: Name of the run, used in the name of the JSON profile. Defaults to the name of the task.
+        profiler: Optional profiler of the whole run: "cprofile" for the deterministic profiler of the standard library,
+            "sampling" for a sampling profiler of the main thread writing its stacks in the folded format of flame
+            graphs, with a lower overhead.
+        output_dir: Directory of the profiles.
+        sampling_interval: Number of seconds between two samples of the sampling profiler.
+    """
+
+    def __init__(
+        self,
+        task=None,
+        name: str | None = None,
+        profiler: str | None = None,
+        output_dir: Path = PROFILE_DIR,
+        sampling_interval: float = 0.005,
+    ):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler}. Supported profilers: {PROFILERS}.")
+
+        self.task = task
+        self.name = name if name is not None else (task.name if task is not None else "run")
+        self.profiler = profiler
+        self.output_dir = Path(output_dir)
+        self.sampling_interval = sampling_interval
+        self.records: list[StageRecord] = []
+        self.total = StageRecord(name=self.name)
+
+    def __enter__(self) -> "RunProfiler":
+        global _active_profiler
+        if _active_profiler is not None:
+            raise RuntimeError(f"The run {_active_profiler.name} is already profiled.")
+        _active_profiler = self
+
+        self.started_at = datetime.now(timezone.utc)
+        self._cprofile, self._sampler = None, None
+        if self.profiler == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif self.profiler == "sampling":
+            self._sampler = _StackSampler(self.sampling_interval)
+            self._sampler.start()
+
+        _reset_peak_rss()
+        self._wall_start, self._cpu_start = time.perf_counter(), time.process_time()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_profiler
+        self.total.wall_seconds = time.perf_counter() - self._wall_start
+        self.total.cpu_seconds = time.process_time() - self._cpu_start
+        _fold_peak_rss()
+        _active_profiler = None
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        # A failed run is also profiled, to find the stage it failed in.
+        self.report(failed=exc_type is not None)
+
+        return False
+
+    def report(self, failed: bool = False) -> Path:
+        """Log the profile, report it to ClearML and write it on disk.
+
+        Returns:
+            Path: The JSON profile.
+        """
+        for record in [*self.records, self.total]:
+            logger.info(
+                "Stage %s: %.2f seconds, %.2f CPU seconds, %.0f MB peak RSS%s.",
+                record.name,
+                record.wall_seconds,
+                record.cpu_seconds,
+                record.peak_rss_mb,
+                (
+                    f", {record.num_rows} rows at {record.rows_per_second:.0f} rows/s"
+                    if record.num_rows is not None
+                    else ""
+                ),
+            )
+
+        profile = {
+            "name": self.name,
+            "task_id": self.task.id if self.task is not None else None,
+            "started_at": self.started_at.isoformat(),
+            "failed": failed,
+            "profiler": self.profiler,
+            "total": self.total.to_dict(),
+            "stages": [record.to_dict() for record in self.records],
+        }
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        file_stem = f"{self.name.lower().replace(' ', '_')}-{self.started_at:%Y%m%dT%H%M%S.%f}"
+        profile_file = self.output_dir / f"{file_stem}.json"
+        profile_file.write_text(json.dumps(profile, indent=2))
+
+        profiler_file = None
+        if self._cprofile is not None:
+            profiler_file = self.output_dir / f"{file_stem}.prof"
+            self._cprofile.dump_stats(profiler_file)
+        elif self._sampler is not None:
+            profiler_file = self.output_dir / f"{file_stem}.folded"
+            self._sampler.dump(profiler_file)
+        logger.info("Wrote the profile of the run in %s.", profile_file)
+
+        if self.task is not None:
+            self._report_to_clearml(profile, profiler_file)
+
+        return profile_file
+
+    def _report_to_clearml(self, profile: dict[str, Any], profiler_file: Path | None):
+        task_logger = self.task.get_logger()
+        for record in [*self.records, self.total]:
+            task_logger.report_scalar("Stage wall time", record.name, record.wall_seconds, iteration=0)
+            task_logger.report_scalar("Stage CPU time", record.name, record.cpu_seconds, iteration=0)
+            task_logger.report_scalar("Stage peak RSS MB", record.name, record.peak_rss_mb, iteration=0)
+            if record.rows_per_second is not None:
+                task_logger.report_scalar("Stage rows per second", record.name, record.rows_per_second, iteration=0)
+        task_logger.report_table(
+            title="Profile",
+            series="Stages",
+            iteration=0,
+            table_plot=pd.DataFrame(profile["stages"] + [profile["total"]]),
+        )
+        self.task.upload_artifact("profile", profile)
+
+        if profiler_file is not None:
+            self.task.upload_artifact(f"profile_{self.profiler}", profiler_file)
+        if self._cprofile is not None:
+            task_logger.report_table(
+                title="Profile",
+                series="cProfile",
+                iteration=0,
+                table_plot=_cprofile_table(self._cprofile, CPROFILE_TOP_FUNCTIONS),
+            )
+
+
+@contextmanager
+def stage(name: str, num_rows: int | None = None) -> Iterator[StageRecord]:
+    """Measure the resources used by a block, recorded in the active `RunProfiler`, if any.
+
+    Stages can be nested, their names being prefixed by the names of their enclosing stages. Without an active
+    profiler, the stage is still measured, so the callers can log its duration.
+
+    Args:
+        name: Name of the stage.
+        num_rows: Number of rows processed by the stage. It can also be set on the yielded record, once known.
+
+    Yields:
+        StageRecord: The record of the stage, filled when the block exits.
+    """
+    record = StageRecord(name="/".join([*(open_stage.name for open_stage in _open_stages), name]), num_rows=num_rows)
+    if _active_profiler is not None:
+        _active_profiler.records.append(record)
+
+    # The peak memory of the enclosing stages is saved before the peak is reset for this stage.
+    _fold_peak_rss()
+    _reset_peak_rss()
+    _open_stages.append(record)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record.wall_seconds = time.perf_counter() - wall_start
+        record.cpu_seconds = time.process_time() - cpu_start
+        _fold_peak_rss()
+        _open_stages.pop()
+
+
+def profiled(name: str | None = None, num_rows: Callable[[Any], int] | None = None) -> Callable:
+    """Decorate a function to run it as a stage.
+
+    Args:
+        name: Name of the stage. Defaults to the name of the function.
+        num_rows: Function computing the number of processed rows from the result, e.g. `len`.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name if name is not None else function.__name__) as record:
+                result = function(*args, **kwargs)
+                if num_rows is not None:
+                    record.num_rows = num_rows(result)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident memory of the process since the last reset."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # Without procfs, the peak of the whole process, in bytes on macOS and in kilobytes elsewhere.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def _reset_peak_rss():
+    """Reset the peak resident memory of the process to its current resident memory, on Linux only."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def _fold_peak_rss():
+    """Update the peak memory of the open stages and of the run with the peak since the last reset."""
+    peak_rss_mb = _peak_rss_bytes() / 1024**2
+    records = [*_open_stages, _active_profiler.total] if _active_profiler is not None else _open_stages
+    for record in records:
+        record.peak_rss_mb = max(record.peak_rss_mb, peak_rss_mb)
+
+
+def _cprofile_table(profile: cProfile.Profile, num_functions: int) -> pd.DataFrame:
+    """Build the table of the functions with the highest cumulative time."""
+    stats = pstats.Stats(profile)
+    rows = [
+        {
+            "function": f"{file_name}:{line_number}({function_name})",
+            "calls": primitive_calls,
+            "total_seconds": total_time,
+            "cumulative_seconds": cumulative_time,
+        }
+        for (file_name, line_number, function_name), (
+            primitive_calls,
+            _,
+            total_time,
+            cumulative_time,
+            _,
+        ) in stats.stats.items()
+    ]
+
+    return pd.DataFrame(rows).sort_values("cumulative_seconds", ascending=False).head(num_functions)
+
+
+class _StackSampler:
+    """Sample the stack of the main thread from a background thread, counting the stacks in the folded format."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._main_thread_id = threading.main_thread().ident
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def dump(self, file_path: Path):
+        """Write the stacks as `frame;frame;frame count` lines, the input of flame graph tools like speedscope."""
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        file_path.write_text("\n".join(lines) + "\n")
+        logger.info("Sampled %d stacks of the main thread.", sum(self.stacks.values()))
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self._main_thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if len(frames) > 0:
+                self.stacks[";".join(reversed(frames))] += 1
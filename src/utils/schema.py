@@ -0,0 +1,68 @@
+import pandas as pd
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+AREA_MAPPINGS = {
+    "DK": 0,
+    "DK1": 1,
+    "DK2": 2,
+    "DE": 3,
+    "SE1": 4,
+    "SE2": 5,
+    "SE3": 6,
+    "SE4": 7,
+    "NO1": 8,
+    "NO2": 9,
+    "NO3": 10,
+    "NO4": 11,
+    "NO5": 12,
+}
+AREA_VALUES = list(AREA_MAPPINGS.values())
+# Area strings are stored as categories, so every row costs a 1 byte code instead of a Python string.
+AREA_CATEGORIES = pd.CategoricalDtype(categories=list(AREA_MAPPINGS.keys()))
+CONSUMER_TYPE_VALUES = [111, 112, 119, 121, 122, 123, 130, 211, 212, 215, 220, 310, 320, 330, 340, 350, 360, 370, 381,
+                        382, 390, 410, 421, 422, 431, 432, 433, 441, 442, 443, 444, 445, 446, 447, 450, 461, 462, 999]  # fmt: skip
+
+# Compact dtypes of the transformed data. The consumer type codes go up to 999, thus int16.
+DTYPES = {
+    "area": "int8",
+    "consumer_type": "int16",
+    "energy_consumption": "float64",
+}
+
+
+def compact_frame(df: pd.DataFrame, float32: bool = False) -> pd.DataFrame:
+    """Cast the columns of a frame to their compact dtypes.
+
+    Args:
+        df: The frame to cast. It is not modified.
+        float32: Also cast all the float64 columns, e.g. the consumption and the float features, to float32.
+
+    Returns:
+        pd.DataFrame: The cast frame.
+    """
+    dtypes = {column: dtype for column, dtype in DTYPES.items() if column in df.columns}
+    if float32:
+        dtypes.update({column: "float32" for column, dtype in df.dtypes.items() if dtype == "float64"})
+
+    return df.astype(dtypes)
+
+
+def memory_report(df: pd.DataFrame, stage: str) -> dict[str, float]:
+    """Log the memory footprint of a frame at a given stage of a pipeline.
+
+    Args:
+        df: The frame to report.
+        stage: Name of the stage, used in the log.
+
+    Returns:
+        dict[str, float]: The footprint in MB of the index and of every column, plus the total.
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    report = {str(name): round(num_bytes / 1024**2, 3) for name, num_bytes in usage.items()}
+    report["total"] = round(usage.sum() / 1024**2, 3)
+
+    logger.info("Memory footprint at stage '%s': %.1f MB for %d rows (%s).", stage, report["total"], len(df), report)
+
+    return report
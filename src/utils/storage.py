@@ -0,0 +1,129 @@
+import re
+from collections.abc import Callable
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+DEFAULT_FORMAT = "parquet"
+DEFAULT_COMPRESSION = "zstd"
+# Extension passed to `Task.upload_artifact` so that ClearML stores frames as parquet instead of gzipped CSV.
+FRAME_ARTIFACT_EXTENSION = ".parquet"
+# Label of the index levels written as columns of the CSV files, holding the name of the level.
+CSV_INDEX_PATTERN = re.compile(r"__index_level_\d+__(.*)")
+
+
+def _write_parquet(df: pd.DataFrame, path: Path, compression: str | None):
+    df.to_parquet(path, compression=compression)
+
+
+def _read_parquet(path: Path) -> pd.DataFrame:
+    return pd.read_parquet(path)
+
+
+def _write_feather(df: pd.DataFrame, path: Path, compression: str | None):
+    # Go through an Arrow table to keep the pandas metadata, thus the index, which `DataFrame.to_feather` drops.
+    feather.write_feather(pa.Table.from_pandas(df), path, compression=compression or "uncompressed")
+
+
+def _read_feather(path: Path) -> pd.DataFrame:
+    return feather.read_table(path).to_pandas()
+
+
+def _write_csv(df: pd.DataFrame, path: Path, compression: str | None):
+    # CSV has no metadata, so the index levels are written as columns labeled as by pyarrow, followed by their name.
+    index_labels = [
+        f"__index_level_{level}__{name if name is not None else ''}" for level, name in enumerate(df.index.names)
+    ]
+    df.to_csv(path, index_label=index_labels)
+
+
+def _read_csv(path: Path) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    index_columns = [column for column in df.columns if CSV_INDEX_PATTERN.fullmatch(column) is not None]
+    if len(index_columns) == 0:
+        return df
+
+    df = df.set_index(index_columns)
+    df.index.names = [CSV_INDEX_PATTERN.fullmatch(column).group(1) or None for column in index_columns]
+
+    return df
+
+
+# Format name -> (file suffix, writer, reader).
+FORMATS: dict[str, tuple[str, Callable, Callable]] = {
+    "parquet": (".parquet", _write_parquet, _read_parquet),
+    "feather": (".arrow", _write_feather, _read_feather),
+    "csv": (".csv", _write_csv, _read_csv),
+}
+
+
+def register_format(name: str, suffix: str, writer: Callable, reader: Callable):
+    """Register a storage format.
+
+    Args:
+        name (str): Name of the format.
+        suffix (str): File suffix of the format, used to infer the format of a path.
+        writer (Callable): Function with the `(df, path, compression)` signature.
+        reader (Callable): Function with the `(path)` signature returning the frame.
+    """
+    FORMATS[name] = (suffix, writer, reader)
+
+
+def file_name(stem: str, file_format: str = DEFAULT_FORMAT) -> str:
+    """Build the file name of a frame stored in the given format."""
+    return f"{stem}{FORMATS[file_format][0]}"
+
+
+def save_frame(
+    df: pd.DataFrame, path: Path, file_format: str | None = None, compression: str | None = DEFAULT_COMPRESSION
+) -> Path:
+    """Save a frame as a typed file, index included.
+
+    Columnar formats keep the dtypes, e.g. int8 codes, categories or PeriodIndex levels, so the frame does not have
+    to be re-parsed on load.
+
+    Args:
+        df (pd.DataFrame): The frame to save.
+        path (Path): Destination path.
+        file_format (str, optional): Name of the format. If None, it is inferred from the suffix of the path.
+        compression (str, optional): Compression codec. Defaults to "zstd".
+
+    Returns: The path of the written file.
+    """
+    path = Path(path)
+    if file_format is None:
+        file_format = infer_format(path)
+    _, writer, _ = FORMATS[file_format]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer(df, path, compression)
+
+    return path
+
+
+def load_frame(path: Path, file_format: str | None = None) -> pd.DataFrame:
+    """Load a frame saved by `save_frame`.
+
+    Args:
+        path (Path): Path to the file.
+        file_format (str, optional): Name of the format. If None, it is inferred from the suffix of the path.
+
+    Returns: The loaded frame.
+    """
+    path = Path(path)
+    if file_format is None:
+        file_format = infer_format(path)
+    _, _, reader = FORMATS[file_format]
+
+    return reader(path)
+
+
+def infer_format(path: Path) -> str:
+    """Infer the storage format from the suffix of a path."""
+    for name, (suffix, _, _) in FORMATS.items():
+        if Path(path).suffix == suffix:
+            return name
+
+    raise ValueError(f"Unknown storage format for {path}. Registered formats: {list(FORMATS.keys())}.")
@@ -1,18 +1,138 @@
+import hashlib
 import json
+import os
+import shutil
+import tempfile
 from pathlib import Path
+from typing import Any
 
 import joblib
+import numpy as np
+import pandas as pd
 from clearml import Task
+from root import ARTIFACT_CACHE_DIR
+from src.utils import cache_utils, storage
 from src.utils.logger import get_logger
 
 logger = get_logger("logs", __name__)
 
+ARTIFACT_CACHE_MAX_SIZE_BYTES = 10 * 1024**3
+artifact_cache_stats = {"hits": 0, "misses": 0}
 
-def get_task_artifacts(task_id: str) -> dict:
+
+def get_task_artifacts(task_id: str, use_cache: bool = True) -> dict:
+    """Get the artifacts of a task.
+
+    Args:
+        task_id (str): The id of the task.
+        use_cache (bool, optional): Wrap the artifacts so that `get()` is served from the local artifact cache.
+            Defaults to True.
+
+    Returns: The artifacts of the task, by name.
+    """
     task = Task.get_task(task_id=task_id)
     logger.info(f"Input task id={task_id} artifacts {list(task.artifacts.keys())}".format())
 
-    return task.artifacts
+    if not use_cache:
+        return task.artifacts
+
+    return {name: CachedArtifact(task_id, name, artifact) for name, artifact in task.artifacts.items()}
+
+
+def get_artifact_cache_stats() -> dict[str, int]:
+    """Get the number of hits and misses of the local artifact cache since the start of the process."""
+    return dict(artifact_cache_stats)
+
+
+class CachedArtifact:
+    """Proxy of a ClearML artifact whose `get()` is served from a local, disk-backed and size-bounded LRU cache.
+
+    Entries are keyed by task id, artifact name and artifact hash, so steps chained on the same agent do not download
+    and deserialize the same artifact again. Frames are cached as parquet files, arrays as `.npy` files read back
+    memory-mapped, files as copies and any other object with joblib. Arrays are read-only on hits and misses alike,
+    and files are served as private copies, so a later eviction of their cache entry does not delete them.
+    """
+
+    def __init__(self, task_id: str, name: str, artifact, cache_dir: Path = ARTIFACT_CACHE_DIR):
+        self.task_id = task_id
+        self.name = name
+        self.artifact = artifact
+        self.cache_dir = cache_dir
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.artifact, item)
+
+    @property
+    def cache_key(self) -> str:
+        artifact_hash = self.artifact.hash or self.artifact.url
+        return hashlib.sha256(f"{self.task_id}:{self.name}:{artifact_hash}".encode("utf-8")).hexdigest()[:32]
+
+    def get(self, **kwargs) -> Any:
+        """Get the artifact object, from the cache if possible. Keyword arguments bypass the cache."""
+        if len(kwargs) > 0:
+            return self.artifact.get(**kwargs)
+
+        cache_entries = [path for path in self.cache_dir.glob(f"{self.cache_key}.*") if path.suffix != ".tmp"]
+        if len(cache_entries) > 0:
+            cache_entry = cache_entries[0]
+            artifact_cache_stats["hits"] += 1
+            logger.info("Serving artifact %s of task %s from the cache: %s", self.name, self.task_id, cache_entry)
+            cache_utils.touch(cache_entry)
+
+            return _load_cache_entry(cache_entry)
+
+        artifact_cache_stats["misses"] += 1
+        artifact_object = self.artifact.get()
+        if isinstance(artifact_object, np.ndarray) and artifact_object.dtype != object:
+            # Served read-only like the memory-mapped arrays of the hits.
+            artifact_object.setflags(write=False)
+        try:
+            _save_cache_entry(artifact_object, self.cache_dir / self.cache_key)
+        except Exception as e:
+            logger.warning("Could not cache artifact %s of task %s: %s", self.name, self.task_id, e)
+        cache_utils.evict_lru(self.cache_dir, max_size_bytes=ARTIFACT_CACHE_MAX_SIZE_BYTES)
+
+        return artifact_object
+
+
+def _save_cache_entry(artifact_object: Any, path_without_suffix: Path):
+    """Write an artifact object to the cache, through a temporary file so readers never see a partial entry."""
+    if isinstance(artifact_object, pd.DataFrame):
+        suffix = storage.FORMATS[storage.DEFAULT_FORMAT][0]
+    elif isinstance(artifact_object, np.ndarray) and artifact_object.dtype != object:
+        suffix = ".npy"
+    elif isinstance(artifact_object, (str, os.PathLike)) and Path(artifact_object).is_file():
+        # Keep the original suffix last, so the consumers can still infer the type of the file.
+        suffix = f".file{Path(artifact_object).suffix}"
+    else:
+        suffix = ".joblib"
+
+    cache_entry = path_without_suffix.with_name(f"{path_without_suffix.name}{suffix}")
+    # The temporary file is per process, so concurrent misses of the same artifact do not write to the same file.
+    tmp_path = cache_entry.with_name(f"{cache_entry.name}.{os.getpid()}.tmp")
+    if suffix == ".npy":
+        with open(tmp_path, "wb") as f:
+            np.save(f, artifact_object, allow_pickle=False)
+    elif suffix == ".joblib":
+        joblib.dump(artifact_object, tmp_path)
+    elif suffix.startswith(".file"):
+        shutil.copyfile(artifact_object, tmp_path)
+    else:
+        storage.save_frame(artifact_object, tmp_path, file_format=storage.DEFAULT_FORMAT)
+    tmp_path.replace(cache_entry)
+
+
+def _load_cache_entry(cache_entry: Path) -> Any:
+    """Load an artifact object written by `_save_cache_entry`."""
+    if ".file" in cache_entry.suffixes:
+        file_name = cache_entry.name.replace(".file", "", 1)
+        return Path(shutil.copyfile(cache_entry, Path(tempfile.mkdtemp(prefix="artifact_")) / file_name))
+    if cache_entry.suffix == ".npy":
+        return np.load(cache_entry, mmap_mode="r")
+    if cache_entry.suffix == ".joblib":
+        return joblib.load(cache_entry)
+
+    return storage.load_frame(cache_entry)
 
 
 def save_json(data: dict, file_path: Path):
@@ -0,0 +1,209 @@
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import OrderedDict as OrderedDictType  # noqa
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from PIL import Image
+from root import OUTPUT_DIR, RENDER_CACHE_DIR
+from src.utils import cache_utils
+from src.utils.logger import get_logger
+
+logger = get_logger("logs", __name__)
+
+RENDER_MODES = ("images", "html")
+# Bump the version when the figures change, so the cached renders are not served anymore.
+RENDER_VERSION = "1"
+RENDER_CACHE_MAX_SIZE_BYTES = 1024**3
+# The interactive report holds the points of all the series, so it only shows the last four weeks of every split.
+HTML_TAIL_POINTS = 24 * 7 * 4
+SLICE_LEVELS = ["area", "consumer_type"]
+
+
+def render(
+    timeseries: OrderedDictType[str, pd.DataFrame],
+    task_logger,
+    prefix: str | None = None,
+    mode: str = "images",
+    n_jobs: int = -1,
+    delete_from_disk: bool = True,
+    cache_dir: Path = RENDER_CACHE_DIR,
+):
+    """Render the timeseries of every (area, consumer_type) and report them to ClearML.
+
+    Args:
+        timeseries: The timeseries to plot together, e.g. the train, test and predicted values, by name.
+        task_logger: The ClearML logger of the task.
+        prefix: Title of the report.
+        mode: "images" reports one PNG per series, uploaded from memory. The figures are rendered in a process pool
+            with the Agg backend, and the figures of unchanged series are served from a cache keyed by the hash of
+            their content. "html" reports a single interactive plotly figure, with a selector of the series.
+        n_jobs: Number of rendering processes, -1 for all the cores.
+        delete_from_disk: If False, the PNG images are also saved in the output directory.
+        cache_dir: Directory of the cached images.
+    """
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode {mode}. Supported modes: {RENDER_MODES}.")
+
+    grouped_timeseries = group_timeseries(timeseries)
+    title = prefix if prefix else "Figure"
+    if mode == "html":
+        figure = build_interactive_figure(grouped_timeseries, title=title)
+        task_logger.report_plotly(title=title, series="All series", figure=figure, iteration=0)
+        logger.info("Reported an interactive report of %d series.", len(grouped_timeseries))
+
+        return
+
+    images = render_images(grouped_timeseries, n_jobs=n_jobs, cache_dir=cache_dir)
+
+    output_dir = OUTPUT_DIR / prefix if prefix else OUTPUT_DIR
+    for group_name, png in images.items():
+        series_name = f"Area: {group_name[0]} - Consumer type: {group_name[1]}"
+        task_logger.report_image(title=title, series=series_name, iteration=0, image=Image.open(io.BytesIO(png)))
+
+        if not delete_from_disk:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            (output_dir / f"{group_name[0]}_{group_name[1]}.png").write_bytes(png)
+
+
+def group_timeseries(timeseries: OrderedDictType[str, pd.DataFrame]) -> OrderedDictType[tuple, dict[str, pd.Series]]:
+    """Group the timeseries by (area, consumer_type), keeping the last timeseries first as the plots always did."""
+    grouped_timeseries = OrderedDict()
+    for split, df in timeseries.items():
+        for group_name, split_group_values in df.groupby(level=SLICE_LEVELS, sort=False):
+            group_values = grouped_timeseries.get(group_name, {})
+
+            grouped_timeseries[group_name] = {
+                f"{split}": split_group_values["energy_consumption"].droplevel(SLICE_LEVELS),
+                **group_values,
+            }
+
+    return grouped_timeseries
+
+
+def render_images(
+    grouped_timeseries: OrderedDictType[tuple, dict[str, pd.Series]],
+    n_jobs: int = -1,
+    cache_dir: Path | None = RENDER_CACHE_DIR,
+) -> OrderedDictType[tuple, bytes]:
+    """Render the PNG image of every series in a process pool, skipping the series whose image is cached.
+
+    Returns:
+        OrderedDict[tuple, bytes]: The PNG image of every series.
+    """
+    images = OrderedDict()
+    cache_files, missing_groups = {}, []
+    for group_name, group_values in grouped_timeseries.items():
+        if cache_dir is None:
+            missing_groups.append(group_name)
+            continue
+
+        cache_files[group_name] = cache_dir / f"{_content_hash(group_name, group_values)}.png"
+        if cache_files[group_name].exists():
+            cache_utils.touch(cache_files[group_name])
+            images[group_name] = cache_files[group_name].read_bytes()
+        else:
+            missing_groups.append(group_name)
+
+    rendered_images = Parallel(n_jobs=min(_num_jobs(n_jobs), max(len(missing_groups), 1)))(
+        delayed(_render_image)(group_name, grouped_timeseries[group_name]) for group_name in missing_groups
+    )
+    logger.info("Rendered %d series and served %d unchanged series from the cache.", len(missing_groups), len(images))
+
+    for group_name, png in zip(missing_groups, rendered_images):
+        images[group_name] = png
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_files[group_name].with_name(f"{cache_files[group_name].name}.{os.getpid()}.tmp")
+            tmp_file.write_bytes(png)
+            os.replace(tmp_file, cache_files[group_name])
+    if cache_dir is not None and len(missing_groups) > 0:
+        cache_utils.evict_lru(cache_dir, RENDER_CACHE_MAX_SIZE_BYTES, pattern="*.png")
+
+    # Report the series in the order of the data.
+    return OrderedDict((group_name, images[group_name]) for group_name in grouped_timeseries)
+
+
+def build_interactive_figure(
+    grouped_timeseries: OrderedDictType[tuple, dict[str, pd.Series]], title: str, tail: int = HTML_TAIL_POINTS
+) -> dict:
+    """Build a plotly figure of all the series, with a dropdown menu selecting the series to show.
+
+    The figure is built as a plain plotly JSON dict, so it does not require plotly.
+    """
+    traces, buttons = [], []
+    num_traces = sum(len(group_values) for group_values in grouped_timeseries.values())
+    for group_index, (group_name, group_values) in enumerate(grouped_timeseries.items()):
+        first_trace = len(traces)
+        for split, values in group_values.items():
+            values = values.iloc[-tail:]
+            index = values.index.to_timestamp() if isinstance(values.index, pd.PeriodIndex) else values.index
+            traces.append(
+                {
+                    "type": "scatter",
+                    "mode": "lines",
+                    "name": split,
+                    "x": [timestamp.isoformat() for timestamp in index],
+                    "y": values.to_numpy(dtype=np.float64).tolist(),
+                    "visible": group_index == 0,
+                }
+            )
+
+        visible = [first_trace <= trace < len(traces) for trace in range(num_traces)]
+        series_title = f"{title} - Area: {group_name[0]} - Consumer type: {group_name[1]}"
+        buttons.append(
+            {
+                "label": f"Area {group_name[0]} - Consumer type {group_name[1]}",
+                "method": "update",
+                "args": [{"visible": visible}, {"title": series_title}],
+            }
+        )
+
+    first_title = buttons[0]["args"][1]["title"] if buttons else title
+
+    return {
+        "data": traces,
+        "layout": {
+            "title": first_title,
+            "xaxis": {"title": "datetime_utc"},
+            "yaxis": {"title": "energy_consumption"},
+            "updatemenus": [{"buttons": buttons, "direction": "down", "x": 0, "xanchor": "left", "y": 1.15}],
+        },
+    }
+
+
+def _render_image(group_name: tuple, group_values: dict[str, pd.Series]) -> bytes:
+    """Render the figure of a series as a PNG image, in memory."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from sktime.utils.plotting import plot_series
+
+    fig, _ = plot_series(*group_values.values(), labels=list(group_values.keys()))
+    fig.suptitle(f"Area: {group_name[0]} - Consumer type: {group_name[1]}")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+
+    return buffer.getvalue()
+
+
+def _content_hash(group_name: tuple, group_values: dict[str, pd.Series]) -> str:
+    """Hash everything drawn in the figure of a series."""
+    digest = hashlib.blake2b(f"{RENDER_VERSION}-{group_name}".encode(), digest_size=16)
+    for split, values in group_values.items():
+        index = values.index.to_timestamp() if isinstance(values.index, pd.PeriodIndex) else values.index
+        digest.update(split.encode())
+        digest.update(np.ascontiguousarray(index.asi8))
+        digest.update(np.ascontiguousarray(values.to_numpy(dtype=np.float64)))
+
+    return digest.hexdigest()
+
+
+def _num_jobs(n_jobs: int) -> int:
+    return os.cpu_count() if n_jobs < 0 else max(n_jobs, 1)